@@ -1,5 +1,8 @@
+import numpy as np
+from app.crud.cedefop_store import CedefopStore
+
 # Forecast employment occupation trends for a given ISCO code and country
-def read_emp_occupation(db_cedefop: dict, country: str, isco_id: str) -> dict:
+def read_emp_occupation(db_cedefop: CedefopStore, country: str, isco_id: str) -> dict:
     country_clean = country.strip().title()
     isco_clean = isco_id.strip()
 
@@ -11,8 +14,8 @@ def read_emp_occupation(db_cedefop: dict, country: str, isco_id: str) -> dict:
         source_key = "emp_occupation_detail"
         target_isco = isco_clean[:2]
 
-    # Dict loaded in RAM during startup
-    data = db_cedefop.get(source_key, {}).get(country_clean, {}).get(target_isco)
+    # Columnar store loaded in RAM during startup
+    data = db_cedefop.entry(source_key, country_clean, target_isco)
 
     if not data:
         return {"error": f"Data not found for {country_clean} and ISCO code {target_isco}"}
@@ -20,7 +23,7 @@ def read_emp_occupation(db_cedefop: dict, country: str, isco_id: str) -> dict:
     return data
     
 # Forecast employment trends for sector
-def read_emp_sector_occupation(db_cedefop: dict, country: str, sector: str, isco_id: str) -> dict:
+def read_emp_sector_occupation(db_cedefop: CedefopStore, country: str, sector: str, isco_id: str) -> dict:
     # Optional
     if not sector:
         return {}
@@ -33,8 +36,8 @@ def read_emp_sector_occupation(db_cedefop: dict, country: str, sector: str, isco
     
     isco_2d = isco_clean[:2]
 
-    # Dict loaded in RAM during startup
-    data = db_cedefop.get("sectors", {}).get(country_clean, {}).get(isco_2d).get("sectors", {}).get(sector.strip(), {})
+    # Columnar store loaded in RAM during startup
+    data = (db_cedefop.entry("sectors", country_clean, isco_2d) or {}).get("sectors", {}).get(sector.strip(), {})
 
     if not data:
         return {"error": f"Data not found for {country_clean}, ISCO code {isco_2d} and sector {sector.strip()}"}
@@ -42,13 +45,13 @@ def read_emp_sector_occupation(db_cedefop: dict, country: str, sector: str, isco
     return data
 
 # Forecast qualifications for a given ISCO code and country
-def read_qualifications(db_cedefop: dict, country: str, isco_id: str) -> dict:
+def read_qualifications(db_cedefop: CedefopStore, country: str, isco_id: str) -> dict:
     country_clean = country.strip().title()
     isco_clean = isco_id.strip()
 
     target_isco = isco_clean[:2] if len(isco_clean) >= 2 else isco_clean
     
-    data = db_cedefop.get("qualifications", {}).get(country_clean, {}).get(target_isco)
+    data = db_cedefop.entry("qualifications", country_clean, target_isco)
 
     if not data:
         return {"error": f"Qualification data not found for {country_clean} and ISCO code {target_isco}"}
@@ -56,13 +59,42 @@ def read_qualifications(db_cedefop: dict, country: str, isco_id: str) -> dict:
     return data
 
 # Forecast job openings
-def read_job_openings(db_cedefop: dict, country: str, isco_id: str) -> dict:
+def read_job_openings(db_cedefop: CedefopStore, country: str, isco_id: str) -> dict:
     country_clean = country.strip().title()
     target_isco = isco_id.strip()[0] # Using 1-digit ISCO for job openings
 
-    data = db_cedefop.get("job_openings", {}).get(country_clean, {}).get(target_isco)
+    data = db_cedefop.entry("job_openings", country_clean, target_isco)
 
     if not data:
         return {"error": f"Job Openings data not found for {country_clean} and ISCO code {target_isco}"}
     
-    return data
\ No newline at end of file
+    return data
+
+# Growth rate of several ISCO codes in every country, one vectorized lookup per dataset
+def read_growth_rates(db_cedefop: CedefopStore, isco_ids: list[str]) -> dict:
+    # Same routing of read_emp_occupation: 1 digit codes -> emp_occupation, longer ones -> 2 digit detail
+    targets = {"emp_occupation": set(), "emp_occupation_detail": set()}
+    for isco_id in isco_ids:
+        isco_clean = isco_id.strip()
+        if len(isco_clean) == 1:
+            targets["emp_occupation"].add(isco_clean)
+        elif isco_clean:
+            targets["emp_occupation_detail"].add(isco_clean[:2])
+
+    rates = {}
+    for source_key, codes in targets.items():
+        table = db_cedefop.series.get(source_key)
+        if table is None:
+            continue
+
+        codes = sorted(c for c in codes if c in table.isco_index)
+        growth = table.growth(iscos=codes) # (country, isco)
+
+        for col, isco in enumerate(codes):
+            rates[isco] = {
+                country: float(growth[row, col])
+                for row, country in enumerate(table.countries)
+                if not np.isnan(growth[row, col])
+            }
+
+    return rates
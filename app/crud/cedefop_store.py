@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# CEDEFOP forecasts in columnar form.
+# The JSON files are nested dicts: country -> ISCO code -> {"history": [{"year": "2010", "value": ...}, ...], "trend", "growth_pct"}
+# Each of these datasets becomes a SeriesTable: countries and ISCO codes are integer coded and the yearly values
+# are one dense float array per field, shape (country, isco, year). NaN = no data.
+# Datasets with a different layout (ISCO definitions, sectors, qualifications) are kept as plain dicts.
+
+SNAPSHOT_VERSION = 1
+
+def is_series_dataset(data) -> bool:
+    try:
+        country = next(iter(data.values()))
+        entry = next(iter(country.values()))
+        return isinstance(entry, dict) and isinstance(entry.get("history"), list)
+    except (AttributeError, StopIteration):
+        return False
+
+### --- One time-series dataset --- ###
+class SeriesTable:
+    def __init__(
+        self,
+        countries: list[str],
+        iscos: list[str],
+        years: np.ndarray,
+        fields: list[str],
+        values: np.ndarray,
+        trend_labels: list[str],
+        trend_codes: np.ndarray,
+        growth_pct: np.ndarray,
+        integral: bool
+    ):
+        self.countries = countries
+        self.iscos = iscos
+        self.years = years
+        self.fields = fields
+        self.values = values            # (field, country, isco, year)
+        self.trend_labels = trend_labels
+        self.trend_codes = trend_codes  # (country, isco), -1 = no trend
+        self.growth_pct = growth_pct    # (country, isco), NaN = no growth_pct
+        self.integral = integral        # values were integers in the JSON
+
+        self.country_index = {c: i for i, c in enumerate(countries)}
+        self.isco_index = {code: i for i, code in enumerate(iscos)}
+        self.year_index = {int(y): i for i, y in enumerate(years)}
+        self.field_index = {f: i for i, f in enumerate(fields)}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "SeriesTable":
+        countries = list(data.keys())
+        iscos, years, fields, trend_labels = {}, set(), [], []
+
+        for by_isco in data.values():
+            for isco, entry in by_isco.items():
+                iscos.setdefault(isco, len(iscos))
+                for point in entry.get("history", []):
+                    years.add(int(point["year"]))
+                    for field in point:
+                        if field != "year" and field not in fields:
+                            fields.append(field)
+                trend = entry.get("trend")
+                if trend is not None and trend not in trend_labels:
+                    trend_labels.append(trend)
+
+        years = np.array(sorted(years), dtype=np.int16)
+        year_index = {int(y): i for i, y in enumerate(years)}
+        field_index = {f: i for i, f in enumerate(fields)}
+
+        values = np.full((len(fields), len(countries), len(iscos), len(years)), np.nan)
+        trend_codes = np.full((len(countries), len(iscos)), -1, dtype=np.int8)
+        growth_pct = np.full((len(countries), len(iscos)), np.nan)
+        integral = True
+
+        for c, by_isco in enumerate(data.values()):
+            for isco, entry in by_isco.items():
+                i = iscos[isco]
+                for point in entry.get("history", []):
+                    y = year_index[int(point["year"])]
+                    for field, value in point.items():
+                        if field == "year" or value is None:
+                            continue
+                        values[field_index[field], c, i, y] = value
+                        integral = integral and isinstance(value, int)
+                if entry.get("trend") is not None:
+                    trend_codes[c, i] = trend_labels.index(entry["trend"])
+                if entry.get("growth_pct") is not None:
+                    growth_pct[c, i] = entry["growth_pct"]
+
+        return cls(countries, list(iscos), years, fields, values, trend_labels, trend_codes, growth_pct, integral)
+
+    ### --- Vectorized queries --- ###
+    def _positions(self, index: dict, keys) -> np.ndarray:
+        if keys is None:
+            return np.arange(len(index))
+        return np.array([index[k] for k in keys], dtype=np.intp)
+
+    def select(
+        self,
+        field: str | None = None,
+        countries: list[str] | None = None,
+        iscos: list[str] | None = None,
+        years=None
+    ) -> np.ndarray:
+        # e.g. select(countries=["Italy"], years=range(2024, 2036)) -> (1, n_isco, 12) array
+        c = self._positions(self.country_index, countries)
+        i = self._positions(self.isco_index, iscos)
+        y = self._positions(self.year_index, [int(x) for x in years] if years is not None else None)
+
+        return self.values[self.field_index[field or self.fields[0]]][np.ix_(c, i, y)]
+
+    def growth(self, countries: list[str] | None = None, iscos: list[str] | None = None) -> np.ndarray:
+        c = self._positions(self.country_index, countries)
+        i = self._positions(self.isco_index, iscos)
+
+        return self.growth_pct[np.ix_(c, i)]
+
+    ### --- Single entry, same dict shape of the JSON file --- ###
+    def entry(self, country: str, isco: str) -> dict | None:
+        c = self.country_index.get(country)
+        i = self.isco_index.get(isco)
+        if c is None or i is None:
+            return None
+
+        cell = self.values[:, c, i, :]
+        has_year = ~np.all(np.isnan(cell), axis=0)
+        trend_code = int(self.trend_codes[c, i])
+        growth = float(self.growth_pct[c, i])
+
+        if not has_year.any() and trend_code < 0 and np.isnan(growth):
+            return None
+
+        history = []
+        for y in np.flatnonzero(has_year):
+            point = {"year": str(int(self.years[y]))}
+            for f, field in enumerate(self.fields):
+                value = cell[f, y]
+                if np.isnan(value):
+                    point[field] = None
+                else:
+                    point[field] = int(value) if self.integral else float(value)
+            history.append(point)
+
+        entry = {"history": history}
+        if trend_code >= 0:
+            entry["trend"] = self.trend_labels[trend_code]
+        if not np.isnan(growth):
+            entry["growth_pct"] = growth
+        return entry
+
+### --- All datasets loaded at startup (app.state.cedefop) --- ###
+class CedefopStore:
+    def __init__(self):
+        self.series: dict[str, SeriesTable] = {}
+        self.raw: dict[str, dict] = {}
+
+    def add(self, key: str, data: dict):
+        if is_series_dataset(data):
+            self.series[key] = SeriesTable.from_json(data)
+        else:
+            self.raw[key] = data
+
+    def entry(self, key: str, country: str, isco: str) -> dict | None:
+        table = self.series.get(key)
+        if table is not None:
+            return table.entry(country, isco)
+        return self.raw.get(key, {}).get(country, {}).get(isco)
+
+    def keys(self) -> list[str]:
+        return list(self.series) + list(self.raw)
+
+    def clear(self):
+        self.series.clear()
+        self.raw.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.series or key in self.raw
+
+    def __len__(self) -> int:
+        return len(self.series) + len(self.raw)
+
+### --- Binary snapshot: .npy arrays memory mapped by every worker + manifest.json --- ###
+# Built with: python -m app.service.build_cedefop_snapshot
+def file_digest(path) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def _replace_npy(path: str, array: np.ndarray):
+    # New file + rename: workers that mapped the old one keep reading it safely
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+def save_snapshot(store: CedefopStore, directory, sources: dict) -> dict:
+    os.makedirs(directory, exist_ok=True)
+
+    series = {}
+    for key, table in store.series.items():
+        _replace_npy(os.path.join(directory, f"{key}.values.npy"), table.values)
+        _replace_npy(os.path.join(directory, f"{key}.trend.npy"), table.trend_codes)
+        _replace_npy(os.path.join(directory, f"{key}.growth.npy"), table.growth_pct)
+        series[key] = {
+            "countries": table.countries,
+            "iscos": table.iscos,
+            "years": [int(y) for y in table.years],
+            "fields": table.fields,
+            "trend_labels": table.trend_labels,
+            "integral": table.integral
+        }
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "sources": {key: file_digest(path) for key, path in sources.items()},
+        "series": series
+    }
+
+    # Manifest last: a snapshot is valid only once all its arrays are in place
+    tmp_path = os.path.join(directory, "manifest.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(directory, "manifest.json"))
+
+    return manifest
+
+def load_snapshot(directory, sources: dict) -> CedefopStore | None:
+    # None if the snapshot is missing, from another version or older than the JSON files
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    if manifest.get("sources") != {key: file_digest(path) for key, path in sources.items()}:
+        return None
+
+    store = CedefopStore()
+    try:
+        for key, meta in manifest["series"].items():
+            store.series[key] = SeriesTable(
+                meta["countries"],
+                meta["iscos"],
+                np.array(meta["years"], dtype=np.int16),
+                meta["fields"],
+                np.load(os.path.join(directory, f"{key}.values.npy"), mmap_mode="r"),
+                meta["trend_labels"],
+                np.load(os.path.join(directory, f"{key}.trend.npy"), mmap_mode="r"),
+                np.load(os.path.join(directory, f"{key}.growth.npy"), mmap_mode="r"),
+                meta["integral"]
+            )
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error while loading CEDEFOP snapshot: {e}")
+        return None
+
+    # Datasets without a columnar form are still read from JSON
+    for key, path in sources.items():
+        if key in store.series or manifest["sources"][key] is None:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            store.add(key, json.load(f))
+
+    return store
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app.crud import crud_user, crud_org, crud_jobs, crud_course_index
+from app.service import config
+
+# Async variants of the crud functions used by the routes.
+# File / SQLite I/O and model validation run in a bounded pool of threads (STORAGE_IO_WORKERS), so a slow disk
+# never blocks the event loop. The context of the request goes with the call: the per request model
+# dedup of app/crud/model_cache.py keeps working.
+# e.g. user = await crud_async.get_user_by_username(username)
+
+_executor: ThreadPoolExecutor | None = None
+
+def init_pool(workers: int = config.STORAGE_IO_WORKERS) -> ThreadPoolExecutor:
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage")
+    return _executor
+
+def close_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+def get_pool() -> ThreadPoolExecutor:
+    # Fallback for code running outside the app lifespan (scripts, shell)
+    if _executor is None:
+        return init_pool()
+    return _executor
+
+async def run(func, *args, **kwargs):
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), call)
+
+def _offload(module, name: str):
+    # Looked up at every call: patched / monkeypatched crud functions are used too
+    @functools.wraps(getattr(module, name))
+    async def wrapper(*args, **kwargs):
+        return await run(getattr(module, name), *args, **kwargs)
+    return wrapper
+
+### --- Users --- ###
+create_user = _offload(crud_user, "create_user")
+update_user = _offload(crud_user, "update_user")
+change_password_user = _offload(crud_user, "change_password_user")
+get_user_by_username = _offload(crud_user, "get_user_by_username")
+get_users_by_usernames = _offload(crud_user, "get_users_by_usernames")
+get_all_users = _offload(crud_user, "get_all_users")
+get_pending_invitations_for_user = _offload(crud_user, "get_pending_invitations_for_user")
+
+### --- Organizations and invitations --- ###
+create_organization = _offload(crud_org, "create_organization")
+update_org = _offload(crud_org, "update_org")
+change_password_org = _offload(crud_org, "change_password_org")
+get_org_by_orgname = _offload(crud_org, "get_org_by_orgname")
+get_all_orgs = _offload(crud_org, "get_all_orgs")
+org_exists = _offload(crud_org, "org_exists")
+get_org_info = _offload(crud_org, "get_org_info")
+update_org_info = _offload(crud_org, "update_org_info")
+create_invitation = _offload(crud_org, "create_invitation")
+get_inv_by_id = _offload(crud_org, "get_inv_by_id")
+update_invitation = _offload(crud_org, "update_invitation")
+
+### --- Organization records: members, projects, courses --- ###
+get_member_skills = _offload(crud_org, "get_member_skills")
+get_all_member_skills = _offload(crud_org, "get_all_member_skills")
+set_member_skills = _offload(crud_org, "set_member_skills")
+remove_member = _offload(crud_org, "remove_member")
+get_project = _offload(crud_org, "get_project")
+get_projects = _offload(crud_org, "get_projects")
+save_project = _offload(crud_org, "save_project")
+save_projects = _offload(crud_org, "save_projects")
+get_assigned_projects = _offload(crud_org, "get_assigned_projects")
+get_managed_projects = _offload(crud_org, "get_managed_projects")
+get_course = _offload(crud_org, "get_course")
+save_course = _offload(crud_org, "save_course")
+delete_course = _offload(crud_org, "delete_course")
+update_project = _offload(crud_org, "update_project")
+update_course = _offload(crud_org, "update_course")
+
+### --- Course index (recommendations) --- ###
+index_course = _offload(crud_course_index, "index_course")
+remove_course = _offload(crud_course_index, "remove_course")
+
+### --- Import jobs --- ###
+create_job = _offload(crud_jobs, "create_job")
+update_job = _offload(crud_jobs, "update_job")
+get_job_by_id = _offload(crud_jobs, "get_job_by_id")
@@ -0,0 +1,121 @@
+import hashlib
+import os
+from app.models import Course, Organization
+from app.crud import storage, crud_org
+
+# Inverted index for course recommendations, maintained by the course handlers of the org router:
+# - postings: skill uri -> {course_id: {"orgname", "is_public", "category"}}
+# - catalog:  course_id -> course data + owning org, read only for the courses that pass the filters
+# Recommendations never load organization files. The index is built from the organizations the first time.
+
+DATA_DIR_COURSE_POSTINGS = "data/course_index/postings"
+DATA_DIR_COURSE_CATALOG = "data/course_index/catalog"
+os.makedirs(DATA_DIR_COURSE_POSTINGS, exist_ok=True)
+os.makedirs(DATA_DIR_COURSE_CATALOG, exist_ok=True)
+
+BUILT_MARKER = "_built"
+
+### --- Storage collections --- ###
+def postings_collection():
+    return storage.get_collection("course_postings", DATA_DIR_COURSE_POSTINGS)
+
+def catalog_collection():
+    return storage.get_collection("course_catalog", DATA_DIR_COURSE_CATALOG)
+
+def posting_key(uri: str) -> str:
+    # URIs are not valid file names
+    return hashlib.sha1(uri.encode("utf-8")).hexdigest()
+
+def _course_info(orgname: str, course: Course) -> dict:
+    return {"orgname": orgname, "is_public": course.is_public, "category": course.category}
+
+def _entry_info(entry: dict | None) -> dict | None:
+    # Filters of a catalog entry (None: not indexed)
+    if entry is None:
+        return None
+    return {"orgname": entry["orgname"], "is_public": entry["course"].get("is_public", False), "category": entry["course"].get("category")}
+
+def _update_posting(postings, catalog, uri: str, course_id: str):
+    # Postings are shared by all the organizations: read-modify-write, an empty posting is deleted.
+    # The course is taken from the current catalog entry, not from the edit that triggered the update: two edits of
+    # the same course leave the posting as the catalog, whatever order their updates run in
+    def apply(data: dict):
+        entry = catalog.read(course_id)
+        courses = dict(data["courses"])
+        if entry is not None and uri in entry["skill_uris"]:
+            courses[course_id] = _entry_info(entry)
+        else:
+            courses.pop(course_id, None)
+
+        if courses == data["courses"]:
+            return None
+        return {**data, "courses": courses} if courses else storage.DELETE
+
+    storage.update(postings, posting_key(uri), apply, default={"uri": uri, "courses": {}})
+
+def _replace_entry(catalog, course_id: str, new: dict | None) -> dict | None:
+    # Catalog entry written (None: deleted) with compare-and-swap. The entry it replaced
+    replaced = {}
+    def apply(data: dict):
+        replaced["old"] = data if data.get("skill_uris") is not None else None
+        return new if new is not None else storage.DELETE
+
+    storage.update(catalog, course_id, apply, default={})
+    return replaced.get("old")
+
+### --- Maintenance (add / edit / toggle / add skill -> index_course, delete -> remove_course) --- ###
+def index_course(orgname: str, course: Course):
+    postings, catalog = postings_collection(), catalog_collection()
+    course_id = str(course.id)
+
+    new_uris = {s.uri for s in course.skills_covered or []}
+    old = _replace_entry(catalog, course_id, {
+        "orgname": orgname,
+        "skill_uris": sorted(new_uris),
+        "course": course.model_dump(mode="json")
+    })
+    old_uris = set(old["skill_uris"]) if old else set()
+
+    # Filters are copied in every posting: unchanged ones are not rewritten
+    info_changed = _entry_info(old) != _course_info(orgname, course)
+    for uri in sorted(old_uris | new_uris):
+        if uri not in old_uris or uri not in new_uris or info_changed:
+            _update_posting(postings, catalog, uri, course_id)
+
+def remove_course(course_id: str):
+    postings, catalog = postings_collection(), catalog_collection()
+
+    old = _replace_entry(catalog, course_id, None)
+    if old is None:
+        return
+
+    for uri in old["skill_uris"]:
+        _update_posting(postings, catalog, uri, course_id)
+
+def rebuild_course_index(organizations: list[Organization] | None = None):
+    postings, catalog = postings_collection(), catalog_collection()
+
+    for key in postings.keys():
+        postings.delete(key)
+    for key in catalog.keys():
+        catalog.delete(key)
+
+    for org in organizations if organizations is not None else crud_org.get_all_orgs():
+        for course in org.courses:
+            index_course(org.orgname, course)
+
+    postings.write(BUILT_MARKER, {"built": True})
+
+def ensure_course_index():
+    if not postings_collection().exists(BUILT_MARKER):
+        rebuild_course_index()
+
+### --- Lookups --- ###
+def courses_for_skill(uri: str) -> dict:
+    # course_id -> {"orgname", "is_public", "category"}
+    data = postings_collection().read(posting_key(uri))
+    return data["courses"] if data else {}
+
+def get_course(course_id: str) -> Course | None:
+    data = catalog_collection().read(course_id)
+    return Course(**data["course"]) if data else None
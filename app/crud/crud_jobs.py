@@ -0,0 +1,36 @@
+import os
+from app.models import ImportJob
+from app.crud import storage
+
+DATA_DIR_JOBS = "data/import_jobs"
+os.makedirs(DATA_DIR_JOBS, exist_ok=True)
+
+### --- Storage collection --- ###
+def jobs_collection():
+    return storage.get_collection("import_jobs", DATA_DIR_JOBS)
+
+### --- Create Job --- ###
+def create_job(job: ImportJob) -> ImportJob:
+    jobs_collection().write(job.id, job.model_dump(mode="json"))
+
+    return job
+
+### --- Update Job (partial results are saved while the job runs) --- ###
+def update_job(job: ImportJob):
+    jobs = jobs_collection()
+
+    if not jobs.exists(job.id):
+        return
+
+    try:
+        jobs.write(job.id, job.model_dump(mode="json"))
+    except Exception as e:
+        print(f"Error updating import job: {e}")
+
+### --- Get Job By ID --- ###
+def get_job_by_id(id: str) -> ImportJob | None:
+    try:
+        data = jobs_collection().read(id)
+        return ImportJob(**data) if data is not None else None
+    except Exception:
+        return None
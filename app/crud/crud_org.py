@@ -1,93 +1,854 @@
+import hashlib
 import json
 import os
-from app.models import Organization, Invitation
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.models import Organization, Invitation, Project, Course, Skill
+from app.crud import storage, model_cache, crud_skill_models
+from app.crud.crud_user import INVITATION_INDEXES
+from app.service import config
+from typing import Dict, List
+
+# An organization is stored as separate records, written independently:
+# - organizations: snapshot of name, password, pending members, global gap
+# - org_journal:   changes made after the snapshot, one small entry per change (see below)
+# - org_members:   skills of one member
+# - org_projects:  one project (roles, assigned members, skill gap, ...), keyed by record_key(project id)
+# - org_courses:   one course, keyed by record_key(course id)
+# - org_user_projects: reverse index username -> ids of the projects assigned / managed, kept in sync by
+#   every project write
+# The full Organization is assembled only by get_org_by_orgname (cached, checked against snapshot + journal):
+# update_org writes back only the records that differ from the loaded ones.
+# Records are versioned (app/crud/storage.py): writes of a loaded organization / record merge the changes made
+# meanwhile by other requests, update_project / update_course run their change again on the current record.
+# The organization fields only get journal entries with the fields changed: concurrent changes are kept.
 
 DATA_DIR_ORGS = "data/organizations"
 os.makedirs(DATA_DIR_ORGS, exist_ok=True)
 
+DATA_DIR_ORG_MEMBERS = "data/org_members"
+os.makedirs(DATA_DIR_ORG_MEMBERS, exist_ok=True)
+
+DATA_DIR_ORG_PROJECTS = "data/org_projects"
+os.makedirs(DATA_DIR_ORG_PROJECTS, exist_ok=True)
+
+DATA_DIR_ORG_COURSES = "data/org_courses"
+os.makedirs(DATA_DIR_ORG_COURSES, exist_ok=True)
+
+DATA_DIR_ORG_USER_PROJECTS = "data/org_user_projects"
+os.makedirs(DATA_DIR_ORG_USER_PROJECTS, exist_ok=True)
+
+DATA_DIR_ORG_JOURNAL = "data/org_journal"
+os.makedirs(DATA_DIR_ORG_JOURNAL, exist_ok=True)
+
 DATA_INV_DIR = "data/invitations"
 os.makedirs(DATA_INV_DIR, exist_ok=True)
 
-### --- Helper: Path --- ###
-def get_json_path(orgname: str) -> str:
-    return os.path.join(DATA_DIR_ORGS, f"{orgname}.json")
+MEMBER_INDEXES = ("orgname", ("orgname", "username"))
+RECORD_INDEXES = ("orgname",)
+PARTS = ("members", "projects", "courses")
+
+### --- Storage collections --- ###
+def orgs_collection():
+    return storage.get_collection("organizations", DATA_DIR_ORGS)
+
+def members_collection():
+    return storage.get_collection("org_members", DATA_DIR_ORG_MEMBERS, MEMBER_INDEXES)
+
+def projects_collection():
+    return storage.get_collection("org_projects", DATA_DIR_ORG_PROJECTS, RECORD_INDEXES)
+
+def courses_collection():
+    return storage.get_collection("org_courses", DATA_DIR_ORG_COURSES, RECORD_INDEXES)
+
+def user_projects_collection():
+    return storage.get_collection("org_user_projects", DATA_DIR_ORG_USER_PROJECTS, RECORD_INDEXES)
+
+def invitations_collection():
+    return storage.get_collection("invitations", DATA_INV_DIR, INVITATION_INDEXES)
+
+def journal_collection():
+    return storage.get_journal("org_journal", DATA_DIR_ORG_JOURNAL)
+
+def member_key(orgname: str, username: str) -> str:
+    return hashlib.sha1(json.dumps([orgname, username], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def record_key(record_id: str) -> str:
+    # Project / course id -> record: ids come from the URLs, they are not used as file names
+    return hashlib.sha1(str(record_id).encode("utf-8")).hexdigest()
+
+### --- Reverse index: member -> projects --- ###
+# One entry per (organization, username): {"assigned": [project ids], "managed": [project ids]}.
+# Built from the project records on first use (marker entry), then updated with the old / new version
+# of every project written or deleted.
+PROJECT_ROLES = (("assigned", "assigned_members"), ("managed", "manager"))
+
+def _projects_indexed_key(orgname: str) -> str:
+    return member_key(orgname, None)
+
+def _project_users(project: dict | None, field: str) -> set:
+    if project is None:
+        return set()
+    value = project.get(field)
+    return set(value or []) if isinstance(value, list) else {value}
+
+def _reindex_projects(orgname: str, changes: List[tuple[dict | None, dict | None]]):
+    index = user_projects_collection()
+    if not index.exists(_projects_indexed_key(orgname)):
+        # Not built yet: the first lookup reads the records, already written
+        return
+
+    # username -> kind -> {project id: added (True) / removed (False)}
+    deltas = {}
+    for old, new in changes:
+        project_id = str((new or old)["id"])
+        for kind, field in PROJECT_ROLES:
+            old_users, new_users = _project_users(old, field), _project_users(new, field)
+            for username in old_users ^ new_users:
+                deltas.setdefault(username, {}).setdefault(kind, {})[project_id] = username in new_users
+
+    # Each entry is a read-modify-write of its own: concurrent changes of other projects of the member are kept
+    for username, kinds in deltas.items():
+        def apply(data: dict, kinds=kinds):
+            for kind, projects in kinds.items():
+                ids = [p for p in data[kind] if projects.get(p, True)]
+                data[kind] = ids + [p for p, added in projects.items() if added and p not in ids]
+            return data if data["assigned"] or data["managed"] else storage.DELETE
+
+        storage.update(index, member_key(orgname, username), apply, default={
+            "orgname": orgname, "username": username, "assigned": [], "managed": []
+        })
+
+def _ensure_projects_indexed(orgname: str):
+    index = user_projects_collection()
+    marker = _projects_indexed_key(orgname)
+    if index.exists(marker):
+        return
+
+    with storage.directory_lock(os.path.abspath(DATA_DIR_ORG_USER_PROJECTS)):
+        if index.exists(marker):
+            return
+        for data in index.find(orgname=orgname):
+            index.delete(member_key(orgname, data["username"]))
+
+        index.write(marker, {"orgname": orgname, "username": None, "assigned": [], "managed": []})
+        _reindex_projects(orgname, [(None, p.model_dump(mode="json")) for p in get_projects(orgname)])
+
+def _user_project_ids(orgname: str, username: str, kind: str) -> List[str]:
+    if not orgname or not username:
+        return []
+
+    _ensure_projects_indexed(orgname)
+    data = user_projects_collection().read(member_key(orgname, username))
+    return data[kind] if data else []
+
+### --- Records of an organization --- ###
+# Parts are named "member:<username>", "project:<id>", "course:<id>". Each record keeps the position of
+# its part (creation time, list index for migrated documents): the assembled lists keep their order.
+views = model_cache.ModelCache()
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, sort_keys=True)
+
+def _core_data(org: Organization) -> dict:
+    return org.model_dump(mode="json", exclude=set(PARTS))
+
+def _parts(org: Organization) -> Dict[str, dict]:
+    parts = {}
+    for username, skills in org.members.items():
+        parts[f"member:{username}"] = {
+            "orgname": org.orgname,
+            "username": username,
+            "skills": [s.model_dump(mode="json") for s in skills]
+        }
+    for project in org.projects:
+        parts[f"project:{project.id}"] = {"orgname": org.orgname, "project": project.model_dump(mode="json")}
+    for course in org.courses:
+        parts[f"course:{course.id}"] = {"orgname": org.orgname, "course": course.model_dump(mode="json")}
+    return parts
+
+def _part_location(orgname: str, part: str):
+    kind, ident = part.split(":", 1)
+    if kind == "member":
+        return members_collection(), member_key(orgname, ident)
+    if kind == "project":
+        return projects_collection(), record_key(ident)
+    return courses_collection(), record_key(ident)
+
+def _sorted_records(records: List[dict], name) -> List[dict]:
+    return sorted(records, key=lambda r: (r.get("position", 0), name(r)))
+
+### --- Organization fields: snapshot + journal --- ###
+# Every change of an organization appends one entry to its journal, instead of rewriting the whole document:
+#   {"op": "update", "set": [[path, value], ...], "del": [path, ...], "parts": ["course:<id>", ...]}
+#   {"op": "gap", "project": [id, name], "old": [uris], "new": {uri: name}, "parts": ["project:<id>"]}
+# "set" / "del" hold only the fields that changed (path = keys down the nested dicts), "gap" moves one project
+# in the global gap, "parts" name the records written (their content is in their own record).
+# Reads replay the entries after the snapshot; past ORG_JOURNAL_COMPACT_ENTRIES entries a background thread folds
+# them into a new snapshot (compact_org).
+def _core_fields(core: dict) -> dict:
+    # "revision": written before the journal, "journal_seq": last entry contained in the snapshot
+    skip = ("revision", "journal_seq", storage.VERSION_FIELD)
+    return {k: v for k, v in core.items() if k not in PARTS and k not in skip}
+
+def _set_path(data: dict, path: list, value):
+    for field in path[:-1]:
+        if not isinstance(data.get(field), dict):
+            data[field] = {}
+        data = data[field]
+    data[path[-1]] = value
+
+def _del_path(data: dict, path: list):
+    for field in path[:-1]:
+        data = data.get(field)
+        if not isinstance(data, dict):
+            return
+    data.pop(path[-1], None)
+
+def _diff(base: dict, new: dict, path: tuple = ()) -> tuple[list, list]:
+    sets, dels = [], []
+    for field in sorted(base.keys() | new.keys()):
+        if field not in new:
+            dels.append([*path, field])
+        elif field not in base or base[field] != new[field]:
+            if isinstance(base.get(field), dict) and isinstance(new[field], dict):
+                nested_sets, nested_dels = _diff(base[field], new[field], (*path, field))
+                sets += nested_sets
+                dels += nested_dels
+            else:
+                sets.append([[*path, field], new[field]])
+    return sets, dels
+
+def replay_journal(core: dict, entries: List[tuple[int, dict]]) -> dict:
+    core = dict(core)
+    for seq, entry in entries:
+        if entry.get("op") == "gap":
+            if core.get("global_gap") is not None:
+                project_id, project_name = entry["project"]
+                core["global_gap"] = crud_skill_models.apply_global_gap_change(
+                    core["global_gap"], project_id, project_name, entry["old"], entry["new"]
+                )
+        else:
+            for path, value in entry.get("set", []):
+                _set_path(core, path, value)
+            for path in entry.get("del", []):
+                _del_path(core, path)
+        core["journal_seq"] = seq
+    return core
 
-def get_inv_json_path(id: str) -> str:
-    return os.path.join(DATA_INV_DIR, f"{id}.json")
+def _append(orgname: str, entry: dict) -> int:
+    seq, entries = journal_collection().append(orgname, entry)
+    model_cache.invalidate(orgs_collection(), orgname)
+    if entries > config.ORG_JOURNAL_COMPACT_ENTRIES:
+        schedule_compaction(orgname)
+    return seq
+
+def _write_core(orgname: str, core: dict, stored: tuple | None = None, parts=()) -> int:
+    # Only the fields changed since `stored` = (position, JSON, journal sequence) as loaded (or else since the
+    # current fields) are appended: changes of other requests to other fields are kept. Last journal sequence
+    base = json.loads(stored[1]) if stored else _core_fields(_read_core(orgname) or {})
+    sets, dels = _diff(base, _core_fields(core))
+    if not sets and not dels and not parts:
+        return stored[2] if stored else journal_collection().last_seq(orgname)
+
+    entry = {"op": "update"}
+    if sets:
+        entry["set"] = sets
+    if dels:
+        entry["del"] = dels
+    if parts:
+        entry["parts"] = list(parts)
+    return _append(orgname, entry)
+
+def _write_snapshot(orgname: str, core: dict) -> int:
+    # Whole document (new organization, old document split): entries already in the journal are not replayed on it
+    seq = journal_collection().last_seq(orgname)
+    orgs_collection().write(orgname, {**_core_fields(core), "journal_seq": seq})
+    model_cache.invalidate(orgs_collection(), orgname)
+    return seq
+
+def _touch(orgname: str, parts):
+    # Records changed without their Organization: the assembled views are stale
+    if orgs_collection().exists(orgname):
+        _append(orgname, {"op": "update", "parts": list(parts)})
+
+def _read_core(orgname: str) -> dict | None:
+    # Fields of the organization: snapshot + entries of the journal not in it ("journal_seq": last entry applied).
+    # A compaction writes a new snapshot, then drops the entries folded in it: if the snapshot changed while the
+    # journal was read, the entries after the old snapshot may be gone, read again
+    orgs = orgs_collection()
+    for attempt in range(config.STORAGE_CAS_RETRIES + 1):
+        stamp = orgs.stamp(orgname)
+        data = orgs.read(orgname)
+        if data is not None and any(part in data for part in PARTS):
+            _split_document(data)
+            continue
+        if data is None:
+            return None
+
+        data.setdefault("journal_seq", 0)
+        entries = journal_collection().read(orgname, after=data["journal_seq"])
+        if orgs.stamp(orgname) == stamp:
+            return replay_journal(data, entries)
+    raise storage.VersionConflict(orgs.name, orgname, None, None)
+
+def _core_stamp(orgname: str) -> tuple | None:
+    stamp = orgs_collection().stamp(orgname)
+    return (stamp, journal_collection().stamp(orgname)) if stamp is not None else None
+
+def _split_pending(orgname: str) -> bool:
+    # Called when a record is not found: the organization may still be an old single document
+    data = orgs_collection().read(orgname) if orgname else None
+    if data is not None and any(part in data for part in PARTS):
+        _split_document(data)
+        return True
+    return False
+
+def _split_document(data: dict) -> dict:
+    # Documents written before the split hold members, projects and courses: moved to their records once
+    org = Organization(**data)
+    if org.global_gap is None:
+        crud_skill_models.rebuild_global_gap(org)
+    for position, (part, record) in enumerate(_parts(org).items()):
+        collection, key = _part_location(org.orgname, part)
+        if not collection.exists(key):
+            collection.write(key, {**record, "position": position})
+
+    _write_snapshot(org.orgname, _core_data(org))
+
+def _assemble(orgname: str) -> tuple[Organization, Dict[str, int], Dict[str, int]] | None:
+    core = _read_core(orgname)
+    if core is None:
+        return None
+
+    members = _sorted_records(members_collection().find(orgname=orgname), lambda r: r["username"])
+    projects = _sorted_records(projects_collection().find(orgname=orgname), lambda r: r["project"]["id"])
+    courses = _sorted_records(courses_collection().find(orgname=orgname), lambda r: r["course"]["id"])
+
+    org = Organization(
+        **_core_fields(core),
+        members={r["username"]: r["skills"] for r in members},
+        projects=[r["project"] for r in projects],
+        courses=[r["course"] for r in courses]
+    )
+    parts = [(f"member:{r['username']}", r) for r in members]
+    parts += [(f"project:{r['project']['id']}", r) for r in projects]
+    parts += [(f"course:{r['course']['id']}", r) for r in courses]
+
+    positions = {part: r.get("position", 0) for part, r in parts}
+    versions = {part: r.get(storage.VERSION_FIELD, 0) for part, r in parts}
+    versions["core"] = core["journal_seq"]
+    return org, positions, versions
+
+def _remember(org: Organization, positions: Dict[str, int], versions: Dict[str, int]):
+    # What is stored right now, compared by update_org. Version of the core: last journal entry applied
+    org._stored = {
+        part: (positions.get(part, 0), _dumps(record), versions.get(part))
+        for part, record in _parts(org).items()
+    }
+    org._stored["core"] = (0, _dumps(_core_data(org)), versions.get("core"))
+
+def _cache_view(org: Organization, positions: Dict[str, int], versions: Dict[str, int]):
+    orgs = orgs_collection()
+    cache_key = orgs.cache_key(org.orgname)
+
+    # Stamp taken before checking the journal: cached only if nobody changed the org after this save
+    stamp = _core_stamp(org.orgname)
+    if stamp is None or journal_collection().last_seq(org.orgname) != versions.get("core"):
+        views.invalidate(cache_key)
+    else:
+        views.set(cache_key, stamp, (org.model_dump_json(), positions, versions))
+
+    model_cache.store_scoped(cache_key, org)
+
+def _move_in_global_gap(org: Organization, project_changes: List[tuple[dict | None, dict | None]]):
+    # Projects written with the organization: the global gap follows their gap rows. Removed from every skill first,
+    # so a project already moved by the handler (refresh_org_project_gap) is not counted twice
+    if org.global_gap is None:
+        return
+    for old, new in project_changes:
+        old_skills = crud_skill_models.project_gap_skills(Project(**old)) if old else {}
+        new_skills = crud_skill_models.project_gap_skills(Project(**new)) if new else {}
+        project = new or old
+        if old_skills.keys() == new_skills.keys() and (old or {}).get("name") == (new or {}).get("name"):
+            continue
+        org.global_gap = crud_skill_models.apply_global_gap_change(
+            org.global_gap, str(project["id"]), project["name"], old_skills.keys() | new_skills.keys(), new_skills
+        )
+
+def _save(org: Organization, stored: dict):
+    if org._partial:
+        raise ValueError("Partial organization: save it with update_org_info")
+
+    positions, versions, next_position = {}, {}, time.time_ns()
+    written_parts, merged, project_changes = [], False, []
+
+    for part, record in _parts(org).items():
+        old = stored.get(part)
+        if old is None:
+            positions[part] = next_position
+            next_position += 1
+        else:
+            positions[part] = old[0]
+            versions[part] = old[2]
+
+        if old is None or old[1] != _dumps(record):
+            collection, key = _part_location(org.orgname, part)
+            record = {**record, "position": positions[part]}
+            base = {**json.loads(old[1]), "position": old[0]} if old else None
+            versions[part], written = storage.save_changes(collection, key, record, base, old[2] if old else None)
+            written_parts.append(part)
+            merged = merged or written != record
+            if part.startswith("project:"):
+                project_changes.append((json.loads(old[1])["project"] if old else None, written["project"]))
+
+    for part in stored.keys() - positions.keys() - {"core"}:
+        collection, key = _part_location(org.orgname, part)
+        collection.delete(key)
+        written_parts.append(part)
+        if part.startswith("project:"):
+            project_changes.append((json.loads(stored[part][1])["project"], None))
+
+    if project_changes:
+        _reindex_projects(org.orgname, project_changes)
+        _move_in_global_gap(org, project_changes)
+
+    # One journal entry: the changed fields and the records written
+    core, stored_core = _core_data(org), stored.get("core")
+    if stored_core is None:
+        versions["core"] = _write_snapshot(org.orgname, core)
+    else:
+        versions["core"] = _write_core(org.orgname, core, stored_core, written_parts)
+
+    if merged:
+        # Merged with the changes of other requests: the object is brought up to date
+        assembled = _assemble(org.orgname)
+        if assembled is None:
+            return
+        fresh, positions, versions = assembled
+        for field, value in fresh:
+            setattr(org, field, value)
+
+    _remember(org, positions, versions)
+    _cache_view(org, positions, versions)
 
 ### --- CRUD: Create --- ###
 def create_organization(org: Organization):
-    if os.path.exists(get_json_path(org.orgname)):
+    orgs = orgs_collection()
+    if orgs.exists(org.orgname):
         raise ValueError("Organization already exists")
 
-    file_path = get_json_path(org.orgname)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(json.dumps(org.model_dump(), indent=4))
-    
+    if org.global_gap is None:
+        crud_skill_models.rebuild_global_gap(org)
+    _ensure_projects_indexed(org.orgname)
+    _save(org, {})
+
     return org
 
 ### --- CRUD: Update & Manage --- ###
 def update_org(org: Organization):
-    path = get_json_path(org.orgname)
-    
-    if not os.path.exists(path):
+    orgs = orgs_collection()
+
+    if not orgs.exists(org.orgname):
         return
 
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(org.model_dump_json(indent=4))
+        stored = org._stored
+        if stored is None:
+            # Not loaded through get_org_by_orgname: compared with the records on disk
+            assembled = _assemble(org.orgname)
+            if assembled is None:
+                return
+            _remember(*assembled)
+            stored = assembled[0]._stored
+
+        _save(org, stored)
+    except storage.VersionConflict:
+        raise
+    except Exception as e:
+        print(f"Error updating organization: {e}")
+
+def update_org_info(org: Organization):
+    # Organization fields only (pending members, global gap, ...), records are not touched
+    orgs = orgs_collection()
+
+    try:
+        core = _read_core(org.orgname)
+        if core is None:
+            return
+
+        stored = (org._stored or {}).get("core")
+        seq = _write_core(org.orgname, _core_data(org), stored)
+        if org._stored is not None:
+            org._stored["core"] = (0, _dumps(_core_data(org)), seq)
+        model_cache.invalidate(orgs, org.orgname)
     except Exception as e:
         print(f"Error updating organization: {e}")
 
 def change_password_org(org: Organization, new_pw: str) -> bool:
-    path = get_json_path(org.orgname)
-    
-    if not os.path.exists(path):
-        return False
-    
+    orgs = orgs_collection()
+
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if _read_core(org.orgname) is None:
+            return False
 
-        data["hashed_password"] = new_pw
+        # Only this field: changes made meanwhile are kept
+        _append(org.orgname, {"op": "update", "set": [[["hashed_password"], new_pw]]})
+        model_cache.invalidate(orgs, org.orgname)
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        
         return True
     except Exception:
         return False
 
 ### --- CRUD: Getters --- ###
 def get_org_by_orgname(orgname: str) -> Organization | None:
-    path = get_json_path(orgname)
-    if not os.path.exists(path):
+    if not orgname:
         return None
-    
+
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return Organization(**data)
-    except Exception:
+        orgs = orgs_collection()
+        cache_key = orgs.cache_key(orgname)
+
+        org = model_cache.get_scoped(cache_key)
+        if org is not None:
+            return org
+
+        stamp = _core_stamp(orgname)
+        if stamp is None:
+            views.invalidate(cache_key)
+            return None
+
+        cached = views.get(cache_key, stamp)
+        if cached is not None:
+            raw, positions, versions = cached
+            org = Organization.model_validate_json(raw)
+            _remember(org, positions, versions)
+            model_cache.store_scoped(cache_key, org)
+            return org
+
+        assembled = _assemble(orgname)
+        if assembled is None:
+            return None
+
+        org, positions, versions = assembled
+        _remember(org, positions, versions)
+        # Stamp taken before reading the records: a record written meanwhile also rewrites the core,
+        # next load is a miss
+        views.set(cache_key, stamp, (org.model_dump_json(), positions, versions))
+        model_cache.store_scoped(cache_key, org)
+        return org
+    except Exception as e:
+        print(f"Error trying to read organization {orgname}: {e}")
         return None
 
+def org_exists(orgname: str) -> bool:
+    return bool(orgname) and orgs_collection().exists(orgname)
+
+def get_org_info(orgname: str, members=()) -> Organization | None:
+    # Organization fields + skills of the given members only, no projects or courses. Saved with update_org_info
+    try:
+        core = _read_core(orgname)
+        if core is None:
+            return None
+
+        org = Organization(**_core_fields(core), members=get_member_skills(orgname, members))
+        org._stored = {"core": (0, _dumps(_core_data(org)), core["journal_seq"])}
+        org._partial = True
+
+        if org.global_gap is None:
+            # Saved before the global gap existed and not migrated yet (fill_global_gaps): computed, never written here
+            full = Organization(**_core_fields(core), projects=get_projects(orgname))
+            org.global_gap = crud_skill_models.rebuild_global_gap(full)
+
+        return org
+    except Exception as e:
+        print(f"Error trying to read organization {orgname}: {e}")
+        return None
+
+def fill_global_gaps() -> int:
+    # Organizations saved before the global gap existed: computed once from their projects (app startup).
+    # New organizations get it when created, reads never write it. Organizations filled
+    filled = 0
+    orgs = orgs_collection()
+    for orgname in orgs.keys():
+        data = orgs.read(orgname)
+        if data is None or any(part in data for part in PARTS):
+            # Old single document: gets its gap when split, on first use
+            continue
+
+        core = _read_core(orgname)
+        if core is None or core.get("global_gap") is not None:
+            continue
+
+        full = Organization(**_core_fields(core), projects=get_projects(orgname))
+        _append(orgname, {"op": "update", "set": [[["global_gap"], crud_skill_models.rebuild_global_gap(full)]]})
+        filled += 1
+    return filled
+
 ### --- CRUD: Get All --- ###
 def get_all_orgs() -> List[Organization]:
     all_organizations = []
-    
-    if not os.path.exists(DATA_DIR_ORGS):
-        return []
 
-    for filename in os.listdir(DATA_DIR_ORGS):
-        if filename.endswith(".json"):
-            orgname = filename[:-5] # removing .json for orgname
-            org = get_org_by_orgname(orgname)
-            if org:
-                all_organizations.append(org)
-                
+    for orgname in orgs_collection().keys():
+        org = get_org_by_orgname(orgname)
+        if org is not None:
+            all_organizations.append(org)
+
     return all_organizations
 
+### --- Single records: members, projects and courses without the whole organization --- ###
+def get_member_skills(orgname: str, usernames) -> Dict[str, List[Skill]]:
+    members = members_collection()
+    result = {}
+    usernames = list(dict.fromkeys(usernames))
+    records = {username: members.read(member_key(orgname, username)) for username in usernames}
+    if None in records.values() and _split_pending(orgname):
+        records = {username: members.read(member_key(orgname, username)) for username in usernames}
+
+    for username, data in records.items():
+        if data is not None:
+            result[username] = [Skill(**s) for s in data["skills"]]
+    return result
+
+def get_all_member_skills(orgname: str) -> Dict[str, List[Skill]]:
+    # Every member, in the order of the organization, without projects and courses
+    records = members_collection().find(orgname=orgname)
+    if not records and _split_pending(orgname):
+        records = members_collection().find(orgname=orgname)
+    return {r["username"]: [Skill(**s) for s in r["skills"]] for r in _sorted_records(records, lambda r: r["username"])}
+
+def set_member_skills(orgname: str, skills_by_username: Dict[str, List[Skill]]):
+    # Members of the organization only: a member removed meanwhile is not added back
+    members = members_collection()
+
+    written = []
+    for username, skills in skills_by_username.items():
+        value = [s.model_dump(mode="json") for s in skills]
+        if storage.update(members, member_key(orgname, username), lambda data: {**data, "skills": value}) is not None:
+            written.append(username)
+    _touch(orgname, [f"member:{username}" for username in written])
+
+def remove_member(orgname: str, username: str):
+    members_collection().delete(member_key(orgname, username))
+    _touch(orgname, [f"member:{username}"])
+
+def _get_record(collection, orgname: str, key: str) -> dict | None:
+    data = collection.read(key)
+    if data is None and _split_pending(orgname):
+        data = collection.read(key)
+    if data is None or data.get("orgname") != orgname:
+        return None
+    return data
+
+def _save_records(collection, orgname: str, field: str, values: Dict[str, dict]) -> List[tuple[dict | None, dict]]:
+    # The old value is the one replaced by the write (read-modify-write): the reverse index moves from it
+    changes = []
+    for record_id, value in values.items():
+        replaced = {}
+        def apply(data: dict, value=value) -> dict:
+            replaced["old"] = data.get(field)
+            return {**data, "orgname": orgname, field: value}
+
+        storage.update(collection, record_key(record_id), apply, default={"position": time.time_ns()})
+        changes.append((replaced["old"], value))
+    _touch(orgname, [f"{field}:{record_id}" for record_id in values])
+    return changes
+
+def _delete_record(collection, orgname: str, field: str, record_id: str) -> dict | None:
+    old = _get_record(collection, orgname, record_key(record_id))
+    if old is None:
+        return None
+
+    collection.delete(record_key(record_id))
+    _touch(orgname, [f"{field}:{record_id}"])
+    return old
+
+### --- Projects and courses by id: one record read, whatever the size of the organization --- ###
+def get_project(orgname: str, project_id: str) -> Project | None:
+    data = _get_record(projects_collection(), orgname, record_key(project_id))
+    return Project(**data["project"]) if data else None
+
+def get_projects(orgname: str) -> List[Project]:
+    records = projects_collection().find(orgname=orgname)
+    if not records and _split_pending(orgname):
+        records = projects_collection().find(orgname=orgname)
+    return [Project(**r["project"]) for r in _sorted_records(records, lambda r: r["project"]["id"])]
+
+def save_project(orgname: str, project: Project):
+    save_projects(orgname, [project])
+
+def save_projects(orgname: str, projects: List[Project]):
+    values = {str(p.id): p.model_dump(mode="json") for p in projects}
+    _reindex_projects(orgname, _save_records(projects_collection(), orgname, "project", values))
+
+def get_assigned_projects(orgname: str, username: str) -> List[Project]:
+    return _projects_by_ids(orgname, _user_project_ids(orgname, username, "assigned"))
+
+def get_managed_projects(orgname: str, username: str) -> List[Project]:
+    return _projects_by_ids(orgname, _user_project_ids(orgname, username, "managed"))
+
+def _projects_by_ids(orgname: str, project_ids: List[str]) -> List[Project]:
+    projects = [get_project(orgname, project_id) for project_id in project_ids]
+    return [p for p in projects if p is not None]
+
+def get_course(orgname: str, course_id: str) -> Course | None:
+    data = _get_record(courses_collection(), orgname, record_key(course_id))
+    return Course(**data["course"]) if data else None
+
+def save_course(orgname: str, course: Course):
+    _save_records(courses_collection(), orgname, "course", {str(course.id): course.model_dump(mode="json")})
+
+def delete_course(orgname: str, course_id: str) -> bool:
+    return _delete_record(courses_collection(), orgname, "course", course_id) is not None
+
+### --- Read-modify-write of one record: the change runs again on the current version after a conflict --- ###
+def _update_record(collection, orgname: str, record_id: str, field: str, change) -> tuple[dict, dict] | None:
+    # change(record value) -> new value, or None when there is nothing to write. (old value, new value)
+    key = record_key(record_id)
+    if _get_record(collection, orgname, key) is None:
+        return None
+
+    result = {}
+    def apply(data: dict) -> dict | None:
+        if data.get("orgname") != orgname:
+            return None
+        new = change(data[field])
+        result["old"], result["new"] = data[field], new if new is not None else data[field]
+        return {**data, field: new} if new is not None else None
+
+    if storage.update(collection, key, apply) is None or not result:
+        return None
+    return result["old"], result["new"]
+
+def _update_global_gap(orgname: str, old_project: dict, new_project: Project):
+    # Only this project is moved in the global gap, replayed on the current organization: concurrent updates of
+    # other projects are kept. Also the touch of the organization
+    old_skills = crud_skill_models.project_gap_skills(Project(**old_project))
+    new_skills = crud_skill_models.project_gap_skills(new_project)
+    part = f"project:{new_project.id}"
+
+    if new_skills.keys() == old_skills.keys():
+        _touch(orgname, [part])
+    else:
+        _append(orgname, {
+            "op": "gap",
+            "project": [str(new_project.id), new_project.name],
+            "old": sorted(old_skills),
+            "new": new_skills,
+            "parts": [part]
+        })
+
+def update_project(orgname: str, project_id: str, change=None, skill_uris=()) -> Project | None:
+    # change(project) edits the project in place, then its team gap is refreshed (rows of new roles and of
+    # skill_uris) with the current skills of the team. None if the project does not exist.
+    # The returned project is the refreshed one: skill_gap rows hold Skill objects, as after refresh_skill_gap_project
+    refreshed = {}
+    def apply(value: dict) -> dict | None:
+        project = Project(**value)
+        if change is not None:
+            change(project)
+        team = get_member_skills(orgname, project.assigned_members)
+        crud_skill_models.refresh_skill_gap_project(project, team, skill_uris)
+        refreshed["project"] = project
+
+        new = project.model_dump(mode="json")
+        return new if new != value else None
+
+    result = _update_record(projects_collection(), orgname, project_id, "project", apply)
+    if result is None:
+        return None
+
+    old, new = result
+    project = refreshed["project"]
+    if new != old:
+        _reindex_projects(orgname, [(old, new)])
+        _update_global_gap(orgname, old, project)
+    return project
+
+def update_course(orgname: str, course_id: str, change) -> Course | None:
+    # change(course) edits the course in place. None if the course does not exist
+    def apply(value: dict) -> dict | None:
+        course = Course(**value)
+        change(course)
+        new = course.model_dump(mode="json")
+        return new if new != value else None
+
+    result = _update_record(courses_collection(), orgname, course_id, "course", apply)
+    if result is None:
+        return None
+
+    old, new = result
+    if new != old:
+        _touch(orgname, [f"course:{course_id}"])
+    return Course(**new)
+
+### --- Journal compaction --- ###
+_compactor: ThreadPoolExecutor | None = None
+_compacting: set = set()
+_compacting_lock = threading.Lock()
+
+def compact_org(orgname: str, orgs=None, journal=None) -> bool:
+    # Entries of the journal folded into a new snapshot, then dropped. False if there was nothing to do
+    orgs = orgs or orgs_collection()
+    journal = journal or journal_collection()
+
+    data = orgs.read(orgname)
+    if data is None or any(part in data for part in PARTS):
+        return False
+
+    data, version = storage.split_version(data)
+    entries = journal.read(orgname, after=data.get("journal_seq", 0))
+    if not entries:
+        return False
+
+    try:
+        # Entries appended meanwhile have a higher sequence: still replayed on the new snapshot
+        orgs.write(orgname, replay_journal(data, entries), expected_version=version)
+    except storage.VersionConflict:
+        # Snapshot written by another compaction
+        return False
+
+    journal.truncate(orgname, entries[-1][0])
+    return True
+
+def _storage_now():
+    # Collections of a background compaction, resolved when it is scheduled: the thread builds its own
+    # (SQLite connections are per thread)
+    backend, db_path, orgs_dir, journal_dir = config.STORAGE_BACKEND, config.SQLITE_PATH, DATA_DIR_ORGS, DATA_DIR_ORG_JOURNAL
+    def collections():
+        if backend == "sqlite":
+            return storage.SqliteCollection("organizations", db_path), storage.SqliteJournal("org_journal", db_path)
+        return storage.JsonCollection("organizations", orgs_dir), storage.JsonJournal("org_journal", journal_dir)
+    return collections
+
+def _run_compaction(orgname: str, collections):
+    try:
+        compact_org(orgname, *collections())
+    except Exception as e:
+        print(f"Error compacting the journal of {orgname}: {e}")
+    finally:
+        with _compacting_lock:
+            _compacting.discard(orgname)
+
+def schedule_compaction(orgname: str):
+    global _compactor
+    with _compacting_lock:
+        if orgname in _compacting:
+            return
+        _compacting.add(orgname)
+        if _compactor is None:
+            _compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="org_journal")
+        _compactor.submit(_run_compaction, orgname, _storage_now())
+
+def close_compactor():
+    # Waits for the scheduled compactions
+    global _compactor
+    with _compacting_lock:
+        compactor, _compactor = _compactor, None
+    if compactor is not None:
+        compactor.shutdown(wait=True)
+
 ### --- Create Invitation --- ###
 def create_invitation(orgname: str, username: str) -> bool:
     invitation = Invitation(
@@ -96,35 +857,25 @@ def create_invitation(orgname: str, username: str) -> bool:
         status="pending"
     )
 
-    inv_path = os.path.join(DATA_INV_DIR, f"{invitation.id}.json")
-    with open(inv_path, "w", encoding="utf-8") as f:
-        f.write(invitation.model_dump_json(indent=4))
-        return True 
-    
-    return False
+    invitations_collection().write(invitation.id, invitation.model_dump(mode="json"))
+    return True
 
 ### --- Get Invitation By ID --- ###
 def get_inv_by_id(id: str) -> Invitation | None:
-    path = get_inv_json_path(id)
-    if not os.path.exists(path):
-        return None
-    
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return Invitation(**data)
+        data = invitations_collection().read(id)
+        return Invitation(**data) if data is not None else None
     except Exception:
         return None
 
 ### --- Update Invitation --- ###
 def update_invitation(inv: Invitation):
-    path = get_inv_json_path(inv.id)
-    
-    if not os.path.exists(path):
+    invitations = invitations_collection()
+
+    if not invitations.exists(inv.id):
         return
 
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(inv.model_dump_json(indent=4))
+        invitations.write(inv.id, inv.model_dump(mode="json"))
     except Exception as e:
         print(f"Error updating invitation: {e}")
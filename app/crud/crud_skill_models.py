@@ -1,119 +1,484 @@
+from itertools import combinations, islice
+from math import comb
 from typing import Dict, List
-from app.models import Project, Skill, User, Role
+import numpy as np
+from app.models import Organization, Project, Skill, User, Role
+from app.service import config
 
-# Skill gap analysis for a user
-def skill_gap_user(user: User, role_list: List[Role]) -> User:
-    user.skill_gap.clear()
+### --- Batch engine: N people x M roles in one vectorized pass --- ###
+# Skill URIs are interned to integer ids. Roles become padded (M, L) arrays of required skill ids and levels,
+# people become rows of levels over the required skills only (skills no role asks for cannot change a score).
+# Scores are accumulated one required-skill position at a time, in role order, with the same float64 operations
+# of the per-role loop: match_score values are identical to the original formula.
+# score = sum over required skills of: 1 if level >= required, level / required if lower, 0 if missing
+# match_score = int(score / total_required * 100)
+
+class SkillIndex:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.uris: List[str] = []
+
+    def intern(self, uri: str) -> int:
+        skill_id = self.ids.get(uri)
+        if skill_id is None:
+            skill_id = self.ids[uri] = len(self.uris)
+            self.uris.append(uri)
+        return skill_id
+
+    def get(self, uri: str) -> int | None:
+        return self.ids.get(uri)
+
+def role_skills(role: Role) -> List[Skill]:
+    essential_skills = role.essential_skills
+    if isinstance(essential_skills, dict):
+        essential_skills = list(essential_skills.values())
+    return essential_skills
+
+def skill_levels(skills) -> Dict[str, int]:
+    # List of Skill (last one wins, like the user profile) or an already built uri -> level dict
+    if isinstance(skills, dict):
+        return skills
+    return {s.uri: s.level for s in skills}
+
+def team_levels(members_skills: List[List[Skill]]) -> Dict[str, int]:
+    # Best level in the team for every skill
+    levels = {}
+    for skills in members_skills:
+        for s in skills:
+            if s.uri not in levels or s.level > levels[s.uri]:
+                levels[s.uri] = s.level
+    return levels
+
+class BatchSkillGap:
+    def __init__(self, names: List[str], levels: List[Dict[str, int]], roles: List[Role], chunk_size: int = config.SKILL_GAP_CHUNK_SIZE):
+        self.names = names
+        self.levels = levels
+        self.roles = roles
+        self.index = SkillIndex()
+
+        # Roles: (M, L) required skill ids / levels, padded with mask = False
+        required = [role_skills(role) for role in roles]
+        self.role_lengths = np.array([len(skills) for skills in required], dtype=np.int64)
+        width = int(self.role_lengths.max()) if len(roles) else 0
+
+        self.role_skill_ids = np.zeros((len(roles), width), dtype=np.int64)
+        self.role_levels = np.ones((len(roles), width), dtype=np.float64)
+        self.role_mask = np.zeros((len(roles), width), dtype=bool)
+        for m, skills in enumerate(required):
+            for j, req_skill in enumerate(skills):
+                self.role_skill_ids[m, j] = self.index.intern(req_skill.uri)
+                self.role_levels[m, j] = req_skill.level
+                self.role_mask[m, j] = True
+
+        n, m = len(names), len(roles)
+        self.scores = np.zeros((n, m), dtype=np.int64)            # match_score
+        self.matching_counts = np.zeros((n, m), dtype=np.int64)
+        self.partial_counts = np.zeros((n, m), dtype=np.int64)
+        self.missing_counts = np.zeros((n, m), dtype=np.int64)
+
+        for start in range(0, n, max(chunk_size, 1)):
+            self._score_chunk(start, min(start + chunk_size, n))
+
+    def _people_matrix(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        # (chunk, K) levels and presence over the interned skills
+        levels = np.zeros((end - start, len(self.index.uris)), dtype=np.float64)
+        present = np.zeros((end - start, len(self.index.uris)), dtype=bool)
+        for row, person in enumerate(self.levels[start:end]):
+            for uri, level in person.items():
+                skill_id = self.index.get(uri)
+                if skill_id is not None:
+                    levels[row, skill_id] = level
+                    present[row, skill_id] = True
+        return levels, present
+
+    def _accumulate(self, levels: np.ndarray, present: np.ndarray, counts: tuple | None = None) -> np.ndarray:
+        # (rows, M) raw scores of rows of levels over the interned skills, counts = (matching, partial, missing) to fill
+        score = np.zeros((levels.shape[0], len(self.roles)), dtype=np.float64)
+
+        # Same order of additions of the per-role loop: position j of every role at once
+        for j in range(self.role_skill_ids.shape[1]):
+            cols = self.role_skill_ids[:, j]
+            required = self.role_levels[:, j]
+            active = self.role_mask[:, j]
+
+            have = present[:, cols] & active
+            level = levels[:, cols]
+            full = have & (level >= required)
+            partial = have & ~full
+
+            score += np.where(full, 1.0, np.where(partial, level / required, 0.0))
+            if counts is not None:
+                counts[0][...] += full
+                counts[1][...] += partial
+                counts[2][...] += ~have & active
+
+        return score
+
+    def percent(self, score: np.ndarray) -> np.ndarray:
+        totals = self.role_lengths.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(totals > 0, np.trunc(score / totals * 100), 0)
+        return pct.astype(np.int64)
+
+    def _score_chunk(self, start: int, end: int):
+        levels, present = self._people_matrix(start, end)
+        counts = (self.matching_counts[start:end], self.partial_counts[start:end], self.missing_counts[start:end])
+        self.scores[start:end] = self.percent(self._accumulate(levels, present, counts))
 
-    # Create a dictionary for quick lookup of user's current skills by URI
-    user_skills_dict = {s.uri: s.level for s in user.individual_skills}
+    ### --- Same dict of skill_gap_user / skill_gap_project for one (person, role) pair --- ###
+    def role_gap(self, n: int, m: int, level_key: str = "user_level") -> dict:
+        role = self.roles[m]
+        levels = self.levels[n]
 
-    for role in role_list:
         matching = []
         partially_matching = []
         missing = []
-        
-        essential_skills = role.essential_skills
-        total_req = len(essential_skills)
-
-        score = 0.0
-        # 1 point for each fully matched skill
-        # level_user / level_required for partially matched skills
-        # no points for missing skills
-        
-        for req_skill in essential_skills:
-            req_uri = req_skill.uri
-            req_level = req_skill.level
-            
-            if req_skill.uri in user_skills_dict:
-                user_level = user_skills_dict[req_uri]
-                if user_level >= req_level:
-                    matching.append(req_skill)
-                    score += 1.0
-                else:
-                    partial_score = user_level / req_level
-                    score += partial_score
-                    partially_matching.append({
-                        "skill": req_skill,
-                        "user_level": user_level
-                    })
-            else:
+        for req_skill in role_skills(role):
+            if req_skill.uri not in levels:
                 missing.append(req_skill)
+            elif levels[req_skill.uri] >= req_skill.level:
+                matching.append(req_skill)
+            else:
+                partially_matching.append({
+                    "skill": req_skill,
+                    level_key: levels[req_skill.uri]
+                })
 
-        match_pct = int((score / total_req) * 100) if total_req > 0 else 0
-        
-        role_gap_info = {
+        return {
             'role_id': role.id,
+            'role_uri': role.uri,
             'role_title': role.title,
-            'match_score': match_pct,
-            'total_required': total_req,
+            'match_score': int(self.scores[n, m]),
+            'total_required': int(self.role_lengths[m]),
             'matching_skills': matching,
             'partially_matching_skills': partially_matching,
             'missing_skills': missing
         }
-        
-        user.skill_gap.append(role_gap_info)
+
+def batch_skill_gap(people: Dict[str, object], roles: List[Role], chunk_size: int = config.SKILL_GAP_CHUNK_SIZE) -> BatchSkillGap:
+    # people: name -> list of Skill (e.g. Organization.members) or uri -> level dict
+    names = list(people.keys())
+    return BatchSkillGap(names, [skill_levels(people[name]) for name in names], roles, chunk_size)
+
+# Skill gap analysis for a user
+def skill_gap_user(user: User, role_list: List[Role]) -> User:
+    gap = batch_skill_gap({user.username: user.individual_skills}, role_list)
+
+    user.skill_gap.clear()
+    for m in range(len(role_list)):
+        user.skill_gap.append(gap.role_gap(0, m, "user_level"))
 
     return user
 
 # Skill gap analysis for a project team
 def skill_gap_project(project: Project, org_members: Dict[str, List[Skill]]) -> Project:
-    team_skills_dict = {}
-    
-    for username in project.assigned_members:
-        user_org_skills = org_members.get(username, [])
-        
-        for s in user_org_skills:
-            if s.uri not in team_skills_dict or s.level > team_skills_dict[s.uri]:
-                team_skills_dict[s.uri] = s.level
+    # The team is scored as one person with the best level of its members for every skill
+    team = team_levels([org_members.get(username, []) for username in project.assigned_members])
+    gap = batch_skill_gap({project.id: team}, project.target_roles)
 
     project.skill_gap = []
+    for m in range(len(project.target_roles)):
+        project.skill_gap.append(gap.role_gap(0, m, "team_best_level"))
 
-    for role in project.target_roles:
-        matching = []
-        partially_matching = []
-        missing = []
-        
-        essential_skills = role.essential_skills
-        if isinstance(essential_skills, dict):
-            essential_skills = list(essential_skills.values())
-            
-        total_req = len(essential_skills)
-        score = 0.0
-
-        for req_skill in essential_skills:
-            req_uri = req_skill.uri
-            req_level = req_skill.level
-            
-            if req_uri in team_skills_dict:
-                best_team_level = team_skills_dict[req_uri]
-                
-                if best_team_level >= req_level:
-                    matching.append(req_skill)
-                    score += 1.0
-                else:
-                    partial_score = best_team_level / req_level
-                    score += partial_score
-                    partially_matching.append({
-                        "skill": req_skill,
-                        "team_best_level": best_team_level
-                    })
-            else:
-                missing.append(req_skill)
+    return project
 
-        match_pct = int((score / total_req) * 100) if total_req > 0 else 0
-        
-        role_gap_info = {
-            'role_id': role.id,
-            'role_title': role.title,
-            'match_score': match_pct,
-            'total_required': total_req,
-            'matching_skills': matching,
-            'partially_matching_skills': partially_matching,
-            'missing_skills': missing
-        }
-        
-        project.skill_gap.append(role_gap_info)
+### --- Incremental updates of the stored skill_gap rows --- ###
+# Rows are materialized on the user / project (one per target role, keyed by role uri). When the inputs change
+# only the rows of new roles and of roles requiring one of the changed skills are computed again.
+def changed_skill_uris(old_skills, new_skills) -> set:
+    old_levels, new_levels = skill_levels(old_skills), skill_levels(new_skills)
+    return {uri for uri in old_levels.keys() | new_levels.keys() if old_levels.get(uri) != new_levels.get(uri)}
 
-    return project
+def _as_skill(skill) -> Skill:
+    return Skill(**skill) if isinstance(skill, dict) else skill
+
+def _hydrate_row(row: dict) -> dict:
+    # Rows read back from JSON hold dicts instead of Skill objects
+    return {
+        **row,
+        'matching_skills': [_as_skill(s) for s in row.get('matching_skills', [])],
+        'partially_matching_skills': [{**p, 'skill': _as_skill(p['skill'])} for p in row.get('partially_matching_skills', [])],
+        'missing_skills': [_as_skill(s) for s in row.get('missing_skills', [])]
+    }
+
+def _refresh_rows(rows: list, roles: List[Role], levels: Dict[str, int], skill_uris, level_key: str) -> tuple[list, bool]:
+    skill_uris = set(skill_uris)
+    stored = {row.get('role_uri'): row for row in rows if row.get('role_uri') is not None}
+
+    todo = [
+        role for role in roles
+        if role.uri is None or role.uri not in stored or any(s.uri in skill_uris for s in role_skills(role))
+    ]
+
+    computed = {}
+    if todo:
+        gap = BatchSkillGap(["_"], [levels], todo)
+        for m in range(len(todo)):
+            computed[id(todo[m])] = gap.role_gap(0, m, level_key)
+
+    new_rows = [computed[id(role)] if id(role) in computed else _hydrate_row(stored[role.uri]) for role in roles]
+    changed = bool(todo) or [r.get('role_uri') for r in rows] != [r['role_uri'] for r in new_rows]
+    return new_rows, changed
+
+def refresh_skill_gap_user(user: User, skill_uris=()) -> bool:
+    # True if user.skill_gap changed and the user has to be saved
+    rows, changed = _refresh_rows(user.skill_gap, user.target_roles, skill_levels(user.individual_skills), skill_uris, "user_level")
+    user.skill_gap = rows
+    return changed
+
+def refresh_skill_gap_project(project: Project, org_members: Dict[str, List[Skill]], skill_uris=()) -> bool:
+    team = team_levels([org_members.get(username, []) for username in project.assigned_members])
+    rows, changed = _refresh_rows(project.skill_gap, project.target_roles, team, skill_uris, "team_best_level")
+    project.skill_gap = rows
+    return changed
+
+### --- Organization global gap: missing / partial skills across all projects --- ###
+# Stored on the organization and updated only for the project whose gap changed
+def project_gap_skills(project: Project) -> Dict[str, str]:
+    # uri -> name, rows may hold dicts (read from JSON) or Skill objects
+    skills = {}
+    for gap_entry in project.skill_gap:
+        missing = gap_entry.get("missing_skills", [])
+        partial = [p["skill"] for p in gap_entry.get("partially_matching_skills", [])]
+
+        for skill in missing + partial:
+            uri = skill["uri"] if isinstance(skill, dict) else skill.uri
+            name = skill["name"] if isinstance(skill, dict) else skill.name
+            skills.setdefault(uri, name)
+    return skills
+
+def _add_project_to_global_gap(global_gap: dict, project_id: str, project_name: str, skills: Dict[str, str]):
+    for uri, name in skills.items():
+        entry = global_gap.setdefault(uri, {"name": name, "count": 0, "projects": [], "project_ids": []})
+        entry["count"] += 1
+        entry["projects"].append(project_name)
+        entry["project_ids"].append(project_id)
+
+def _remove_project_from_global_gap(global_gap: dict, project_id: str, uris):
+    for uri in uris:
+        entry = global_gap.get(uri)
+        if not entry or project_id not in entry["project_ids"]:
+            continue
+
+        i = entry["project_ids"].index(project_id)
+        del entry["project_ids"][i]
+        del entry["projects"][i]
+        entry["count"] -= 1
+        if entry["count"] == 0:
+            del global_gap[uri]
+
+def _sorted_global_gap(global_gap: dict) -> dict:
+    return dict(sorted(global_gap.items(), key=lambda item: item[1]["count"], reverse=True))
+
+def rebuild_global_gap(org: Organization) -> dict:
+    global_gap = {}
+    for project in org.projects:
+        _add_project_to_global_gap(global_gap, str(project.id), project.name, project_gap_skills(project))
+
+    org.global_gap = _sorted_global_gap(global_gap)
+    return org.global_gap
+
+def refresh_org_project_gap(org: Organization, project: Project, skill_uris=()) -> bool:
+    # refresh_skill_gap_project + org.global_gap kept in sync, True if the org has to be saved
+    old_skills = project_gap_skills(project)
+    changed = refresh_skill_gap_project(project, org.members, skill_uris)
+    if not changed:
+        return False
+
+    if org.global_gap is None:
+        rebuild_global_gap(org)
+        return True
+
+    move_project_in_global_gap(org, project, old_skills)
+    return True
+
+def move_project_in_global_gap(org: Organization, project: Project, old_skills: Dict[str, str]):
+    # old_skills: project_gap_skills of the project before its gap changed
+    new_skills = project_gap_skills(project)
+    if org.global_gap is not None and new_skills.keys() != old_skills.keys():
+        org.global_gap = apply_global_gap_change(org.global_gap, str(project.id), project.name, old_skills.keys(), new_skills)
+
+def apply_global_gap_change(global_gap: dict, project_id: str, project_name: str, old_uris, new_skills: Dict[str, str]) -> dict:
+    # Also on the stored JSON (organization journal replay)
+    _remove_project_from_global_gap(global_gap, project_id, old_uris)
+    _add_project_to_global_gap(global_gap, project_id, project_name, new_skills)
+    return _sorted_global_gap(global_gap)
+
+# Every member of the organization against every target role of its projects
+def org_match_matrix(org: Organization, top: int = 10) -> dict:
+    # Same role in several projects is scored once. Roles are keyed by ESCO uri: the ISCO code in id is shared by
+    # every occupation of the group, it is the key only for roles without uri
+    roles, role_projects = [], []
+    keys = {}
+    for project in org.projects:
+        for role in project.target_roles:
+            key = role.uri or role.id
+            if key not in keys:
+                keys[key] = len(roles)
+                roles.append(role)
+                role_projects.append([])
+            role_projects[keys[key]].append(project.name)
+
+    gap = batch_skill_gap(org.members, roles)
+    scores = gap.scores
+
+    # Best first, ties keep members / roles order
+    by_role = np.argsort(-scores, axis=0, kind="stable")[:top]       # (top, M) member rows
+    by_member = np.argsort(-scores, axis=1, kind="stable")[:, :top]  # (N, top) role columns
+
+    return {
+        "roles": [
+            {
+                "role_id": role.id,
+                "role_title": role.title,
+                "projects": role_projects[m],
+                "total_required": int(gap.role_lengths[m]),
+                "candidates": [
+                    {
+                        "username": gap.names[n],
+                        "match_score": int(scores[n, m]),
+                        "missing": int(gap.missing_counts[n, m])
+                    }
+                    for n in by_role[:, m]
+                ]
+            }
+            for m, role in enumerate(roles)
+        ],
+        "members": [
+            {
+                "username": name,
+                "roles": [
+                    {
+                        "role_id": roles[m].id,
+                        "role_title": roles[m].title,
+                        "match_score": int(scores[n, m])
+                    }
+                    for m in by_member[n]
+                ]
+            }
+            for n, name in enumerate(gap.names)
+        ]
+    }
+
+### --- Team composition optimizer --- ###
+# Suggests members for a project. A team is scored with the rule of skill_gap_project (best member level for every
+# skill), the objective is the sum over the target roles of score / total_required (match_score before truncation).
+# - greedy: adds the member with the largest gain until nothing improves (or k members)
+# - exact:  smallest team reaching the best possible score (or best team of at most k), by enumerating combinations
+#           of the useful, non-dominated members. Over exact_limit combinations the greedy team is returned.
+OPTIMIZER_BATCH = 4096
+
+def _objective(gap: BatchSkillGap, levels: np.ndarray, present: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    score = gap._accumulate(levels, present)
+    totals = gap.role_lengths.astype(np.float64)
+    ratios = np.divide(score, totals, out=np.zeros_like(score), where=totals > 0)
+    return ratios.sum(axis=1), score
+
+def _greedy_team(gap: BatchSkillGap, levels: np.ndarray, present: np.ndarray, candidates: List[int], size: int) -> List[int]:
+    team, best_value = [], 0.0
+    team_levels = np.zeros(levels.shape[1])
+    team_present = np.zeros(levels.shape[1], dtype=bool)
+
+    while len(team) < size:
+        rest = [i for i in candidates if i not in team]
+        if not rest:
+            break
+        values, _ = _objective(gap, np.maximum(team_levels, levels[rest]), team_present | present[rest])
+        best = int(np.argmax(values))   # first best: ties keep members order
+        if values[best] <= best_value:
+            break
+        best_value = values[best]
+        team.append(rest[best])
+        team_levels = np.maximum(team_levels, levels[rest[best]])
+        team_present = team_present | present[rest[best]]
+
+    return team
+
+def _useful_members(gap: BatchSkillGap, levels: np.ndarray, present: np.ndarray) -> List[int]:
+    values, _ = _objective(gap, levels, present)
+    return [int(i) for i in np.flatnonzero(values > 0)]
+
+def _non_dominated(gap: BatchSkillGap, levels: np.ndarray, present: np.ndarray, candidates: List[int]) -> List[int]:
+    # Levels above the highest required one count the same: members matched or beaten on every skill are dropped.
+    # Best totals first, so a member can only be dominated by one already kept (first of two equal ones is kept).
+    cap = np.zeros(levels.shape[1])
+    np.maximum.at(cap, gap.role_skill_ids[gap.role_mask], gap.role_levels[gap.role_mask])
+    capped = np.minimum(np.where(present, levels, 0.0), cap)
+
+    order = sorted(candidates, key=lambda i: -capped[i].sum())
+    kept = []
+    for i in order:
+        if not kept or not np.any(np.all(capped[kept] >= capped[i], axis=1)):
+            kept.append(i)
+    return sorted(kept)
+
+def _exact_team(gap: BatchSkillGap, levels: np.ndarray, present: np.ndarray, candidates: List[int], size: int, limit: int) -> List[int] | None:
+    # None when the search needs more than limit combinations
+    target, _ = _objective(gap, levels[candidates].max(axis=0, initial=0.0)[None], present[candidates].any(axis=0)[None])
+    best_team, best_value, evaluated = [], 0.0, 0
+
+    for k in range(1, min(size, len(candidates)) + 1):
+        evaluated += comb(len(candidates), k)
+        if evaluated > limit:
+            return None
+
+        teams = combinations(candidates, k)
+        while True:
+            batch = np.array(list(islice(teams, OPTIMIZER_BATCH)), dtype=np.intp)
+            if len(batch) == 0:
+                break
+            values, _ = _objective(gap, levels[batch].max(axis=1), present[batch].any(axis=1))
+            best = int(np.argmax(values))
+            if values[best] > best_value:
+                best_team, best_value = [int(i) for i in batch[best]], values[best]
+
+        if best_value >= target[0]:
+            break
+
+    return best_team
+
+def optimize_team(
+    project: Project,
+    org_members: Dict[str, List[Skill]],
+    mode: str = "greedy",
+    k: int | None = None,
+    exact_limit: int = config.TEAM_OPTIMIZER_EXACT_LIMIT
+) -> dict:
+    names = list(org_members.keys())
+    gap = batch_skill_gap(org_members, project.target_roles)
+    levels, present = gap._people_matrix(0, len(names))
+    size = k if k is not None else len(names)
+
+    candidates = _useful_members(gap, levels, present) if names and project.target_roles else []
+
+    exact = False
+    team = None
+    if mode == "exact":
+        team = _exact_team(gap, levels, present, _non_dominated(gap, levels, present, candidates), size, exact_limit)
+        exact = team is not None
+    if team is None:
+        team = _greedy_team(gap, levels, present, candidates, size)
+
+    def role_scores(rows: List[int]) -> List[int]:
+        _, score = _objective(gap, levels[rows].max(axis=0, initial=0.0)[None], present[rows].any(axis=0)[None])
+        return gap.percent(score)[0].tolist()
+
+    scores = role_scores(team)
+    best_scores = role_scores(list(range(len(names))))
 
+    return {
+        "mode": "exact" if exact else "greedy",
+        "exact_fallback": mode == "exact" and not exact,
+        "members": [names[i] for i in team],
+        "roles": [
+            {
+                "role_id": role.id,
+                "role_title": role.title,
+                "match_score": scores[m],
+                "best_match_score": best_scores[m]
+            }
+            for m, role in enumerate(project.target_roles)
+        ],
+        "match_score": int(np.mean(scores)) if scores else 0,
+        "best_match_score": int(np.mean(best_scores)) if best_scores else 0
+    }
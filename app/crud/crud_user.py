@@ -3,6 +3,7 @@ import os
 
 from pydantic_core import ValidationError
 from app.models import User, Invitation
+from app.crud import storage, model_cache
 from typing import List
 
 DATA_DIR_USERS = "data/users"
@@ -10,37 +11,41 @@ os.makedirs(DATA_DIR_USERS, exist_ok=True)
 
 DATA_INV_DIR = "data/invitations"
 
-### --- User GET path --- ###
-def get_json_path(username: str) -> str:
-    return os.path.join(DATA_DIR_USERS, f"{username}.json")
+USER_INDEXES = ("organization",)
+# (username, status) -> the pending invitations of a user, without scanning every invitation
+INVITATION_INDEXES = (("username", "status"), "orgname")
 
-### --- Create User --- ###    
+### --- Storage collections --- ###
+def users_collection():
+    return storage.get_collection("users", DATA_DIR_USERS, USER_INDEXES)
+
+def invitations_collection():
+    return storage.get_collection("invitations", DATA_INV_DIR, INVITATION_INDEXES)
+
+### --- Create User --- ###
 def create_user(user: User):
-    if os.path.exists(get_json_path(user.username)):
+    users = users_collection()
+    try:
+        # Version 0: only if nobody registered the same username meanwhile
+        version = users.write(user.username, user.model_dump(mode="json"), expected_version=0)
+    except storage.VersionConflict:
         raise ValueError("Username already exists")
-
-    file_path = os.path.join(DATA_DIR_USERS, f"{user.username}.json")
-    with open(file_path, "w") as f:
-        f.write(json.dumps(user.model_dump(), indent=4))
+    model_cache.store(users, user.username, user, version)
 
     return user
 
 ### --- Change Password --- ###
 def change_password_user(user: User, new_pw: str) -> bool:
-    path = get_json_path(user.username)
-    
-    if not os.path.exists(path):
-        return False
-    
+    users = users_collection()
+
     try:
-        with open(path, "r") as f:
-            data = json.load(f)
+        # Only this field: changes of the profile made meanwhile are kept
+        data = storage.update(users, user.username, lambda data: {**data, "hashed_password": new_pw})
+        if data is None:
+            return False
 
-        data["hashed_password"] = new_pw
+        model_cache.invalidate(users, user.username)
 
-        with open(path, "w") as f:
-            json.dump(data, f, indent=4)
-        
         return True
 
     except Exception as e:
@@ -48,81 +53,73 @@ def change_password_user(user: User, new_pw: str) -> bool:
 
 ### --- Update User Profile --- ###
 def update_user(user: User):
-    path = get_json_path(user.username)
-    
-    if not os.path.exists(path):
+    users = users_collection()
+
+    if not users.exists(user.username):
         return
 
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(user.model_dump(), f, indent=4)
+        # Changes made by other requests since the user was loaded are merged, not overwritten
+        version, base = user._stored or (None, None)
+        version, data = storage.save_changes(
+            users, user.username, user.model_dump(mode="json"), json.loads(base) if base else None, version
+        )
+        if data != user.model_dump(mode="json"):
+            # Merged with the changes of other requests: the object is brought up to date
+            for field, value in User(**data):
+                setattr(user, field, value)
+        model_cache.store(users, user.username, user, version)
+    except storage.VersionConflict:
+        raise
     except Exception as e:
         print(f"Error updating user: {e}")
 
 ### --- Get USER --- ###
 def get_user_by_username(username: str) -> User | None:
-    path = os.path.join(DATA_DIR_USERS, f"{username}.json")
-    if not os.path.exists(path):
-        return None
-    
-    with open(path, "r") as f:
-        data = json.load(f)
-        return User(**data)
+    return model_cache.load(users_collection(), username, User)
 
 def get_users_by_usernames(usernames_list: list[str]) -> list[User]:
     found_users = []
     for username in usernames_list:
         try:
             user = get_user_by_username(username)
-            
+
             if user is not None:
                 found_users.append(user)
             else:
                 print(f"❌ Error with user '{username}'")
-                
+
         except ValueError as e:
             print(f"❌ Error with user '{username}': {e}")
             continue
-            
+
     return found_users
 
 ### --- CRUD: Get All --- ###
 def get_all_users() -> List[User]:
     all_users = []
-    
-    if not os.path.exists(DATA_DIR_USERS):
-        return []
-
-    for filename in os.listdir(DATA_DIR_USERS):
-        if filename.endswith(".json"):
-            username = filename[:-5] # removing .json for username
-            org = get_user_by_username(username)
-            if org:
-                all_users.append(org)
-                
+
+    for data in users_collection().read_all():
+        try:
+            all_users.append(User(**data))
+        except ValidationError as e:
+            print(f"Error trying to read user {data.get('username')}: {e}")
+
     return all_users
 
 ### --- Get Pending Invitations for User --- ###
 def get_pending_invitations_for_user(username: str) -> list[Invitation]:
     invitations = []
-    
-    if not os.path.exists(DATA_INV_DIR):
-        return invitations
-    
-    for filename in os.listdir(DATA_INV_DIR):
-        if filename.endswith(".json"):
-            path = os.path.join(DATA_INV_DIR, filename)
-            
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    
-                    if data.get("username") == username and data.get("status") == "pending":
-                        invitation_obj = Invitation(**data) 
-                        invitations.append(invitation_obj)
-                        
-            except (json.JSONDecodeError, ValidationError) as e:
-                print(f"Error trying to read {filename}: {e}")
-                continue
-                
-    return invitations
\ No newline at end of file
+
+    for data in invitations_collection().find(username=username, status="pending"):
+        try:
+            invitations.append(Invitation(**data))
+        except ValidationError as e:
+            print(f"Error trying to read invitation {data.get('id')}: {e}")
+            continue
+
+    return invitations
+
+### --- Rebuild Invitation Index (after editing data/invitations by hand) --- ###
+def rebuild_invitation_index():
+    invitations_collection().rebuild_indexes()
@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from pydantic import BaseModel
+from app.crud import storage
+from app.service import config
+
+# Parsed User / Organization models, shared between requests.
+# Entries are checked against the storage stamp (mtime/inode/size for JSON files), so edits made
+# outside the app are picked up; writes done through the crud layer refresh the entry directly.
+# A hit skips the read of the document (JSON backend), the model is still rebuilt with model_validate_json
+# so that handlers can modify it freely (measured faster than model_copy(deep=True) of a cached model).
+# The version of the document is kept with the JSON (model._stored): writes are compare-and-swap.
+
+### --- Per request dedup: same document -> same object for the whole request --- ###
+_request_models: ContextVar[dict | None] = ContextVar("request_models", default=None)
+
+def begin_request():
+    return _request_models.set({})
+
+def end_request(token):
+    _request_models.reset(token)
+
+def leave_request():
+    # Long running tasks (background jobs) must see the changes made by other requests
+    _request_models.set(None)
+
+def get_scoped(cache_key: str):
+    scope = _request_models.get()
+    return scope.get(cache_key) if scope is not None else None
+
+def store_scoped(cache_key: str, model: BaseModel):
+    scope = _request_models.get()
+    if scope is not None:
+        scope[cache_key] = model
+
+### --- Bounded LRU of validated JSON, keyed by document --- ###
+class ModelCache:
+    def __init__(self, max_entries: int = config.MODEL_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[object, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, stamp, raw):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (stamp, raw)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+models = ModelCache()
+
+### --- Used by the crud getters and writers --- ###
+def load(collection, key: str, model_cls: type[BaseModel]):
+    cache_key = collection.cache_key(key)
+
+    scope = _request_models.get()
+    if scope is not None and cache_key in scope:
+        return scope[cache_key]
+
+    stamp = collection.stamp(key)
+    if stamp is None:
+        models.invalidate(cache_key)
+        return None
+
+    cached = models.get(cache_key, stamp)
+    if cached is not None:
+        raw, version = cached
+        model = model_cls.model_validate_json(raw)
+    else:
+        data = collection.read(key)
+        if data is None:
+            return None
+        data, version = storage.split_version(data)
+        model = model_cls(**data)
+        raw = model.model_dump_json()
+        # Stamp taken before reading: a concurrent write only causes a miss next time
+        models.set(cache_key, stamp, (raw, version))
+
+    model._stored = (version, raw)
+    if scope is not None:
+        scope[cache_key] = model
+    return model
+
+def store(collection, key: str, model: BaseModel, version: int):
+    # Write-through, called right after the document has been saved with this version through the same collection.
+    # The stamp is the one taken by the write: a stamp read now could already belong to the write of another request
+    cache_key = collection.cache_key(key)
+    raw = model.model_dump_json()
+    model._stored = (version, raw)
+
+    stamp = collection.written_stamp(key, version)
+    if stamp is None:
+        models.invalidate(cache_key)
+    else:
+        models.set(cache_key, stamp, (raw, version))
+
+    scope = _request_models.get()
+    if scope is not None:
+        scope[cache_key] = model
+
+def invalidate(collection, key: str):
+    cache_key = collection.cache_key(key)
+    models.invalidate(cache_key)
+
+    scope = _request_models.get()
+    if scope is not None:
+        scope.pop(cache_key, None)
@@ -0,0 +1,656 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from app.service import config
+
+# A collection is a set of JSON documents identified by a key (username, orgname, invitation id, ...).
+# The crud modules only talk to collections, the backend is chosen with config.STORAGE_BACKEND:
+# - "json":   one file per document in a directory (default, data/users/<username>.json, ...)
+# - "sqlite": one row per document in a single database, with indexes on the fields used for lookups
+# Indexes are declared per collection as field names or tuples of fields (composite), e.g. (("username", "status"), "orgname")
+
+def normalize_indexes(indexes) -> list[tuple[str, ...]]:
+    return [(spec,) if isinstance(spec, str) else tuple(spec) for spec in indexes]
+
+def best_index(indexes: list[tuple[str, ...]], criteria: dict) -> tuple[str, ...] | None:
+    # Index covering the most criteria fields
+    usable = [fields for fields in indexes if set(fields) <= set(criteria)]
+    return max(usable, key=len) if usable else None
+
+def _matches(data: dict, criteria: dict) -> bool:
+    return all(data.get(f) == v for f, v in criteria.items())
+
+### --- Versions: compare-and-swap writes --- ###
+# Every write stores the document with "_version" = previous version + 1 (0 = not existing).
+# write(key, data, expected_version=n) fails with VersionConflict if somebody else wrote it after version n was read,
+# delete(key, expected_version=n) as well.
+VERSION_FIELD = "_version"
+
+# Returned by the change of update(): the document is deleted
+DELETE = object()
+
+class VersionConflict(Exception):
+    def __init__(self, collection: str, key: str, expected: int | None, current: int | None):
+        super().__init__(f"{collection}/{key} changed meanwhile (read version {expected}, now {current})")
+        self.collection = collection
+        self.key = key
+
+def split_version(data: dict) -> tuple[dict, int]:
+    data = dict(data)
+    return data, data.pop(VERSION_FIELD, 0)
+
+def _backoff(attempt: int):
+    time.sleep(random.uniform(0, 0.001 * 2 ** min(attempt, 6)))
+
+def update(collection, key: str, change, retries: int | None = None, default: dict | None = None) -> dict | None:
+    # Read-modify-write: change(document) returns the new document (None = nothing to write, DELETE = delete it).
+    # On a conflict it runs again on the current version. A missing document is created from default if given,
+    # otherwise None is returned (also after a delete)
+    retries = config.STORAGE_CAS_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        data = collection.read(key)
+        if data is None and default is None:
+            return None
+
+        data, version = split_version(data if data is not None else default)
+        new = change(data)
+        if new is None:
+            return data if version else None
+
+        try:
+            if new is DELETE:
+                if version:
+                    collection.delete(key, expected_version=version)
+                return None
+            collection.write(key, new, expected_version=version)
+            return new
+        except VersionConflict:
+            if attempt == retries:
+                raise
+            _backoff(attempt)
+
+def merge_changes(base: dict, mine: dict, current: dict) -> dict:
+    # My changes (mine vs base) applied on top of the current document, nested documents field by field.
+    # The same field changed in different ways by both: conflict
+    merged = dict(current)
+    for field in base.keys() | mine.keys():
+        old, new, now = base.get(field), mine.get(field), current.get(field)
+        if new == old or new == now:
+            continue
+        if now != old:
+            if isinstance(old, dict) and isinstance(new, dict) and isinstance(now, dict):
+                merged[field] = merge_changes(old, new, now)
+                continue
+            raise VersionConflict("", field, None, None)
+
+        if field in mine:
+            merged[field] = new
+        else:
+            merged.pop(field, None)
+    return merged
+
+def save_changes(collection, key: str, data: dict, base: dict | None, version: int | None, retries: int | None = None) -> tuple[int, dict]:
+    # Write of a document read at `version` (with content `base`). If it changed meanwhile, the changes made
+    # since `base` are merged into the current document and the write is attempted again. No version: plain write.
+    # (new version, document written)
+    if version is None or base is None:
+        return collection.write(key, data), data
+
+    retries = config.STORAGE_CAS_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return collection.write(key, data, expected_version=version), data
+        except VersionConflict:
+            if attempt == retries:
+                raise
+            current = collection.read(key)
+            if current is None:
+                raise
+
+            current, version = split_version(current)
+            try:
+                data = merge_changes(base, data, current)
+            except VersionConflict:
+                raise VersionConflict(collection.name, key, version, version)
+            base = current
+            _backoff(attempt)
+
+### --- JSON backend --- ###
+# Documents are written to a temporary file and renamed: a reader in another thread (or a crash) never sees half
+# a file. The version check and the rename of a document are done under its own lock (striped, no global lock);
+# writes of a directory with indexes are also serialized, so the index files are updated by one thread at a time.
+# Versions are checked within one process: with several workers use the SQLite backend.
+_document_locks = [threading.RLock() for _ in range(256)]
+
+def document_lock(path: str) -> threading.RLock:
+    return _document_locks[hash(path) % len(_document_locks)]
+
+_directory_locks: dict[str, threading.RLock] = {}
+_directory_locks_guard = threading.Lock()
+
+def directory_lock(directory: str) -> threading.RLock:
+    with _directory_locks_guard:
+        lock = _directory_locks.get(directory)
+        if lock is None:
+            lock = _directory_locks[directory] = threading.RLock()
+        return lock
+
+class JsonCollection:
+    def __init__(self, name: str, directory: str, indexes=()):
+        self.name = name
+        self.directory = directory
+        self.indexes = normalize_indexes(indexes)
+        # Secondary indexes live next to the data: data/invitations -> data/invitations.index
+        self.index_dir = directory.rstrip("/\\") + ".index"
+        self.lock = directory_lock(os.path.abspath(directory))
+        # key -> (version, stamp) of the last write done through this collection
+        self._written: dict[str, tuple[int, tuple]] = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def cache_key(self, key: str) -> str:
+        return self.path(key)
+
+    def stamp(self, key: str) -> tuple | None:
+        # Changes whenever the file is rewritten or replaced, also by hand
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def written_stamp(self, key: str, version: int) -> tuple | None:
+        # Stamp taken by write() under the document lock, None if this version was not written here
+        written = self._written.get(key)
+        return written[1] if written is not None and written[0] == version else None
+
+    def read(self, key: str) -> dict | None:
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write(self, key: str, data: dict, expected_version: int | None = None) -> int:
+        path = self.path(key)
+        with document_lock(os.path.abspath(path)), (self.lock if self.indexes else nullcontext()):
+            old = self._before_change(key)
+            version = old.get(VERSION_FIELD, 0) if old is not None else 0
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(self.name, key, expected_version, version)
+
+            data = {**data, VERSION_FIELD: version + 1}
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._written[key] = (version + 1, self.stamp(key))
+
+            if self.indexes:
+                self._update_indexes(key, old, data)
+            return version + 1
+
+    def delete(self, key: str, expected_version: int | None = None):
+        with document_lock(os.path.abspath(self.path(key))), self.lock:
+            if not self.exists(key):
+                if expected_version:
+                    raise VersionConflict(self.name, key, expected_version, 0)
+                return
+
+            old = self._before_change(key)
+            version = old.get(VERSION_FIELD, 0) if old is not None else 0
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(self.name, key, expected_version, version)
+            os.remove(self.path(key))
+            self._written.pop(key, None)
+
+            if self.indexes:
+                self._update_indexes(key, old, None)
+
+    def keys(self) -> list[str]:
+        if not os.path.exists(self.directory):
+            return []
+        return [filename[:-5] for filename in os.listdir(self.directory) if filename.endswith(".json")]
+
+    def read_all(self) -> list[dict]:
+        documents = []
+        for key in self.keys():
+            try:
+                data = self.read(key)
+            except json.JSONDecodeError as e:
+                print(f"Error trying to read {self.path(key)}: {e}")
+                continue
+            if data is not None:
+                documents.append(data)
+        return documents
+
+    def find(self, **criteria) -> list[dict]:
+        fields = best_index(self.indexes, criteria)
+        if fields is None:
+            # No index for these fields: full scan
+            return [d for d in self.read_all() if _matches(d, criteria)]
+
+        if not self._indexes_fresh():
+            with self.lock:
+                if not self._indexes_fresh():
+                    self.rebuild_indexes()
+
+        documents = []
+        for key in self._read_index_keys(fields, [criteria[f] for f in fields]):
+            try:
+                data = self.read(key)
+            except json.JSONDecodeError:
+                continue
+            # Index entries are hints, the document itself is always checked
+            if data is not None and _matches(data, criteria):
+                documents.append(data)
+        return documents
+
+    ### --- Secondary indexes: one small file per indexed value, listing the matching keys --- ###
+    def _index_path(self, fields: tuple[str, ...], values: list) -> str:
+        digest = hashlib.sha1(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return os.path.join(self.index_dir, "+".join(fields), f"{digest}.json")
+
+    def _read_index_keys(self, fields: tuple[str, ...], values: list) -> list[str]:
+        try:
+            with open(self._index_path(fields, values), "r", encoding="utf-8") as f:
+                return json.load(f)["keys"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return []
+
+    def _write_index_keys(self, fields: tuple[str, ...], values: list, keys: list[str]):
+        path = self._index_path(fields, values)
+        if not keys:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"values": values, "keys": keys}, f, ensure_ascii=False)
+
+    def _directory_stamp(self) -> int:
+        return os.stat(self.directory).st_mtime_ns
+
+    def _indexes_fresh(self) -> bool:
+        # Files added or removed behind our back change the directory mtime -> rebuild
+        try:
+            with open(os.path.join(self.index_dir, "_stamp.json"), "r", encoding="utf-8") as f:
+                return json.load(f)["stamp"] == self._directory_stamp()
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return False
+
+    def _save_stamp(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(os.path.join(self.index_dir, "_stamp.json"), "w", encoding="utf-8") as f:
+            json.dump({"stamp": self._directory_stamp()}, f)
+
+    def _before_change(self, key: str) -> dict | None:
+        # Old version of the document: its version is checked, its index entries are moved after the write
+        if self.indexes and not self._indexes_fresh():
+            self.rebuild_indexes()
+        try:
+            return self.read(key)
+        except json.JSONDecodeError:
+            return None
+
+    def _update_indexes(self, key: str, old: dict | None, new: dict | None):
+        for fields in self.indexes:
+            old_values = [old.get(f) for f in fields] if old is not None else None
+            new_values = [new.get(f) for f in fields] if new is not None else None
+            if old_values == new_values:
+                continue
+
+            if old_values is not None:
+                keys = self._read_index_keys(fields, old_values)
+                self._write_index_keys(fields, old_values, [k for k in keys if k != key])
+            if new_values is not None:
+                keys = self._read_index_keys(fields, new_values)
+                if key not in keys:
+                    self._write_index_keys(fields, new_values, keys + [key])
+
+        self._save_stamp()
+
+    def rebuild_indexes(self):
+        if os.path.exists(self.index_dir):
+            shutil.rmtree(self.index_dir)
+        if not self.indexes:
+            return
+
+        entries: dict[tuple, list[str]] = {}
+        for key in self.keys():
+            try:
+                data = self.read(key)
+            except json.JSONDecodeError:
+                continue
+            for fields in self.indexes:
+                values = [data.get(f) for f in fields]
+                entries.setdefault((fields, json.dumps(values, ensure_ascii=False)), []).append(key)
+
+        for (fields, values), keys in entries.items():
+            self._write_index_keys(fields, json.loads(values), keys)
+
+        self._save_stamp()
+
+### --- SQLite backend --- ###
+# One connection per thread (WAL mode: readers never wait for the writer)
+_local = threading.local()
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (collection, key)
+            );
+            CREATE TABLE IF NOT EXISTS document_index (
+                collection TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                key TEXT NOT NULL,
+                PRIMARY KEY (collection, field, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_document_index_value
+                ON document_index (collection, field, value);
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                stream TEXT NOT NULL,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_journal_stream
+                ON journal (stream, seq);
+        """)
+        connections[db_path] = conn
+    return conn
+
+def close_connections():
+    connections = getattr(_local, "connections", {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+class SqliteCollection:
+    def __init__(self, name: str, db_path: str, indexes=()):
+        self.name = name
+        self.indexes = normalize_indexes(indexes)
+        self.db_path = db_path
+        self.conn = get_connection(db_path)
+        self._written: dict[str, tuple[int, str]] = {}
+
+    def exists(self, key: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM documents WHERE collection = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        return row is not None
+
+    def cache_key(self, key: str) -> str:
+        return f"{self.db_path}:{self.name}/{key}"
+
+    def stamp(self, key: str) -> str | None:
+        # The stored text itself: the row is read anyway, a hit only skips json.loads and the dict validation
+        row = self.conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def written_stamp(self, key: str, version: int) -> str | None:
+        # Text stored by write() in its transaction, None if this version was not written here
+        written = self._written.get(key)
+        return written[1] if written is not None and written[0] == version else None
+
+    def read(self, key: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write(self, key: str, data: dict, expected_version: int | None = None) -> int:
+        # Version check, document and index rows in the same transaction (also between processes)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT json_extract(data, '$._version') FROM documents WHERE collection = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            version = (row[0] or 0) if row else 0
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(self.name, key, expected_version, version)
+
+            data = {**data, VERSION_FIELD: version + 1}
+            text = json.dumps(data, ensure_ascii=False)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (collection, key, data) VALUES (?, ?, ?)",
+                (self.name, key, text)
+            )
+            for fields in self.indexes:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO document_index (collection, field, value, key) VALUES (?, ?, ?, ?)",
+                    (self.name, "+".join(fields), json.dumps([data.get(f) for f in fields]), key)
+                )
+            self.conn.execute("COMMIT")
+            self._written[key] = (version + 1, text)
+            return version + 1
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key: str, expected_version: int | None = None):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if expected_version is not None:
+                row = self.conn.execute(
+                    "SELECT json_extract(data, '$._version') FROM documents WHERE collection = ? AND key = ?", (self.name, key)
+                ).fetchone()
+                version = (row[0] or 0) if row else 0
+                if expected_version != version:
+                    raise VersionConflict(self.name, key, expected_version, version)
+            self.conn.execute("DELETE FROM documents WHERE collection = ? AND key = ?", (self.name, key))
+            self.conn.execute("DELETE FROM document_index WHERE collection = ? AND key = ?", (self.name, key))
+            self.conn.execute("COMMIT")
+            self._written.pop(key, None)
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def keys(self) -> list[str]:
+        rows = self.conn.execute("SELECT key FROM documents WHERE collection = ?", (self.name,)).fetchall()
+        return [r[0] for r in rows]
+
+    def read_all(self) -> list[dict]:
+        rows = self.conn.execute("SELECT data FROM documents WHERE collection = ?", (self.name,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def find(self, **criteria) -> list[dict]:
+        fields = best_index(self.indexes, criteria)
+
+        if fields is None:
+            documents = self.read_all()
+        else:
+            rows = self.conn.execute(
+                """SELECT d.data FROM document_index i
+                   JOIN documents d ON d.collection = i.collection AND d.key = i.key
+                   WHERE i.collection = ? AND i.field = ? AND i.value = ?""",
+                (self.name, "+".join(fields), json.dumps([criteria[f] for f in fields]))
+            ).fetchall()
+            documents = [json.loads(r[0]) for r in rows]
+
+        return [d for d in documents if _matches(d, criteria)]
+
+    def rebuild_indexes(self):
+        # Index rows are written in the same transaction of their document, nothing to rebuild
+        return
+
+### --- Journals: append-only streams of small entries --- ###
+# One stream per key. Entries get increasing sequence numbers: a snapshot built from a stream records the last
+# sequence it contains, truncate(key, seq) then drops the entries up to it (compaction).
+# - JsonJournal:   one JSON line per entry in <directory>/<key>.jsonl, appended (never rewritten, except by truncate)
+# - SqliteJournal: one row per entry in the journal table
+
+# Last sequence and number of lines of every JSON stream, read from the file once per process
+_journal_state: dict[str, list[int]] = {}
+
+class JsonJournal:
+    def __init__(self, name: str, directory: str):
+        self.name = name
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.jsonl")
+
+    def _lines(self, path: str) -> list[dict]:
+        if not os.path.exists(path):
+            return []
+
+        lines = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    lines.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Last line cut by a crash during the append
+                    continue
+        return lines
+
+    def _state(self, path: str) -> list[int]:
+        # [last sequence, lines], called holding the lock of the stream
+        abspath = os.path.abspath(path)
+        if abspath not in _journal_state:
+            lines = self._lines(path)
+            _journal_state[abspath] = [max((line["seq"] for line in lines), default=0), len(lines)]
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                with open(path, "rb+") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # Cut by a crash: the next entry starts on its own line
+                        f.write(b"\n")
+        return _journal_state[abspath]
+
+    def append(self, key: str, entry: dict) -> tuple[int, int]:
+        # (sequence of the entry, entries in the stream)
+        path = self.path(key)
+        with document_lock(os.path.abspath(path)):
+            state = self._state(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"seq": state[0] + 1, "entry": entry}, ensure_ascii=False) + "\n")
+            state[0] += 1
+            state[1] += 1
+            return state[0], state[1]
+
+    def read(self, key: str, after: int = 0) -> list[tuple[int, dict]]:
+        lines = self._lines(self.path(key))
+        return [(line["seq"], line["entry"]) for line in lines if line["seq"] > after and line["entry"] is not None]
+
+    def last_seq(self, key: str) -> int:
+        path = self.path(key)
+        with document_lock(os.path.abspath(path)):
+            return self._state(path)[0]
+
+    def stamp(self, key: str) -> tuple | None:
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def truncate(self, key: str, seq: int):
+        path = self.path(key)
+        with document_lock(os.path.abspath(path)):
+            state = self._state(path)
+            lines = [line for line in self._lines(path) if line["seq"] > seq]
+            if not lines:
+                # The last sequence is kept (without entry): the numbering goes on after a restart
+                lines = [{"seq": state[0], "entry": None}]
+
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            os.replace(tmp_path, path)
+            state[1] = len(lines)
+
+class SqliteJournal:
+    def __init__(self, name: str, db_path: str):
+        self.name = name
+        self.conn = get_connection(db_path)
+
+    def _stream(self, key: str) -> str:
+        return f"{self.name}/{key}"
+
+    def append(self, key: str, entry: dict) -> tuple[int, int]:
+        # (sequence of the entry, entries in the stream)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute(
+                "INSERT INTO journal (stream, entry) VALUES (?, ?)", (self._stream(key), json.dumps(entry, ensure_ascii=False))
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM journal WHERE stream = ?", (self._stream(key),)).fetchone()[0]
+            self.conn.execute("COMMIT")
+            return cursor.lastrowid, count
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def read(self, key: str, after: int = 0) -> list[tuple[int, dict]]:
+        rows = self.conn.execute(
+            "SELECT seq, entry FROM journal WHERE stream = ? AND seq > ? AND entry != 'null' ORDER BY seq",
+            (self._stream(key), after)
+        ).fetchall()
+        return [(seq, json.loads(entry)) for seq, entry in rows]
+
+    def last_seq(self, key: str) -> int:
+        row = self.conn.execute("SELECT MAX(seq) FROM journal WHERE stream = ?", (self._stream(key),)).fetchone()
+        return row[0] or 0
+
+    def stamp(self, key: str) -> tuple | None:
+        # Sequences are never reused: last one + number of entries changes with every append / truncate
+        return self.conn.execute(
+            "SELECT MAX(seq), COUNT(*) FROM journal WHERE stream = ?", (self._stream(key),)
+        ).fetchone()
+
+    def truncate(self, key: str, seq: int):
+        # The last entry is kept without content, as in JsonJournal
+        stream = self._stream(key)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "DELETE FROM journal WHERE stream = ? AND seq <= ? AND seq < (SELECT MAX(seq) FROM journal WHERE stream = ?)",
+                (stream, seq, stream)
+            )
+            self.conn.execute("UPDATE journal SET entry = 'null' WHERE stream = ? AND seq <= ?", (stream, seq))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+### --- Factory used by the crud modules --- ###
+def get_collection(name: str, directory: str, indexes=()) -> JsonCollection | SqliteCollection:
+    if config.STORAGE_BACKEND == "sqlite":
+        return SqliteCollection(name, config.SQLITE_PATH, indexes)
+    return JsonCollection(name, directory, indexes)
+
+def get_journal(name: str, directory: str) -> JsonJournal | SqliteJournal:
+    if config.STORAGE_BACKEND == "sqlite":
+        return SqliteJournal(name, config.SQLITE_PATH)
+    return JsonJournal(name, directory)
@@ -1,39 +1,141 @@
-from typing import Dict, List
-from app.models import Course, Organization
+import heapq
+from statistics import median
+from typing import Any, Dict, List
+from app.models import Course
+from app.crud import crud_course_index
+from app.service import config
+
+# Categories
+HR_CATEGORIES = ["Seminar", "Hands-on Session", "Industrial Training"]
+INDIVIDUAL_CATEGORIES = ["Online Course", "University Course", "Video Tutorial", "Webinar"]
+
+# Course attributes making a course "expensive" in a learning plan
+EFFORT_FIELDS = ("cost", "duration_weeks", "ects")
 
 # Recommend courses for skill gap
 def recommend_courses_for_skill_gap(
-    missing_skills_uri: Dict[str, str], 
+    missing_skills_uri: Dict[str, Any],
     level: str, # 'individual', 'manager', o 'hr'
-    current_orgname: str,
-    all_organizations: List[Organization]
+    current_orgname: str
 ) -> List[Course]:
-    
+
     recommended_courses = []
-    
-    # Categories
-    hr_categories = ["Seminar", "Hands-on Session", "Industrial Training"]
-    individual_categories = ["Online Course", "University Course", "Video Tutorial", "Webinar"]
-
-    for org in all_organizations:
-        is_own_org = (org.orgname == current_orgname)
-        
-        for course in org.courses:
-            if is_own_org or course.is_public:
-                
-                should_include = False
-                if level == 'hr':
-                    if course.category in hr_categories:
-                        should_include = True
-                else:
-                    if course.category in individual_categories:
-                        should_include = True
-                
-                if should_include:
-                    if any(s.uri in missing_skills_uri for s in course.skills_covered):
-                        recommended_courses.append(course)
+
+    allowed_categories = HR_CATEGORIES if level == 'hr' else INDIVIDUAL_CATEGORIES
+
+    # skill uri -> courses covering it (inverted index), filters checked on the index entries
+    crud_course_index.ensure_course_index()
+    seen = set()
+
+    for uri in missing_skills_uri:
+        for course_id, info in crud_course_index.courses_for_skill(uri).items():
+            if course_id in seen:
+                continue
+            seen.add(course_id)
+
+            is_own_org = (info["orgname"] == current_orgname)
+            if (is_own_org or info["is_public"]) and info["category"] in allowed_categories:
+                course = crud_course_index.get_course(course_id)
+                if course is not None:
+                    recommended_courses.append(course)
 
 
     ### --- Here we can add a function to research online courses not present in db --- ###
 
-    return recommended_courses
\ No newline at end of file
+    return recommended_courses
+
+### --- Gap severity: how much of each skill is still missing (0..1) --- ###
+def gap_severity(skill_gap: List[Dict[str, Any]]) -> Dict[str, float]:
+    # Missing skill -> 1, partial skill -> missing share of the required level. Worst role wins.
+    severity = {}
+    for role_gap in skill_gap:
+        for skill in role_gap.get("missing_skills", []):
+            severity[skill.uri] = 1.0
+        for entry in role_gap.get("partially_matching_skills", []):
+            skill = entry["skill"]
+            have = entry.get("user_level", entry.get("team_best_level", 0))
+            missing_share = (skill.level - have) / skill.level if skill.level > 0 else 0.0
+            severity[skill.uri] = max(severity.get(skill.uri, 0.0), missing_share)
+    return {uri: weight for uri, weight in severity.items() if weight > 0}
+
+### --- Learning plan: greedy weighted set cover --- ###
+def course_effort(courses: List[Course]) -> List[float]:
+    # 1 + each attribute relative to the median of the candidates (unknown values count as the median)
+    medians = {}
+    for field in EFFORT_FIELDS:
+        values = [getattr(c, field) for c in courses if getattr(c, field) is not None]
+        medians[field] = median(values) if values else 0
+
+    efforts = []
+    for course in courses:
+        effort = 1.0
+        for field, mid in medians.items():
+            if mid > 0:
+                value = getattr(course, field)
+                effort += (value if value is not None else mid) / mid
+        efforts.append(effort)
+    return efforts
+
+def plan_learning_path(
+    severity: Dict[str, float],
+    courses: List[Course],
+    max_courses: int = config.LEARNING_PLAN_MAX_COURSES
+) -> Dict[str, Any]:
+    # Picks, one at a time, the course with the most uncovered gap per unit of effort.
+    # Lazy evaluation: the gain of a course can only drop as skills get covered, so a stale heap entry is
+    # re-scored only when it reaches the top (thousands of candidates, a few re-scorings per pick).
+    efforts = course_effort(courses)
+    course_uris = [
+        list({s.uri for s in course.skills_covered or [] if s.uri in severity})
+        for course in courses
+    ]
+
+    heap = []
+    for i, uris in enumerate(course_uris):
+        gain = sum(severity[uri] for uri in uris)
+        if gain > 0:
+            heap.append((-gain / efforts[i], i, gain))
+    heapq.heapify(heap)
+
+    total = sum(severity.values())
+    covered = set()
+    steps = []
+    gained = 0.0
+
+    while heap and len(steps) < max_courses:
+        _, i, old_gain = heapq.heappop(heap)
+        gain = sum(severity[uri] for uri in course_uris[i] if uri not in covered)
+        if gain <= 0:
+            continue
+        if gain < old_gain and heap and -gain / efforts[i] > heap[0][0]:
+            # Worse than the next candidate now: back in the heap with the updated score
+            heapq.heappush(heap, (-gain / efforts[i], i, gain))
+            continue
+
+        new_uris = [uri for uri in course_uris[i] if uri not in covered]
+        covered.update(new_uris)
+        gained += gain
+        steps.append({
+            "course": courses[i],
+            "covers": new_uris,
+            "gain": gain,
+            "effort": efforts[i],
+            "coverage": gained / total if total else 0.0
+        })
+
+    return {
+        "steps": steps,
+        "courses": [step["course"] for step in steps],
+        "coverage": gained / total if total else 0.0,
+        "covered": [uri for uri in severity if uri in covered],
+        "uncovered": [uri for uri in severity if uri not in covered]
+    }
+
+def recommend_learning_plan(
+    severity: Dict[str, float],
+    level: str, # 'individual', 'manager', o 'hr'
+    current_orgname: str,
+    max_courses: int = config.LEARNING_PLAN_MAX_COURSES
+) -> Dict[str, Any]:
+    candidates = recommend_courses_for_skill_gap(severity, level, current_orgname)
+    return plan_learning_path(severity, candidates, max_courses)
@@ -1,5 +1,10 @@
-import requests
+import asyncio
+import threading
+import httpx
 from app.models import Role, Skill
+from app.service import config
+from app.esco.esco_cache import EscoCache, make_key
+from app.esco import esco_local
 
 # Configuration
 HEADERS = {
@@ -8,21 +13,124 @@ HEADERS = {
 }
 BASE_URL = "https://ec.europa.eu/esco/api"
 
+### --- Shared async client (created in main.lifespan) --- ###
+class EscoClient:
+    def __init__(
+        self,
+        timeout: float = config.ESCO_TIMEOUT,
+        connect_timeout: float = config.ESCO_CONNECT_TIMEOUT,
+        retries: int = config.ESCO_RETRIES,
+        retry_backoff: float = config.ESCO_RETRY_BACKOFF,
+        max_connections: int = config.ESCO_MAX_CONNECTIONS,
+        max_concurrency: int = config.ESCO_MAX_CONCURRENCY,
+        keepalive_expiry: float = config.ESCO_KEEPALIVE_EXPIRY
+    ):
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        # Limits the requests in flight towards ESCO, the pool keeps connections alive between them
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers=HEADERS,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry
+            )
+        )
+
+    async def get(self, endpoint: str, params: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self._http.get(endpoint, params=params)
+
+                # 4xx are final, 5xx are retried
+                if response.status_code < 500 or attempt >= self.retries:
+                    return response
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+            attempt += 1
+
+    async def aclose(self):
+        await self._http.aclose()
+
+_client: EscoClient | None = None
+
+def init_client(**kwargs) -> EscoClient:
+    global _client
+    _client = EscoClient(**kwargs)
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client() -> EscoClient:
+    # Fallback for code running outside the app lifespan (scripts, shell)
+    if _client is None:
+        return init_client()
+    return _client
+
+async def _request(endpoint: str, params: dict) -> httpx.Response:
+    return await get_client().get(endpoint, params)
+
+### --- Cached GET: repeated searches and role views never reach the network --- ###
+# Created on first use: importing the module does not touch data/
+cache: EscoCache | None = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> EscoCache:
+    global cache
+    if cache is None:
+        with _cache_lock:
+            if cache is None:
+                cache = EscoCache()
+    return cache
+
+async def _get_json(endpoint: str, params: dict) -> dict:
+    # Offline mirror first (data/esco), when loaded for this language
+    data = esco_local.answer(endpoint, params)
+    if data is not None:
+        return data
+
+    key = make_key(endpoint, params)
+
+    # Memory tier on the event loop, files in a thread
+    esco_cache = get_cache()
+    data = esco_cache.get_memory(key)
+    if data is None:
+        data = await asyncio.to_thread(esco_cache.get_disk, key)
+    if data is not None:
+        return data
+
+    response = await _request(endpoint, params)
+    response.raise_for_status() # Errors are never cached
+
+    data = response.json()
+    await asyncio.to_thread(esco_cache.set, key, data)
+    return data
+
 ### API function to get details
-def get_single_role_details(uri: str, language: str) -> Role | None:
+async def get_single_role_details(uri: str, language: str) -> Role | None:
     if not uri:
         return None
 
     try:
         details_params = {'uri': uri, 'language': language}
-        details_resp = requests.get(f"{BASE_URL}/resource/occupation", params=details_params, headers=HEADERS)
-        
-        if details_resp.status_code != 200:
-            print(f"❌ ESCO API Error: {details_resp.status_code} per URI: {uri}")
-            return None
-
         # Obtain main details    
-        d_data = details_resp.json()
+        try:
+            d_data = await _get_json("/resource/occupation", details_params)
+        except httpx.HTTPStatusError as e:
+            print(f"❌ ESCO API Error: {e.response.status_code} per URI: {uri}")
+            return None
         
         title = d_data.get('title', 'Unknown Role')
         desc_obj = d_data.get('description', {}) or d_data.get('definition', {})
@@ -51,10 +159,12 @@ def get_single_role_details(uri: str, language: str) -> Role | None:
             'language': language,
             'limit': 500  # Taking all possible related skills/knowledge
         }
-        related_resp = requests.get(f"{BASE_URL}/resource/related", params=related_params, headers=HEADERS)
+        try:
+            r_data = await _get_json("/resource/related", related_params)
+        except httpx.HTTPStatusError:
+            r_data = None
         
-        if related_resp.status_code == 200:
-            r_data = related_resp.json()
+        if r_data:
             embedded_related = r_data.get('_embedded', {})
             
             for items_list in embedded_related.values():
@@ -82,15 +192,14 @@ def get_single_role_details(uri: str, language: str) -> Role | None:
         return None
 
 ### Main function to search and get details for occupations
-def get_esco_occupations_list(keyword, language, limit=10):
+async def get_esco_occupations_list(keyword, language, limit=10):
     search_params = {'text': keyword, 'type': 'occupation', 'language': language, 'limit': limit}
     
     try:
         # print(f"🔍 Searching ESCO for: {keyword}...")
-        search_resp = requests.get(f"{BASE_URL}/search", params=search_params, headers=HEADERS)
-        search_resp.raise_for_status()
+        search_data = await _get_json("/search", search_params)
         
-        results = search_resp.json().get('_embedded', {}).get('results', [])
+        results = search_data.get('_embedded', {}).get('results', [])
     except Exception as e:
         print(f"Connection error during search: {e}")
         return []
@@ -112,7 +221,7 @@ def get_esco_occupations_list(keyword, language, limit=10):
     return output_list
 
 ### API function to get skill URI by name 
-def get_esco_skill_uri_by_name(skill_name: str, language: str = 'en') -> str | None:
+async def get_esco_skill_uri_by_name(skill_name: str, language: str = 'en') -> str | None:
     search_params = {
         'text': skill_name, 
         'type': 'skill',      
@@ -121,10 +230,9 @@ def get_esco_skill_uri_by_name(skill_name: str, language: str = 'en') -> str | N
     }
     
     try:
-        search_resp = requests.get(f"{BASE_URL}/search", params=search_params, headers=HEADERS)
-        search_resp.raise_for_status()
+        search_data = await _get_json("/search", search_params)
         
-        results = search_resp.json().get('_embedded', {}).get('results', [])
+        results = search_data.get('_embedded', {}).get('results', [])
         
         if results:
             return results[0].get('uri')
@@ -135,15 +243,14 @@ def get_esco_skill_uri_by_name(skill_name: str, language: str = 'en') -> str | N
     return None 
 
 ### Main function to search for skills based on user input
-def get_esco_skills_list(keyword, language, limit=10):
+async def get_esco_skills_list(keyword, language, limit=10):
     search_params = {'text': keyword, 'type': 'skill', 'language': language, 'limit': limit}
     
     try:
         # print(f"🔍 Searching ESCO for: {keyword}...")
-        search_resp = requests.get(f"{BASE_URL}/search", params=search_params, headers=HEADERS)
-        search_resp.raise_for_status()
+        search_data = await _get_json("/search", search_params)
         
-        results = search_resp.json().get('_embedded', {}).get('results', [])
+        results = search_data.get('_embedded', {}).get('results', [])
     except Exception as e:
         print(f"Connection error during search: {e}")
         return []
@@ -166,3 +273,17 @@ def get_esco_skills_list(keyword, language, limit=10):
             output_list.append(skill)
 
     return output_list
+
+### Function to resolve many skill names at once (CSV uploads)
+async def resolve_skills_lists(keywords: list[str], language, limit=10, max_workers=config.ESCO_CSV_WORKERS) -> dict[str, list[Skill]]:
+    # Each distinct name is searched only once, with at most max_workers searches running together
+    distinct_keywords = list(dict.fromkeys(keywords))
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def worker(keyword):
+        async with semaphore:
+            return await get_esco_skills_list(keyword, language=language, limit=limit)
+
+    results = await asyncio.gather(*(worker(k) for k in distinct_keywords))
+
+    return dict(zip(distinct_keywords, results))
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.service import config
+
+DATA_DIR_ESCO_CACHE = "data/esco_cache"
+
+### --- Cache key --- ###
+def make_key(endpoint: str, params: dict) -> str:
+    # (endpoint, uri/text, language, limit, ...) -> stable string, independent from params order
+    return json.dumps([endpoint, sorted((k, str(v)) for k, v in params.items())], ensure_ascii=False)
+
+### --- Two tier cache for ESCO responses (memory LRU + JSON files under data/) --- ###
+class EscoCache:
+    def __init__(
+        self,
+        directory: str = DATA_DIR_ESCO_CACHE,
+        ttl: float = config.ESCO_CACHE_TTL,
+        max_memory_entries: int = config.ESCO_CACHE_MEMORY_ENTRIES,
+        max_disk_entries: int = config.ESCO_CACHE_DISK_ENTRIES
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._disk_count: int | None = None # Lazily counted on first write
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and (time.time() - stored_at) > self.ttl
+
+    def get(self, key: str) -> dict | None:
+        data = self.get_memory(key)
+        return data if data is not None else self.get_disk(key)
+
+    def get_memory(self, key: str) -> dict | None:
+        # No I/O: safe to call from the event loop
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, data = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return data
+                del self._memory[key]
+        return None
+
+    def get_disk(self, key: str) -> dict | None:
+        # File read: from async code run it in a thread
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entry = None
+
+        # Same digest but different key is a (very unlikely) collision -> treated as a miss
+        if entry is None or entry.get("key") != key or self._expired(entry.get("stored_at", 0)):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, entry["stored_at"], entry["data"])
+        return entry["data"]
+
+    def set(self, key: str, data: dict):
+        stored_at = time.time()
+
+        with self._lock:
+            self._remember(key, stored_at, data)
+
+        # Temporary file + rename: concurrent writers of the same key or a crash never leave a half written file
+        path = self._path(key)
+        is_new = not os.path.exists(path)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "stored_at": stored_at, "data": data}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing ESCO cache entry: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        if is_new:
+            self._evict_disk()
+
+    def _remember(self, key: str, stored_at: float, data: dict):
+        self._memory[key] = (stored_at, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_count is None:
+                self._disk_count = len([n for n in os.listdir(self.directory) if n.endswith(".json")])
+            else:
+                self._disk_count += 1
+
+            if self._disk_count <= self.max_disk_entries:
+                return
+
+            # Oldest files first, dropping 10% at once to avoid listing the dir on every write
+            files = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".json")]
+            files.sort(key=os.path.getmtime)
+            to_remove = len(files) - int(self.max_disk_entries * 0.9)
+
+            for path in files[:max(to_remove, 0)]:
+                try:
+                    os.remove(path)
+                    self.evictions += 1
+                except OSError:
+                    pass
+
+            self._disk_count = len(files) - max(to_remove, 0)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+            self._disk_count = 0
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "hit_rate": round(hits / total, 3) if total else 0.0
+        }
@@ -0,0 +1,186 @@
+import bisect
+import csv
+import glob
+import os
+import re
+
+# Official ESCO CSV dataset (https://esco.ec.europa.eu/en/use-esco/download), one set of files per language:
+# skills_<lang>.csv, occupations_<lang>.csv, occupationSkillRelations_<lang>.csv
+DATA_DIR_ESCO = "data/esco"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MIN_PREFIX_LEN = 2 # Shorter tokens would expand to half of the vocabulary
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+def _split_labels(raw: str) -> list[str]:
+    # altLabels / hiddenLabels are newline separated in the ESCO dumps
+    return [label.strip() for label in (raw or "").split("\n") if label.strip()]
+
+### --- Inverted index over preferred + alternative labels --- ###
+class LabelIndex:
+    def __init__(self):
+        self.labels: dict[str, list[str]] = {}      # uri -> [preferred, alt_1, alt_2, ...]
+        self.label_words: dict[str, list[list[str]]] = {}
+        self.postings: dict[str, set[str]] = {}     # token -> uris
+        self.vocabulary: list[str] = []             # sorted tokens, for prefix expansion
+
+    def add(self, uri: str, preferred: str, alternatives: list[str]):
+        self.labels[uri] = [preferred] + alternatives
+        self.label_words[uri] = [tokenize(label) for label in self.labels[uri]]
+        for words in self.label_words[uri]:
+            for token in words:
+                self.postings.setdefault(token, set()).add(uri)
+
+    def freeze(self):
+        self.vocabulary = sorted(self.postings)
+
+    def _expand(self, token: str) -> set[str]:
+        # Exact token + every token starting with it ("pyth" -> "python", "pythonic", ...)
+        if len(token) < MIN_PREFIX_LEN:
+            return self.postings.get(token, set())
+
+        matches = set()
+        start = bisect.bisect_left(self.vocabulary, token)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            matches |= self.postings[word]
+        return matches
+
+    def _score(self, uri: str, query: str, tokens: list[str]) -> tuple | None:
+        best = None
+        for position, words in enumerate(self.label_words[uri]):
+            if not all(any(w.startswith(t) for w in words) for t in tokens):
+                continue
+
+            exact = " ".join(words) == query
+            # Exact label first, then preferred label, then shorter labels
+            score = (0 if exact else 1, 0 if position == 0 else 1, len(words))
+            if best is None or score < best:
+                best = score
+        return best
+
+    def search(self, text: str, limit: int) -> list[str]:
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        # Rarest token first keeps the intersection small
+        candidate_sets = sorted((self._expand(t) for t in tokens), key=len)
+        candidates = set(candidate_sets[0])
+        for other in candidate_sets[1:]:
+            candidates &= other
+            if not candidates:
+                return []
+
+        query = " ".join(tokens)
+        scored = []
+        for uri in candidates:
+            score = self._score(uri, query, tokens)
+            if score is not None:
+                scored.append((score, self.labels[uri][0], uri))
+
+        scored.sort()
+        return [uri for _, _, uri in scored[:limit]]
+
+### --- Local mirror of one ESCO language --- ###
+class EscoMirror:
+    def __init__(self, language: str):
+        self.language = language
+        self.skills = LabelIndex()
+        self.occupations = LabelIndex()
+        self.details: dict[str, dict] = {}                  # uri -> {"title", "description", "code"}
+        self.essential_skills: dict[str, list[str]] = {}    # occupation uri -> skill uris
+
+    def load(self, directory: str):
+        for kind, index in (("skills", self.skills), ("occupations", self.occupations)):
+            path = os.path.join(directory, f"{kind}_{self.language}.csv")
+            with open(path, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    uri = row.get("conceptUri")
+                    title = row.get("preferredLabel")
+                    if not uri or not title:
+                        continue
+
+                    index.add(uri, title, _split_labels(row.get("altLabels")) + _split_labels(row.get("hiddenLabels")))
+                    self.details[uri] = {
+                        "title": title,
+                        "description": row.get("description") or row.get("definition") or "",
+                        "code": row.get("code") or None
+                    }
+            index.freeze()
+
+        relations_path = os.path.join(directory, f"occupationSkillRelations_{self.language}.csv")
+        if os.path.exists(relations_path):
+            with open(relations_path, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if row.get("relationType") == "essential":
+                        self.essential_skills.setdefault(row["occupationUri"], []).append(row["skillUri"])
+
+    ### --- Answers shaped like the ESCO API responses --- ###
+    def search(self, text: str, type: str, limit: int) -> dict:
+        index = self.occupations if type == "occupation" else self.skills
+        results = [
+            {"uri": uri, "title": self.details[uri]["title"]}
+            for uri in index.search(text, int(limit))
+        ]
+        return {"_embedded": {"results": results}}
+
+    def occupation(self, uri: str) -> dict | None:
+        if uri not in self.occupations.labels:
+            return None
+
+        detail = self.details[uri]
+        return {
+            "title": detail["title"],
+            "description": {self.language: {"literal": detail["description"]}},
+            "code": detail["code"]
+        }
+
+    def related(self, uri: str, relation: str, limit: int) -> dict | None:
+        if relation != "hasEssentialSkill" or uri not in self.occupations.labels:
+            return None
+
+        skills = [
+            {"uri": s_uri, "title": self.details[s_uri]["title"]}
+            for s_uri in self.essential_skills.get(uri, [])[:int(limit)]
+            if s_uri in self.details
+        ]
+        return {"_embedded": {"hasEssentialSkill": skills}}
+
+mirrors: dict[str, EscoMirror] = {}
+
+### --- Loading (main.lifespan) --- ###
+def load_mirrors(directory: str = DATA_DIR_ESCO) -> dict[str, EscoMirror]:
+    mirrors.clear()
+
+    for path in glob.glob(os.path.join(directory, "skills_*.csv")):
+        language = os.path.basename(path)[len("skills_"):-len(".csv")]
+        if not os.path.exists(os.path.join(directory, f"occupations_{language}.csv")):
+            continue
+
+        try:
+            mirror = EscoMirror(language)
+            mirror.load(directory)
+            mirrors[language] = mirror
+        except Exception as e:
+            print(f"Error while loading ESCO mirror '{language}': {e}")
+
+    return mirrors
+
+### --- Local answer for an ESCO API call, None if the mirror can't answer it --- ###
+def answer(endpoint: str, params: dict) -> dict | None:
+    mirror = mirrors.get(params.get("language"))
+    if mirror is None:
+        return None
+
+    if endpoint == "/search":
+        return mirror.search(params.get("text", ""), params.get("type"), params.get("limit", 10))
+    if endpoint == "/resource/occupation":
+        return mirror.occupation(params.get("uri"))
+    if endpoint == "/resource/related":
+        return mirror.related(params.get("uri"), params.get("relation"), params.get("limit", 500))
+
+    return None
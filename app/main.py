@@ -1,10 +1,14 @@
 import json
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from app.service.config import templates
 from app.routers import user, org, guest
+from app.service import passwords
+from app.esco import escoAPI, esco_local
+from app.crud import model_cache, crud_async, crud_course_index, crud_org, storage
+from app.crud.cedefop_store import CedefopStore, load_snapshot
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,26 +23,60 @@ FILES_CONFIG = {
     "isco_definitions": "db_isco_definitions.json"
 }
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # --- STARTUP: uploading data ---
-    app.state.cedefop = {}
+SNAPSHOT_PATH = DATA_PATH / "snapshot"
+
+def cedefop_sources() -> dict:
+    return {key: DATA_PATH / filename for key, filename in FILES_CONFIG.items()}
+
+def load_cedefop_json() -> CedefopStore:
+    store = CedefopStore()
 
-    for key, filename in FILES_CONFIG.items():
-        full_path = DATA_PATH / filename
+    for key, full_path in cedefop_sources().items():
         try:
             with open(full_path, "r", encoding='utf-8') as f:
-                app.state.cedefop[key] = json.load(f)
-            #print(f"{filename} uploaded correctly.")
+                store.add(key, json.load(f))
+            #print(f"{full_path.name} uploaded correctly.")
         except FileNotFoundError:
-            print(f"Error: {filename} does not exists in {DATA_PATH}")
+            print(f"Error: {full_path.name} does not exists in {DATA_PATH}")
         except Exception as e:
-            print(f"Error while loading {filename}: {e}")
+            print(f"Error while loading {full_path.name}: {e}")
+
+    return store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- STARTUP: uploading data ---
+    # Binary snapshot (python -m app.service.build_cedefop_snapshot) is memory mapped and shared by all workers,
+    # the JSON files are parsed only if it is missing or older than them
+    app.state.cedefop = load_snapshot(SNAPSHOT_PATH, cedefop_sources())
+    if app.state.cedefop is None:
+        app.state.cedefop = load_cedefop_json()
+
+    # Global skill gap of the organizations saved before it existed (computed once, never on a read)
+    crud_org.fill_global_gaps()
+
+    # Skill -> course index for the recommendations (built from the organizations the first time)
+    crud_course_index.ensure_course_index()
+
+    # Offline ESCO taxonomy (optional, only if the dataset is in data/esco)
+    esco_local.load_mirrors()
+
+    # Shared ESCO connection pool
+    escoAPI.init_client()
+
+    # Argon2 hashing threads, storage I/O threads
+    passwords.init_pool()
+    crud_async.init_pool()
 
     yield  # App is READY   
 
     # --- SHUTDOWN ---
     app.state.cedefop.clear()
+    esco_local.mirrors.clear()
+    await escoAPI.close_client()
+    passwords.close_pool()
+    crud_async.close_pool()
+    crud_org.close_compactor()
 
 # --- APP Initialization ---
 app = FastAPI(lifespan=lifespan)
@@ -47,6 +85,20 @@ app = FastAPI(lifespan=lifespan)
 STATIC_PATH = Path(__file__).resolve().parent / "static"
 app.mount("/static", StaticFiles(directory=str(STATIC_PATH)), name="static")
 
+# Users / orgs read during a request are parsed only once
+@app.middleware("http")
+async def request_model_scope(request: Request, call_next):
+    token = model_cache.begin_request()
+    try:
+        return await call_next(request)
+    finally:
+        model_cache.end_request(token)
+
+# Same data changed by another request in an incompatible way, still after the retries: the user can submit again
+@app.exception_handler(storage.VersionConflict)
+async def version_conflict(request: Request, exc: storage.VersionConflict):
+    return PlainTextResponse("This data was changed by someone else meanwhile, please reload and retry.", status_code=409)
+
 # Linking routers
 app.include_router(user.router)
 app.include_router(org.router)
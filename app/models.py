@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 import uuid
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Optional, Dict, List, Any
 from enum import Enum
 
@@ -32,6 +32,9 @@ class User(BaseModel):
     skill_gap: List[Dict[str, Any]] = []
     organization: Optional[str] = None
 
+    # Set by model_cache.load: (version, JSON) of the stored document, update_user merges the changes made since
+    _stored: Optional[tuple] = PrivateAttr(default=None)
+
 class Invitation(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     orgname: str
@@ -73,4 +76,30 @@ class Organization(BaseModel):
     pending_members: Dict[str, List[Skill]] = {}
     projects: List[Project] = []
     courses: List[Course] = []
+    # skill uri -> {"name", "count", "projects", "project_ids"}, most missing first. None = not computed yet
+    global_gap: Optional[Dict[str, Dict[str, Any]]] = None
+
+    # Set by crud_org: (position, JSON, version) of every stored record (only changed ones are written back),
+    # partial = loaded without its projects / courses / other members
+    _stored: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+    _partial: bool = PrivateAttr(default=False)
+
+class ImportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    orgname: str
+    status: str = "queued"  # e.g., "queued", "running", "done", "failed", "confirmed"
+    stage: Optional[str] = None  # e.g., "parse", "users", "invitations", "esco"
+    total_rows: int = 0
+    processed_rows: int = 0
+    invited: List[str] = []
+    not_found: List[str] = []
+    skills_to_review: List[Dict[str, Any]] = []
+    skills_not_found: List[Dict[str, str]] = []
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
 
+class Session(BaseModel):
+    kind: str  # "user" or "org"
+    name: str  # username / orgname
+    expires_at: float  # unix time
@@ -22,7 +22,7 @@ async def role_list_guest(request: Request, search: str = Form(...)):
     role = search.title().strip()
 
     language = "en"
-    role_list = escoAPI.get_esco_occupations_list(role, language=language, limit=10)
+    role_list = await escoAPI.get_esco_occupations_list(role, language=language, limit=10)
 
     return templates.TemplateResponse(
         request=request,
@@ -1,17 +1,17 @@
-import codecs
-import csv
-from fastapi import APIRouter, File, Query, Request, Form, UploadFile, status, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, File, Query, Request, Form, UploadFile, status, Depends
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from typing import Optional
 import urllib
-from app.crud import crud_user, crud_org
-from app.service.dependencies import get_current_org
+from itertools import islice
+from app.crud import crud_async, crud_skill_models
+from app.service.dependencies import get_current_org, get_current_orgname, get_current_session
+from app.service import config, import_jobs, passwords, sessions
 from app.esco import escoAPI 
 from datetime import datetime
-from app.service.config import templates, pwd_context
-from app.models import Organization, Project, Skill, Course, UserLevel
+from app.service.config import templates
+from app.models import ImportJob, Organization, Session, Skill, Course, UserLevel
 from pydantic import ValidationError
-from app.educational_offerings.courses_recommendation import recommend_courses_for_skill_gap
+from app.educational_offerings.courses_recommendation import recommend_learning_plan
 
 router = APIRouter()
 
@@ -65,27 +65,35 @@ async def org_login(request: Request):
 ### --- Organization Login POST --- ###
 @router.post("/org_login", response_class=HTMLResponse)
 async def org_login(orgname: str = Form(...), password: str = Form(...)):
-    org = crud_org.get_org_by_orgname(orgname)
+    org = await crud_async.get_org_by_orgname(orgname)
 
-    if not org or not pwd_context.verify(password, org.hashed_password):
+    valid, new_hash = await passwords.verify_and_update(password, org.hashed_password) if org else (False, None)
+    if not valid:
         response = RedirectResponse(url="/org_login", status_code=status.HTTP_303_SEE_OTHER)
         
         response.set_cookie(key="flash_error", value="Invalid credentials. Please try again.")
         return response
 
+    # Hash made with older argon2 parameters: upgraded now that the password is known
+    if new_hash:
+        await crud_async.change_password_org(org, new_hash)
+
     response = RedirectResponse(url="/org_home", status_code=status.HTTP_303_SEE_OTHER)
 
-    response.set_cookie(key="session_token", value=org.orgname, path="/", httponly=True, max_age=1800)  # 30 minutes session
+    # Random token, the org is found in the session store
+    token = sessions.create_session("org", org.orgname)
+    response.set_cookie(key="session_token", value=token, path="/", httponly=True, max_age=config.SESSION_TTL)
     response.delete_cookie(key="flash_error")
 
     return response
 
 ### --- Logout --- ###
 @router.get("/org_logout")
-async def logout():
+async def logout(request: Request):
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     # Delete current session
+    sessions.delete_session(request.cookies.get("session_token"))
     response.set_cookie(key="session_token", value="", path="/", httponly=True, max_age=0)
     return response
 
@@ -135,10 +143,10 @@ async def register_org(
     orgname: str = Form(...),
     password: str = Form(...)
 ):
-    hashed_pw = pwd_context.hash(password)
+    hashed_pw = await passwords.hash_password(password)
     new_org = Organization(name=name, orgname=orgname, hashed_password=hashed_pw)
     try:
-        crud_org.create_organization(new_org)
+        await crud_async.create_organization(new_org)
         return RedirectResponse(url="/org_login", status_code=status.HTTP_303_SEE_OTHER)
     except ValueError:
         msg = urllib.parse.quote("Orgname already exists. Please choose another.")
@@ -162,56 +170,28 @@ async def org_profile(
     
     global_gap = {}
     hr_recommendations = []
+    hr_learning_plan = None
 
     if analyze:
-        for project in org.projects:
-            gaps = project.get("skill_gap", []) if isinstance(project, dict) else project.skill_gap
-            project_name = project.get("name") if isinstance(project, dict) else project.name
-            
-            # Usiamo un set locale al progetto per evitare duplicati nello stesso progetto
-            skills_found_in_this_project = set()
+        # Aggregate kept up to date by the project gap updates, filled at startup for orgs saved before it existed
+        if org.global_gap is None:
+            crud_skill_models.rebuild_global_gap(org)
 
-            for gap_entry in gaps:
-                missing = gap_entry.get("missing_skills", [])
-                partial = [p["skill"] for p in gap_entry.get("partially_matching_skills", [])]
-                all_needed = missing + partial
-                
-                for skill in all_needed:
-                    uri = skill["uri"] if isinstance(skill, dict) else skill.uri
-                    name = skill["name"] if isinstance(skill, dict) else skill.name
-                    
-                    # Registriamo la skill per questo progetto
-                    if uri not in global_gap:
-                        global_gap[uri] = {
-                            "name": name, 
-                            "count": 0, 
-                            "projects": [] # Lista per i nomi dei progetti
-                        }
-                    
-                    # Se non abbiamo ancora contato questa skill per QUESTO progetto...
-                    if uri not in skills_found_in_this_project:
-                        global_gap[uri]["count"] += 1
-                        global_gap[uri]["projects"].append(project_name)
-                        # La segniamo come "già contata" per non duplicarla se appare in un altro gap_entry
-                        skills_found_in_this_project.add(uri)
-
-        # Sorting finale per count
-        global_gap = dict(sorted(global_gap.items(), key=lambda item: item[1]['count'], reverse=True))
+        # Already sorted by count: only the most missing skills are read
+        global_gap = dict(islice(org.global_gap.items(), config.GLOBAL_GAP_TOP_K))
                 
-        # Recommendation for orgs
+        # Recommendation for orgs: plan over the whole gap, a skill missing in more projects weighs more
         if global_gap:
-            skills_to_recommend = {uri: data["name"] for uri, data in global_gap.items()}
-            all_orgs = crud_org.get_all_orgs()
-            hr_recommendations = recommend_courses_for_skill_gap(
-                skills_to_recommend, "hr", org.orgname, all_orgs
-            )
+            severity = {uri: data["count"] for uri, data in org.global_gap.items()}
+            hr_learning_plan = await crud_async.run(recommend_learning_plan, severity, "hr", org.orgname)
+            hr_recommendations = hr_learning_plan["courses"]
 
     # Keeping research with ESCO API
     skill_list = None
 
     if skill_search and skill_search.strip():
         skill_search = skill_search.title().strip()
-        skill_list = escoAPI.get_esco_skills_list(skill_search, language="en", limit=10)
+        skill_list = await escoAPI.get_esco_skills_list(skill_search, language="en", limit=10)
 
     # If course to edit
     course_to_edit = None
@@ -229,13 +209,14 @@ async def org_profile(
         name="org/org_profile.html", 
         context={
             "org": org,
-            "members": crud_user.get_users_by_usernames(org.members.keys()),
-            "available_users": crud_user.get_all_users(),
+            "members": await crud_async.get_users_by_usernames(org.members.keys()),
+            "available_users": await crud_async.get_all_users(),
             "skill_list": skill_list,
             "skill_search": skill_search,
             "active_course_id": course_id,
             "global_gap": global_gap,
             "hr_recommendations": hr_recommendations,
+            "hr_learning_plan": hr_learning_plan,
             "analysis_active": analyze,
             "course_to_edit": course_to_edit,
             "toast_msg": toast_msg,
@@ -253,13 +234,13 @@ async def change_password(
     if not org:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    if not pwd_context.verify(old_pw, org.hashed_password):
+    if not await passwords.verify_password(old_pw, org.hashed_password):
         warning = "Your old password is not correct."
         msg = urllib.parse.quote(warning)
         return RedirectResponse(url=f"/org_profile?warning={msg}", status_code=status.HTTP_303_SEE_OTHER)
     
-    new_pw_hashed = pwd_context.hash(new_pw)
-    success = crud_org.change_password_org(org, new_pw_hashed) # Updates org too
+    new_pw_hashed = await passwords.hash_password(new_pw)
+    success = await crud_async.change_password_org(org, new_pw_hashed) # Updates org too
 
     if success:
         msg = urllib.parse.quote("Password updated successfully!")
@@ -267,7 +248,14 @@ async def change_password(
     else:
         msg = urllib.parse.quote("Failed to update your password.")
         toast_type = "error"
-    return RedirectResponse(url=f"/org_profile?{toast_type}={msg}", status_code=status.HTTP_303_SEE_OTHER)
+    response = RedirectResponse(url=f"/org_profile?{toast_type}={msg}", status_code=status.HTTP_303_SEE_OTHER)
+
+    if success:
+        # Sessions opened with the old password end (other devices too), this browser gets a new one
+        await crud_async.run(sessions.delete_sessions, "org", org.orgname)
+        token = await crud_async.run(sessions.create_session, "org", org.orgname)
+        response.set_cookie(key="session_token", value=token, path="/", httponly=True, max_age=config.SESSION_TTL)
+    return response
     
 ### --- Invite Member --- ###
 @router.post("/invite_member", response_class=RedirectResponse)
@@ -282,7 +270,7 @@ async def invite_member(
 
     members = org.members
     invited = False
-    user_to_invite = crud_user.get_user_by_username(username_to_invite)
+    user_to_invite = await crud_async.get_user_by_username(username_to_invite)
 
     if not user_to_invite:
         msg = "User not found."
@@ -291,7 +279,7 @@ async def invite_member(
         msg = "This user is already in your team."
         type = "warning"
     else:
-        invited = crud_org.create_invitation(org.orgname, user_to_invite.username)
+        invited = await crud_async.create_invitation(org.orgname, user_to_invite.username)
         if invited:
             msg = f"Invitation sent to '{username_to_invite}' successfully!"
             type = "success"
@@ -314,14 +302,14 @@ async def update_user_level(
         msg = urllib.parse.quote("This user is not in your organization")
         return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
-    user = crud_user.get_user_by_username(target_username)
+    user = await crud_async.get_user_by_username(target_username)
     if not user:
         msg = urllib.parse.quote("This user is not in your organization")
         return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
     user.level = UserLevel(new_level) 
     
-    crud_user.update_user(user)
+    await crud_async.update_user(user)
 
     if new_level == 'manager':
         msg = urllib.parse.quote(f"{user.name} {user.surname} promoted to Manager!")
@@ -335,26 +323,28 @@ async def update_user_level(
 async def view_project(
     request: Request, 
     project_id: str, 
-    org: Organization = Depends(get_current_org),
+    orgname: str = Depends(get_current_orgname),
     error: Optional[str] = Query(None), 
     success: Optional[str] = Query(None),
     warning: Optional[str] = Query(None),
     role_search: Optional[str] = Query(None)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    current_project: Optional[Project] = next((p for p in org.projects if str(p.id) == project_id), None)
+    current_project = await crud_async.get_project(orgname, project_id)
 
     if not current_project:
         return RedirectResponse(url="/org_home", status_code=status.HTTP_303_SEE_OTHER)
 
-    team = crud_user.get_users_by_usernames(current_project.assigned_members)
+    # Skills of the team only, shown next to each member
+    org = await crud_async.get_org_info(orgname, current_project.assigned_members)
+    team = await crud_async.get_users_by_usernames(current_project.assigned_members)
 
     role_list = None
     if role_search and role_search.strip():
         role_search = role_search.title().strip()
-        role_list = escoAPI.get_esco_occupations_list(role_search, language="en", limit=10)
+        role_list = await escoAPI.get_esco_occupations_list(role_search, language="en", limit=10)
 
     toast_msg = success or error or warning
     toast_type = "success" if success else ("error" if error else ("warning" if warning else None))
@@ -382,9 +372,9 @@ async def view_project(
     )
 
 ### --- Upload Skills CSV for Organization --- ###
-@router.post("/upload_employee_skills_csv", response_class=HTMLResponse)
+@router.post("/upload_employee_skills_csv", response_class=RedirectResponse)
 async def upload_employee_skills_csv(
-    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     org: Organization = Depends(get_current_org)
 ):
@@ -395,75 +385,88 @@ async def upload_employee_skills_csv(
         msg = urllib.parse.quote("Invalid file type. Please upload a CSV file.")
         return RedirectResponse(url=f"/org_home?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
     
-    await file.seek(0)
+    content = await file.read()
+    try:
+        decoded_content = content.decode('utf-8')
+    except UnicodeDecodeError:
+        msg = urllib.parse.quote("Failed to decode the file. Please ensure it's a valid UTF-8 encoded CSV.")
+        return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
-    csvReader = csv.DictReader(codecs.iterdecode(file.file, 'utf-8'))
-    
-    skills_to_review = []
-    skills_not_found = []
-    known_users = {}
+    # The file is processed after the response, the job page polls its progress
+    job = await crud_async.create_job(ImportJob(orgname=org.orgname))
+    background_tasks.add_task(import_jobs.run_employee_skills_import, job.id, decoded_content)
 
-    invitated = []
-    not_found = []
+    return RedirectResponse(url=f"/org/import_jobs/{job.id}", status_code=status.HTTP_303_SEE_OTHER)
 
-    for row in csvReader:
-        username = row.get("username")
-        skill_name = row.get("skill_name")
-        level_str = row.get("level")
+### --- Import Job Status (polled by the progress page) --- ###
+@router.get("/org/import_jobs/{job_id}/status")
+async def import_job_status(
+    job_id: str,
+    session: Optional[Session] = Depends(get_current_session)
+):
+    # Polled while the job runs: only the session is checked, the org is not read
+    if session is None or session.kind != "org":
+        return JSONResponse({"error": "Not authorized"}, status_code=status.HTTP_401_UNAUTHORIZED)
+
+    job = await crud_async.get_job_by_id(job_id)
+    if not job or job.orgname != session.name:
+        return JSONResponse({"error": "Import job not found"}, status_code=status.HTTP_404_NOT_FOUND)
+
+    return {
+        "id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "skills_to_review": len(job.skills_to_review),
+        "skills_not_found": len(job.skills_not_found),
+        "error": job.error
+    }
+
+### --- Import Job Page: progress while running, review once done --- ###
+@router.get("/org/import_jobs/{job_id}", response_class=HTMLResponse)
+async def import_job_page(
+    request: Request,
+    job_id: str,
+    org: Organization = Depends(get_current_org)
+):
+    if not org:
+        return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
-        if not username or not skill_name or not level_str:
-            continue
-            
-        try:
-            level = int(level_str)
-            skill_level = max(1, min(9, level))
-        except ValueError:
-            continue
+    job = await crud_async.get_job_by_id(job_id)
+    if not job or job.orgname != org.orgname or job.status == "confirmed":
+        msg = urllib.parse.quote("Import not found or already confirmed.")
+        return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
-        if username not in known_users:
-            user = crud_user.get_user_by_username(username)
-            if user:
-                known_users[username] = True
-                if username not in org.members:
-                    crud_org.create_invitation(org.orgname, username)
-                    invitated.append(username)
-            else:
-                known_users[username] = False
-                not_found.append(username)
-
-        if not known_users[username]:
-            continue
+    if job.status == "failed":
+        msg = urllib.parse.quote(f"CSV import failed: {job.error}")
+        return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
-        search_results = escoAPI.get_esco_skills_list(skill_name, language="en", limit=10)
-        
-        if search_results:
-            skills_to_review.append({
-                "username": username,
-                "raw_name": skill_name.capitalize(),
-                "level": skill_level,
-                "options": search_results
-            })
-        else:
-            skills_not_found.append({
-                "username": username,
-                "skill_name": skill_name
-            })
+    if job.status != "done":
+        return templates.TemplateResponse(
+            request=request,
+            name="org/import_job_status.html",
+            context={
+                "org": org,
+                "job": job
+            }
+        )
 
     msg = "CSV processed successfully."
     msg_type = "success"
 
     # MSG for warnings
     warnings = []
-    if invitated:
-        warnings.append(f"Invited: {', '.join(invitated)}")
-    if not_found:
-        warnings.append(f"Not found in DB: {', '.join(not_found)}")
+    if job.invited:
+        warnings.append(f"Invited: {', '.join(job.invited)}")
+    if job.not_found:
+        warnings.append(f"Not found in DB: {', '.join(job.not_found)}")
 
     if warnings:
         msg = " | ".join(warnings)
-        msg_type = "warning" if invitated else "error"
+        msg_type = "warning" if job.invited else "error"
 
-    if not skills_to_review and (invitated or not_found):
+    if not job.skills_to_review and (job.invited or job.not_found):
         query_params = f"warning={urllib.parse.quote(msg)}"
         return RedirectResponse(url=f"/org_profile?{query_params}", status_code=303)
 
@@ -473,8 +476,9 @@ async def upload_employee_skills_csv(
         context={
             "request": request,
             "org": org,
-            "skills_to_review": skills_to_review,
-            "skills_not_found": skills_not_found,
+            "job_id": job.id,
+            "skills_to_review": job.skills_to_review,
+            "skills_not_found": job.skills_not_found,
             "toast_msg": msg,
             "toast_type": msg_type
         }
@@ -483,59 +487,96 @@ async def upload_employee_skills_csv(
 @router.post("/org/confirm_employee_skills", response_class=RedirectResponse)
 async def confirm_employee_skills(
     request: Request,
-    org: Organization = Depends(get_current_org)
+    orgname: str = Depends(get_current_orgname)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
     form_data = await request.form()
-    total_rows_str = form_data.get("total_rows")
+    job = await crud_async.get_job_by_id(form_data.get("job_id", ""))
     
-    if not total_rows_str:
+    # Rows come from the finished job, the form only carries the chosen ESCO matches
+    if not job or job.orgname != orgname or job.status != "done":
         return RedirectResponse(url="/org_profile", status_code=status.HTTP_303_SEE_OTHER)
 
-    total_rows = int(total_rows_str)
-    
-    if org.members is None: org.members = {}
-    if org.pending_members is None: org.pending_members = {}
-
-    total_rows = int(total_rows_str)
     updates: dict[str, list[Skill]] = {}
     
-    for i in range(1, total_rows + 1):
-        username = form_data.get(f"username_{i}")
+    for i, item in enumerate(job.skills_to_review, start=1):
+        username = item["username"]
         uri_and_name = form_data.get(f"uri_name_{i}")
-        level_str = form_data.get(f"level_{i}")
         
-        if not username or not uri_and_name or uri_and_name == "SKIP":
+        if not uri_and_name or uri_and_name == "SKIP":
             continue
             
         parts = uri_and_name.split("|||")
         if len(parts) != 2: continue
 
-        skill_obj = Skill(uri=parts[0], name=parts[1], level=int(level_str))
+        skill_obj = Skill(uri=parts[0], name=parts[1], level=int(item["level"]))
         
         if username not in updates:
             updates[username] = []
         updates[username].append(skill_obj)
 
+    # Only the imported members and their projects are read
+    org = await crud_async.get_org_info(orgname, updates.keys())
+    if org.pending_members is None: org.pending_members = {}
+
+    imported = set(org.members)
+    projects = [p for p in await crud_async.get_projects(orgname) if imported & set(p.assigned_members)]
+
+    member_updates: dict[str, list[Skill]] = {}
+    changed_uris: dict[str, set] = {}
+
     for username, new_skills in updates.items():
-        if username in org.members:
+        if username in imported:
+            # Team gaps of the projects of this member, only for the skills that changed
+            uris = crud_skill_models.changed_skill_uris(org.members[username], new_skills)
             org.members[username] = new_skills
+            member_updates[username] = new_skills
+            for project in projects:
+                if username in project.assigned_members:
+                    changed_uris.setdefault(str(project.id), set()).update(uris)
             
             if username in org.pending_members:
                 del org.pending_members[username]
         else:
             org.pending_members[username] = new_skills
-            
-            if username in org.members:
-                del org.members[username]
 
-    crud_org.update_org(org)
+    if member_updates:
+        await crud_async.set_member_skills(orgname, member_updates)
+    for project_id, uris in changed_uris.items():
+        # With the skills just saved, on the current version of the project
+        await crud_async.update_project(orgname, project_id, skill_uris=uris)
+    await crud_async.update_org_info(org)
+
+    job.status = "confirmed"
+    await crud_async.update_job(job)
 
     msg = urllib.parse.quote("Skills processed successfully.")
     return RedirectResponse(url=f"/org_profile?success={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
+### --- Members x Roles Match Matrix --- ###
+@router.get("/org/match_matrix", response_class=HTMLResponse)
+async def org_match_matrix(
+    request: Request,
+    org: Organization = Depends(get_current_org),
+    top: int = Query(10, ge=1, le=100)
+):
+    if not org:
+        return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+
+    matrix = crud_skill_models.org_match_matrix(org, top=top)
+
+    return templates.TemplateResponse(
+        request=request,
+        name="org/match_matrix.html",
+        context={
+            "org": org,
+            "matrix": matrix,
+            "top": top
+        }
+    )
+
 @router.get("/org_global_gap")
 async def org_global_gap():
     return RedirectResponse(url="/org_profile?analyze=true", status_code=status.HTTP_303_SEE_OTHER)
@@ -556,9 +597,9 @@ async def add_course(
     location: Optional[str] = Form(None),
     is_public: bool = Form(False), 
     
-    org: Organization = Depends(get_current_org)
+    orgname: str = Depends(get_current_orgname)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
     new_course = Course(
@@ -577,12 +618,9 @@ async def add_course(
         skills_covered=[] # Added later on!
     )
 
-    # List creation if not present
-    if not hasattr(org, 'courses') or org.courses is None:
-        org.courses = []
-
-    org.courses.append(new_course)
-    crud_org.update_org(org)
+    # Only the course record is written, not the whole organization
+    await crud_async.save_course(orgname, new_course)
+    await crud_async.index_course(orgname, new_course)
 
     msg = urllib.parse.quote("Course created successfully! Now you can add skills.")
     return RedirectResponse(url=f"/org_profile?success={msg}", status_code=status.HTTP_303_SEE_OTHER)
@@ -591,38 +629,37 @@ async def add_course(
 @router.post("/toggle_course_visibility/{course_id}")
 async def toggle_course_visibility(
     course_id: str, 
-    org: Organization = Depends(get_current_org)
+    orgname: str = Depends(get_current_orgname)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    for course in org.courses:
-        if str(course.id) == course_id:
-            # Switch state of visibility
-            course.is_public = not course.is_public
-            crud_org.update_org(org)
-            status_msg = "public" if course.is_public else "private"
-            return RedirectResponse(
-                url=f"/org_profile?success=Course+is+now+{status_msg}", 
-                status_code=status.HTTP_303_SEE_OTHER
-            )
-            
-    return RedirectResponse(url="/org_profile?error=Course+not+found", status_code=status.HTTP_303_SEE_OTHER)
+    def toggle(course: Course):
+        # Switch state of visibility
+        course.is_public = not course.is_public
+
+    course = await crud_async.update_course(orgname, course_id, toggle)
+    if course is None:
+        return RedirectResponse(url="/org_profile?error=Course+not+found", status_code=status.HTTP_303_SEE_OTHER)
+
+    await crud_async.index_course(orgname, course)
+    status_msg = "public" if course.is_public else "private"
+    return RedirectResponse(
+        url=f"/org_profile?success=Course+is+now+{status_msg}", 
+        status_code=status.HTTP_303_SEE_OTHER
+    )
 
 ### --- Delete course --- ###
 @router.post("/delete_course/{course_id}")
 async def delete_course(
     course_id: str, 
-    org: Organization = Depends(get_current_org)
+    orgname: str = Depends(get_current_orgname)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    original_count = len(org.courses)
-    org.courses = [c for c in org.courses if str(c.id) != course_id]
-    
-    if len(org.courses) < original_count:
-        crud_org.update_org(org)
+    if await crud_async.delete_course(orgname, course_id):
+        await crud_async.remove_course(course_id)
         return RedirectResponse(url="/org_profile?success=Course+deleted+successfully", status_code=status.HTTP_303_SEE_OTHER)
         
     return RedirectResponse(url="/org_profile?error=Course+not+found", status_code=status.HTTP_303_SEE_OTHER)
@@ -639,26 +676,27 @@ async def edit_course(
     location: Optional[str] = Form(None),
     link: Optional[str] = Form(None),
     moi: Optional[str] = Form(None),
-    org: Organization = Depends(get_current_org)
+    orgname: str = Depends(get_current_orgname)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
         
-    for course in org.courses:
-        if str(course.id) == course_id:
-            course.title = title
-            course.description = description
-            course.category = category
-            course.format = format
-            course.cost = cost
-            course.location = location
-            course.link = link
-            course.medium_of_instruction = moi
-            
-            crud_org.update_org(org)
-            return RedirectResponse(url="/org_profile?success=Course+updated+successfully", status_code=status.HTTP_303_SEE_OTHER)
-
-    return RedirectResponse(url="/org_profile?error=Course+not+found", status_code=status.HTTP_303_SEE_OTHER)
+    def edit(course: Course):
+        course.title = title
+        course.description = description
+        course.category = category
+        course.format = format
+        course.cost = cost
+        course.location = location
+        course.link = link
+        course.medium_of_instruction = moi
+
+    course = await crud_async.update_course(orgname, course_id, edit)
+    if course is None:
+        return RedirectResponse(url="/org_profile?error=Course+not+found", status_code=status.HTTP_303_SEE_OTHER)
+
+    await crud_async.index_course(orgname, course)
+    return RedirectResponse(url="/org_profile?success=Course+updated+successfully", status_code=status.HTTP_303_SEE_OTHER)
 
 ### --- Add skills to course --- ###
 @router.post("/add_skill_course", response_class=RedirectResponse)
@@ -668,9 +706,9 @@ async def add_skill_course(
     uri: str = Form(...),
     name: str = Form(...),
     skill_search: Optional[str] = Form(None),
-    org: Organization = Depends(get_current_org)
+    orgname: str = Depends(get_current_orgname)
 ):
-    if not org:
+    if not orgname:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
     form_data = await request.form()
@@ -686,28 +724,33 @@ async def add_skill_course(
 
     level = int(selected_level)
 
-    target_course = next((c for c in org.courses if str(c.id) == course_id), None)
-    
-    if not target_course:
-        msg = urllib.parse.quote("Course not found.")
-        return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
-
     try:
         new_skill = Skill(uri=uri, name=name, level=level)
     except ValidationError as e:
         msg = urllib.parse.quote("Invalid skill data.")
         return RedirectResponse(url=f"/org_profile?course_id={course_id}&error={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
-    existing_skill = next((s for s in target_course.skills_covered if s.uri == uri), None)
+    existed = []
+    def add_skill(course: Course):
+        existing_skill = next((s for s in course.skills_covered if s.uri == uri), None)
+        existed[:] = [existing_skill is not None]
+        if existing_skill:
+            existing_skill.level = level
+        else:
+            course.skills_covered.append(new_skill.model_copy())
+
+    target_course = await crud_async.update_course(orgname, course_id, add_skill)
     
-    if existing_skill:
-        existing_skill.level = level
+    if not target_course:
+        msg = urllib.parse.quote("Course not found.")
+        return RedirectResponse(url=f"/org_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
+
+    if existed[0]:
         msg = urllib.parse.quote(f"Skill '{name}' updated to level {level}.")
     else:
-        target_course.skills_covered.append(new_skill)
         msg = urllib.parse.quote(f"Skill '{name}' added successfully to the course.")
 
-    crud_org.update_org(org)
+    await crud_async.index_course(orgname, target_course)
 
     redirect_url = f"/org_profile?course_id={course_id}&success={msg}"
     
@@ -4,15 +4,16 @@ from fastapi import APIRouter, Query, Request, Form, UploadFile, File, status, D
 from fastapi.responses import HTMLResponse, RedirectResponse
 from typing import Optional
 import urllib
-from app.crud import crud_user, crud_org, crud_skill_models
+from app.crud import crud_async, crud_skill_models
 from app.crud import cedefop_read
 from app.service.dependencies import get_current_user
 import csv
 import io
-from app.service.config import templates, pwd_context
+from app.service.config import templates
+from app.service import config, passwords, sessions
 from app.esco import escoAPI
 from app.models import Role, Skill, User, Project
-from app.educational_offerings.courses_recommendation import recommend_courses_for_skill_gap
+from app.educational_offerings.courses_recommendation import gap_severity, recommend_learning_plan
 
 EU_COUNTRIES = [
     "Austria", "Belgium", "Bulgaria", "Croatia", "Cyprus", "Czech Republic", 
@@ -66,27 +67,35 @@ async def user_login(request: Request):
 ### --- User POST Login --- ###
 @router.post("/user_login", response_class=RedirectResponse)
 async def user_login(username: str = Form(...), password: str = Form(...)):
-    user = crud_user.get_user_by_username(username)
+    user = await crud_async.get_user_by_username(username)
 
-    if not user or not pwd_context.verify(password, user.hashed_password):
+    valid, new_hash = await passwords.verify_and_update(password, user.hashed_password) if user else (False, None)
+    if not valid:
         response = RedirectResponse(url="/user_login", status_code=status.HTTP_303_SEE_OTHER)
         
         response.set_cookie(key="flash_error", value="Invalid credentials. Please try again.")
         return response
 
+    # Hash made with older argon2 parameters: upgraded now that the password is known
+    if new_hash:
+        await crud_async.change_password_user(user, new_hash)
+
     response = RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
 
-    response.set_cookie(key="session_token", value=user.username, path="/", httponly=True, max_age=1800)  # 30 minutes session
+    # Random token, the user is found in the session store
+    token = sessions.create_session("user", user.username)
+    response.set_cookie(key="session_token", value=token, path="/", httponly=True, max_age=config.SESSION_TTL)
     response.delete_cookie(key="flash_error")
 
     return response
 
 ### --- Logout --- ###
 @router.get("/user_logout")
-async def logout():
+async def logout(request: Request):
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     # Delete current session
+    sessions.delete_session(request.cookies.get("session_token"))
     response.set_cookie(key="session_token", value="", path="/", httponly=True, max_age=0)
     return response
 
@@ -111,21 +120,16 @@ async def user_home(
 
     if role_search and role_search.strip():
         role_search = role_search.title().strip()
-        role_list = escoAPI.get_esco_occupations_list(role_search, language="en", limit=10)
+        role_list = await escoAPI.get_esco_occupations_list(role_search, language="en", limit=10)
     
     if skill_search and skill_search.strip():
         skill_search = skill_search.title().strip()
-        skill_list = escoAPI.get_esco_skills_list(skill_search, language="en", limit=10)
+        skill_list = await escoAPI.get_esco_skills_list(skill_search, language="en", limit=10)
 
     managed_projects = []
     if user.level == 'manager' and user.organization:
-        org = crud_org.get_org_by_orgname(user.organization)
-        
-        if org and hasattr(org, 'projects'):
-            managed_projects = [
-                proj for proj in org.projects 
-                if proj.manager == user.username
-            ]
+        # Reverse index: only the projects of this manager are read
+        managed_projects = await crud_async.get_managed_projects(user.organization, user.username)
 
     toast_msg = success or error or warning
     toast_type = "success" if success else ("error" if error else ("warning" if warning else None))
@@ -173,10 +177,10 @@ async def register_user(
     username: str = Form(...), 
     password: str = Form(...)
 ):
-    hashed_pw = pwd_context.hash(password)
+    hashed_pw = await passwords.hash_password(password)
     new_user = User(name=name, surname=surname, username=username, hashed_password=hashed_pw)
     try:
-        crud_user.create_user(new_user)
+        await crud_async.create_user(new_user)
         return RedirectResponse(url="/user_login", status_code=status.HTTP_303_SEE_OTHER)
     except ValueError:
         msg = urllib.parse.quote("Username already exists. Please choose another.")
@@ -196,8 +200,8 @@ async def user_profile(
         response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
         return response
 
-    invitations = crud_user.get_pending_invitations_for_user(user.username)
-    org = crud_org.get_org_by_orgname(user.organization)
+    invitations = await crud_async.get_pending_invitations_for_user(user.username)
+    org = await crud_async.get_org_by_orgname(user.organization)
         
     toast_msg = success or error or warning
     toast_type = "success" if success else ("error" if error else ("warning" if warning else None))
@@ -295,7 +299,8 @@ async def add_to_user_target_roles(
 
     if not already_exists:
         user.target_roles.append(role_object)
-        crud_user.update_user(user)
+        crud_skill_models.refresh_skill_gap_user(user) # Only the new role row
+        await crud_async.update_user(user)
         msg = urllib.parse.quote("Target role added successfully!")
         redirect_url += f"&success={msg}"
         return RedirectResponse(url=redirect_url, status_code=status.HTTP_303_SEE_OTHER)
@@ -333,6 +338,7 @@ async def add_to_user_skills(
         skills_list = []
 
     updated_skill = False
+    changed_uris = set()
     
     existing_skills_dict = {s.uri: s for s in user.individual_skills}
 
@@ -349,6 +355,7 @@ async def add_to_user_skills(
                 if existing_skill.level != skill_level:
                     existing_skill.level = skill_level
                     updated_skill = True
+                    changed_uris.add(skill_uri)
             
             else:
                 skill_dict["level"] = skill_level
@@ -357,6 +364,7 @@ async def add_to_user_skills(
                 
                 existing_skills_dict[skill_uri] = new_skill
                 updated_skill = True
+                changed_uris.add(skill_uri)
 
     encoded_uri = urllib.parse.quote(uri, safe='')
     redirect_url = f"/details?uri={encoded_uri}"
@@ -366,7 +374,8 @@ async def add_to_user_skills(
         redirect_url += f"&role_search={encoded_search}"
 
     if updated_skill:
-        crud_user.update_user(user)
+        crud_skill_models.refresh_skill_gap_user(user, changed_uris)
+        await crud_async.update_user(user)
         msg = urllib.parse.quote("Role skills successfully added or updated in your profile!")
         redirect_url += f"&success={msg}"
         return RedirectResponse(url=redirect_url, status_code=status.HTTP_303_SEE_OTHER)
@@ -400,6 +409,7 @@ async def add_single_skill(
 
     skill_level = int(selected_level)
     skill_found = False
+    skill_changed = True
     toast_type = "success"
 
     for existing_skill in user.individual_skills:
@@ -408,6 +418,7 @@ async def add_single_skill(
             if existing_skill.level == skill_level:
                 message_text = "You already have this skill at this exact level."
                 toast_type = "warning"
+                skill_changed = False
             else:
                 existing_skill.level = skill_level
                 message_text = f"Skill \"{existing_skill.name}\" updated to level {skill_level}!"
@@ -418,7 +429,9 @@ async def add_single_skill(
         user.individual_skills.append(new_skill)
         message_text = f"Skill \"{new_skill.name}\" added to your profile!"
 
-    crud_user.update_user(user)
+    if skill_changed:
+        crud_skill_models.refresh_skill_gap_user(user, {uri})
+    await crud_async.update_user(user)
 
     msg = urllib.parse.quote(message_text)
 
@@ -435,13 +448,13 @@ async def change_password(
     if not user:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    if not pwd_context.verify(old_pw, user.hashed_password):
+    if not await passwords.verify_password(old_pw, user.hashed_password):
         warning = "Your old password is not correct."
         msg = urllib.parse.quote(warning)
         return RedirectResponse(url=f"/user_profile?warning={msg}", status_code=status.HTTP_303_SEE_OTHER)
 
-    new_pw_hashed = pwd_context.hash(new_pw)
-    success = crud_user.change_password_user(user, new_pw_hashed) # Updates user too
+    new_pw_hashed = await passwords.hash_password(new_pw)
+    success = await crud_async.change_password_user(user, new_pw_hashed) # Updates user too
     
     if success:
         msg = urllib.parse.quote("Password updated successfully!")
@@ -449,7 +462,14 @@ async def change_password(
     else:
         msg = urllib.parse.quote("Failed to update your password.")
         toast_type = "error"
-    return RedirectResponse(url=f"/user_profile?{toast_type}={msg}", status_code=status.HTTP_303_SEE_OTHER)
+    response = RedirectResponse(url=f"/user_profile?{toast_type}={msg}", status_code=status.HTTP_303_SEE_OTHER)
+
+    if success:
+        # Sessions opened with the old password end (other devices too), this browser gets a new one
+        await crud_async.run(sessions.delete_sessions, "user", user.username)
+        token = await crud_async.run(sessions.create_session, "user", user.username)
+        response.set_cookie(key="session_token", value=token, path="/", httponly=True, max_age=config.SESSION_TTL)
+    return response
     
 ### --- Details for a selected Skill Model --- ###
 @router.get("/details", response_class=HTMLResponse)
@@ -466,7 +486,7 @@ async def details_page(
     if not user:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    selected_role = escoAPI.get_single_role_details(uri, language="en")
+    selected_role = await escoAPI.get_single_role_details(uri, language="en")
 
     if not selected_role:
         return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
@@ -503,7 +523,8 @@ async def delete_target_role(
     
     user.target_roles = new_target_list
 
-    crud_user.update_user(user)
+    crud_skill_models.refresh_skill_gap_user(user) # Drops the row of the removed role
+    await crud_async.update_user(user)
 
     return RedirectResponse(url="/user_profile", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -524,7 +545,8 @@ async def delete_user_skill(
     
     user.individual_skills = new_skills_list
 
-    crud_user.update_user(user)
+    crud_skill_models.refresh_skill_gap_user(user, {skill_uri})
+    await crud_async.update_user(user)
 
     return RedirectResponse(url="/user_profile", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -566,22 +588,14 @@ async def forecast_gap_courses(
             "job_openings_data": job_data
         })
     
-    updated_user = crud_skill_models.skill_gap_user(user, user.target_roles)
-    crud_user.update_user(updated_user)
-
-    # Course recommendation
-    all_missing_skills = {}
-    for role_gap in updated_user.skill_gap:
-        for skill in role_gap.get("missing_skills", []):
-            all_missing_skills[skill.uri] = skill.name
-        for skill_entry in role_gap.get("partially_matching_skills", []):
-            s_obj = skill_entry["skill"]
-            all_missing_skills[s_obj.uri] = s_obj.name
-
-    # print(len(missing_skills))
+    # Stored rows are kept up to date by the handlers changing skills / roles: only missing rows are computed
+    updated_user = user
+    if crud_skill_models.refresh_skill_gap_user(updated_user):
+        await crud_async.update_user(updated_user)
 
-    # List of recommended courses for the missing skills
-    recommended_courses = recommend_courses_for_skill_gap(all_missing_skills, 'individual', user.organization, crud_org.get_all_orgs())
+    # Course recommendation: ranked plan covering the missing and partial skills, weighted by how much is missing
+    learning_plan = await crud_async.run(recommend_learning_plan, gap_severity(updated_user.skill_gap), 'individual', user.organization)
+    recommended_courses = learning_plan["courses"]
 
     return templates.TemplateResponse(
         request=request,
@@ -590,6 +604,7 @@ async def forecast_gap_courses(
             "user": updated_user,
             "forecast_results": forecast_results, 
             "recommended_courses": recommended_courses,
+            "learning_plan": learning_plan,
             "country": country,
             "sector": sector,
             "countries_list": EU_COUNTRIES,
@@ -608,14 +623,14 @@ async def accept_invitation(
     if not user:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    org = crud_org.get_org_by_orgname(orgname)
+    org = await crud_async.get_org_by_orgname(orgname)
     if not org:
         msg = urllib.parse.quote(f"Organization not found!")
         return RedirectResponse(url=f"/user_profile?error={msg}", status_code=303)
     
     if not user.organization:
         user.organization = orgname
-        crud_user.update_user(user)
+        await crud_async.update_user(user)
     else:
         msg = urllib.parse.quote(f"You are already in an organization!")
         return RedirectResponse(url=f"/user_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
@@ -632,12 +647,12 @@ async def accept_invitation(
 
     org.members[user.username] = pending_skills
 
-    inv = crud_org.get_inv_by_id(inv_id)
+    inv = await crud_async.get_inv_by_id(inv_id)
     if inv:
         inv.status = "accepted"
-        crud_org.update_invitation(inv)
+        await crud_async.update_invitation(inv)
 
-    crud_org.update_org(org)
+    await crud_async.update_org(org)
 
     msg = urllib.parse.quote(f"Welcome to {orgname}!")
     return RedirectResponse(url=f"/user_profile?success={msg}", status_code=status.HTTP_303_SEE_OTHER)
@@ -651,10 +666,10 @@ async def decline_invitation(
     if not user:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
-    inv = crud_org.get_inv_by_id(inv_id)
+    inv = await crud_async.get_inv_by_id(inv_id)
     if inv:
         inv.status = "declined"
-        crud_org.update_invitation(inv)
+        await crud_async.update_invitation(inv)
 
     return RedirectResponse(url="/user_profile", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -668,30 +683,37 @@ async def leave_org(
         msg = urllib.parse.quote("Not authorized")
         return RedirectResponse(url=f"/user_profile?error={msg}", status_code=status.HTTP_403_FORBIDDEN)
     
-    org = crud_org.get_org_by_orgname(orgname)
+    # Only the projects of this user (reverse index) and the skills of their teams are read
+    assigned = await crud_async.get_assigned_projects(orgname, user.username)
+    managed = await crud_async.get_managed_projects(orgname, user.username)
+
+    org = await crud_async.get_org_info(orgname, [user.username])
     if not org:
         msg = urllib.parse.quote("Organization not found")
         return RedirectResponse(url=f"/user_profile?error={msg}", status_code=status.HTTP_303_SEE_OTHER)
     
     user.organization = None
-    crud_user.update_user(user)
+    await crud_async.update_user(user)
 
+    member_uris = {s.uri for s in (org.members or {}).get(user.username, [])}
     if org.members and user.username in org.members:
         del org.members[user.username]
+        await crud_async.remove_member(orgname, user.username)
     
     if hasattr(org, 'pending_members') and org.pending_members and user.username in org.pending_members:
         del org.pending_members[user.username]
 
-    if hasattr(org, 'projects') and org.projects:
-        for project in org.projects:
-            if user.username in project.assigned_members:
-                project.assigned_members.remove(user.username)
-
+    def leave(project: Project):
+        if user.username in project.assigned_members:
+            project.assigned_members.remove(user.username)
+        if project.manager == user.username:
             # To be managed, in org home may be possible to re-assigned projects
-            if project.manager == user.username:
-                project.manager = "Unassigned"
+            project.manager = "Unassigned"
 
-    crud_org.update_org(org)
+    # Each project updated on its current version, the team gap without the skills of this user
+    for project_id in dict.fromkeys(str(project.id) for project in assigned + managed):
+        await crud_async.update_project(orgname, project_id, leave, member_uris)
+    await crud_async.update_org_info(org)
 
     msg = urllib.parse.quote(f"You left '{org.name}'")
     return RedirectResponse(url=f"/user_profile?success={msg}", status_code=status.HTTP_303_SEE_OTHER)
@@ -721,6 +743,7 @@ async def upload_skills_csv(
 
     skills_to_review = []
     skills_not_found = []
+    valid_rows = []
 
     for row in csv_reader:
         skill_name = row.get("skill_name")
@@ -735,8 +758,14 @@ async def upload_skills_csv(
         except ValueError:
             continue # Skipping rows where the level is not a valid integer
 
-        # API search to get the official ESCO skill URI and name based on the provided skill name in the CSV
-        search_results = escoAPI.get_esco_skills_list(skill_name, language="en", limit=10)
+        valid_rows.append((skill_name, skill_level))
+
+    # API search to get the official ESCO skill URI and name based on the provided skill name in the CSV
+    # Distinct names are searched concurrently, rows keep the CSV order
+    resolved = await escoAPI.resolve_skills_lists([name for name, _ in valid_rows], language="en", limit=10)
+
+    for skill_name, skill_level in valid_rows:
+        search_results = resolved[skill_name]
         
         if search_results:
             skills_to_review.append({
@@ -777,6 +806,7 @@ async def confirm_skills_csv(
     
     existing_skills_dict = {s.uri: s for s in user.individual_skills}
     updated = False
+    changed_uris = set()
 
     for i in range(1, total_rows + 1):
         uri_and_name = form_data.get(f"uri_name_{i}")
@@ -800,14 +830,17 @@ async def confirm_skills_csv(
             if existing_skills_dict[skill_uri].level != skill_level:
                 existing_skills_dict[skill_uri].level = skill_level
                 updated = True
+                changed_uris.add(skill_uri)
         else:
             new_skill = Skill(uri=skill_uri, name=official_name, level=skill_level)
             user.individual_skills.append(new_skill)
             existing_skills_dict[skill_uri] = new_skill
             updated = True
+            changed_uris.add(skill_uri)
 
     if updated:
-        crud_user.update_user(user)
+        crud_skill_models.refresh_skill_gap_user(user, changed_uris)
+        await crud_async.update_user(user)
 
     return RedirectResponse(url="/user_profile", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -825,10 +858,10 @@ async def create_project_form(
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
+    org = await crud_async.get_org_by_orgname(orgname)
 
     # member list for assignment with checkboxes
-    members = crud_user.get_users_by_usernames(org.members)
+    members = await crud_async.get_users_by_usernames(org.members)
 
     return templates.TemplateResponse(
         request=request,
@@ -851,7 +884,6 @@ async def create_project_submit(
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
 
     new_project = Project(
         name=name,
@@ -862,10 +894,9 @@ async def create_project_submit(
         skill_gap=[]
     )
 
-    org.projects.append(new_project)
-    crud_org.update_org(org)
-
-    if new_project in org.projects:
+    # Project record only (the reverse index of its manager / members follows)
+    if await crud_async.org_exists(orgname):
+        await crud_async.save_project(orgname, new_project)
         success = f"Project '{name}' created successfully!"
         msg = urllib.parse.quote(success)
         return RedirectResponse(url=f"/user_home?success={msg}", status_code=status.HTTP_303_SEE_OTHER)
@@ -889,19 +920,19 @@ async def view_project(
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
-
-    current_project: Optional[Project] = next((p for p in org.projects if str(p.id) == project_id), None)
+    current_project = await crud_async.get_project(orgname, project_id)
 
     if not current_project:
         return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
 
-    team = crud_user.get_users_by_usernames(current_project.assigned_members)
+    # Skills of the team only, shown next to each member
+    org = await crud_async.get_org_info(orgname, current_project.assigned_members)
+    team = await crud_async.get_users_by_usernames(current_project.assigned_members)
 
     role_list = None
     if role_search and role_search.strip():
         role_search = role_search.title().strip()
-        role_list = escoAPI.get_esco_occupations_list(role_search, language="en", limit=10)
+        role_list = await escoAPI.get_esco_occupations_list(role_search, language="en", limit=10)
 
     toast_msg = success or error or warning
     toast_type = "success" if success else ("error" if error else ("warning" if warning else None))
@@ -946,13 +977,12 @@ async def details_page(
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
     
-    current_project: Optional[Project] = next((p for p in org.projects if str(p.id) == project_id), None)
+    current_project = await crud_async.get_project(orgname, project_id)
     if not current_project:
             return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
 
-    selected_role = escoAPI.get_single_role_details(uri, language="en")
+    selected_role = await escoAPI.get_single_role_details(uri, language="en")
 
     if not selected_role:
         return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
@@ -992,7 +1022,6 @@ async def project_add_role(
         return RedirectResponse(url="/", status_code=303)
 
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
 
     form_data = await request.form()
     skills_list = []
@@ -1048,35 +1077,25 @@ async def project_add_role(
         uri=uri
     )
 
-    toast_msg = "Error: target role not added."
-    toast_type = "error" # Toast Rosso 
-    updated_target_role = False
-    project_found = False
+    project = await crud_async.get_project(orgname, project_id)
+    if project is None:
+        return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
 
-    for i, project in enumerate(org.projects):
-        if str(project.id) == project_id:
-            project_found = True
-            already_exists = any(r.uri == uri for r in project.target_roles)
-            
-            if not already_exists:
+    already_exists = any(r.uri == uri for r in project.target_roles)
+
+    if not already_exists:
+        def add_role(project: Project):
+            if not any(r.uri == uri for r in project.target_roles):
                 project.target_roles.append(role_object)
-                
-                org.projects[i] = project 
-                
-                updated_target_role = True
-                toast_msg = f"Role '{title}' added to project successfully!"
-                toast_type = "success"  # Toast Verde 
-            else:
-                toast_msg = f"The role '{title}' is already in your target list."
-                toast_type = "warning"  # Toast Giallo
-            
-            break
 
-    if not project_found:
-        return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
-    
-    if updated_target_role:
-        crud_org.update_org(org)
+        # Only the project record and the skills of its team, the gap is computed for the new role row only
+        await crud_async.update_project(orgname, project_id, add_role)
+
+        toast_msg = f"Role '{title}' added to project successfully!"
+        toast_type = "success"  # Toast Verde 
+    else:
+        toast_msg = f"The role '{title}' is already in your target list."
+        toast_type = "warning"  # Toast Giallo
 
     encoded_msg = urllib.parse.quote(toast_msg)
     return RedirectResponse(url=f"/manager/project/{project_id}?{toast_type}={encoded_msg}&role_search={encoded_search}", status_code=status.HTTP_303_SEE_OTHER)
@@ -1092,19 +1111,11 @@ async def delete_project_target_role(
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
 
-    role_removed = False
-    for project in org.projects:
-        if str(project.id) == project_id:
-            for role in project.target_roles:
-                if role.uri == uri:
-                    project.target_roles.remove(role)
-                    role_removed = True
-                    break
+    def remove_role(project: Project):
+        project.target_roles = [role for role in project.target_roles if role.uri != uri]
 
-    if role_removed:
-        crud_org.update_org(org)
+    await crud_async.update_project(orgname, project_id, remove_role)
 
     return RedirectResponse(url=f"/manager/project/{project_id}", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -1119,14 +1130,14 @@ async def add_member_to_project(
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
 
-    project = next((p for p in org.projects if str(p.id) == project_id), None)
+    project = await crud_async.get_project(orgname, project_id)
     if project is None:
         return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
     
-    user_in_org = next((u for u in org.members if u == username_to_add), None)
-    if not user_in_org:
+    # Skills of the team and of the new member only, not of the whole organization
+    org = await crud_async.get_org_info(orgname, project.assigned_members + [username_to_add])
+    if username_to_add not in org.members:
         msg = f"User '{username_to_add}' is not a member of your organization."
         type_msg = "warning"
     
@@ -1135,8 +1146,13 @@ async def add_member_to_project(
         type_msg = "warning"
     
     else:
-        project.assigned_members.append(username_to_add)
-        crud_org.update_org(org)
+        def add_member(project: Project):
+            if username_to_add not in project.assigned_members:
+                project.assigned_members.append(username_to_add)
+
+        # Team best levels can only improve on the skills of the new member
+        new_member_uris = {s.uri for s in org.members.get(username_to_add, [])}
+        await crud_async.update_project(orgname, project_id, add_member, new_member_uris)
         msg = f"User '{username_to_add}' added to the project successfully!"
         type_msg = "success"
 
@@ -1144,6 +1160,41 @@ async def add_member_to_project(
     msg_type = "success" if type_msg == "success" else ("warning" if type_msg == "warning" else "error")
     return RedirectResponse(url=f"/manager/project/{project_id}?{msg_type}={encoded_msg}", status_code=status.HTTP_303_SEE_OTHER)
 
+### --- Team Optimizer GET --- ###
+@router.get("/manager/project/{project_id}/team_optimizer", response_class=HTMLResponse)
+async def team_optimizer(
+    request: Request,
+    project_id: str,
+    user: User = Depends(get_current_user),
+    mode: str = Query("greedy", pattern="^(greedy|exact)$"),
+    k: Optional[int] = Query(None, ge=1, le=50)
+):
+    if not user:
+        return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+
+    project = await crud_async.get_project(user.organization, project_id)
+    if project is None:
+        return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
+
+    # Candidates: skills of every member, projects and courses are not read
+    members = await crud_async.get_all_member_skills(user.organization)
+
+    # Same team scoring of the project skill gap: the suggested team gets the scores shown on the project page.
+    # CPU bound (exact mode enumerates combinations): run in the pool
+    suggestion = await crud_async.run(crud_skill_models.optimize_team, project, members, mode=mode, k=k)
+
+    return templates.TemplateResponse(
+        request=request,
+        name="user/team_optimizer.html",
+        context={
+            "user": user,
+            "project": project,
+            "suggestion": suggestion,
+            "mode": mode,
+            "k": k
+        }
+    )
+
 ### --- Project Calculate Skill Gap POST --- ###
 @router.post("/manager/project/forecast_gap_courses", response_class=HTMLResponse)
 async def project_forecast_gap_courses(
@@ -1157,13 +1208,10 @@ async def project_forecast_gap_courses(
         return RedirectResponse(url="/", status_code=303)
 
     orgname = user.organization
-    org = crud_org.get_org_by_orgname(orgname)
 
-    project_index = next((i for i, p in enumerate(org.projects) if str(p.id) == project_id), None)
-    if project_index is None:
+    project = await crud_async.get_project(orgname, project_id)
+    if project is None:
         return RedirectResponse(url="/user_home", status_code=status.HTTP_303_SEE_OTHER)
-    
-    project = org.projects[project_index]
 
     if len(project.target_roles) > 5:
         msg = urllib.parse.quote("You can analyze up to 5 target roles at a time.")
@@ -1192,22 +1240,15 @@ async def project_forecast_gap_courses(
             "job_openings_data": job_data             
         })
 
-    assigned_members = crud_user.get_users_by_usernames(project.assigned_members)
-    updated_project = crud_skill_models.skill_gap_project(project, org.members)
-    org.projects[project_index] = updated_project
-    crud_org.update_org(org)
-
-    # Course recommendation
-    all_missing_skills = {}
-    for role_gap in updated_project.skill_gap:
-        for skill in role_gap.get("missing_skills", []):
-            all_missing_skills[skill.uri] = skill.name
-        for skill_entry in role_gap.get("partially_matching_skills", []):
-            s_obj = skill_entry["skill"]
-            all_missing_skills[s_obj.uri] = s_obj.name
+    assigned_members = await crud_async.get_users_by_usernames(project.assigned_members)
+    # Rows missing for some role are computed and saved
+    updated_project = await crud_async.update_project(orgname, project_id) or project
+    # Skills of the team only, for the team table of the page
+    org = await crud_async.get_org_info(orgname, updated_project.assigned_members)
 
-    # List of recommended courses for the missing skills
-    recommended_courses = recommend_courses_for_skill_gap(all_missing_skills, "manager", user.organization, crud_org.get_all_orgs())
+    # Course recommendation: ranked plan covering the missing and partial skills of the team
+    learning_plan = await crud_async.run(recommend_learning_plan, gap_severity(updated_project.skill_gap), "manager", user.organization)
+    recommended_courses = learning_plan["courses"]
 
     return templates.TemplateResponse(
         request=request,
@@ -1218,6 +1259,7 @@ async def project_forecast_gap_courses(
             "is_manager": True,
             "forecast_results": forecast_results, 
             "recommended_courses": recommended_courses,
+            "learning_plan": learning_plan,
             "country": country,
             "sector": sector,
             "countries_list": EU_COUNTRIES,
@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+import httpx
+import numpy as np
+from app.crud import crud_async, crud_user, crud_org, crud_jobs, storage
+from app.models import User
+from app.service import sessions
+
+# p50 / p99 latency of the routes under concurrent mixed read / write load, with the storage I/O
+# on the event loop (blocking, as before app/crud/crud_async.py) and in the I/O thread pool.
+# The app runs in process on a temporary data directory, --io-delay simulates a slow disk (network volume, ...).
+# Usage: python -m app.service.bench_storage_io [--requests 2000] [--concurrency 50] [--io-delay 0.002]
+
+async def _inline(func, *args, **kwargs):
+    # Previous behaviour: the crud function runs on the event loop
+    return func(*args, **kwargs)
+
+def _slow_disk(delay: float):
+    read, write = storage.JsonCollection.read, storage.JsonCollection.write
+
+    def slow_read(self, key):
+        time.sleep(delay)
+        return read(self, key)
+
+    def slow_write(self, key, data, expected_version=None):
+        time.sleep(delay)
+        return write(self, key, data, expected_version)
+
+    storage.JsonCollection.read = slow_read
+    storage.JsonCollection.write = slow_write
+
+def _setup_data(directory: str, users: int) -> list[str]:
+    crud_user.DATA_DIR_USERS = f"{directory}/users"
+    crud_user.DATA_INV_DIR = crud_org.DATA_INV_DIR = f"{directory}/invitations"
+    crud_org.DATA_DIR_ORGS = f"{directory}/organizations"
+    crud_org.DATA_DIR_ORG_MEMBERS = f"{directory}/org_members"
+    crud_org.DATA_DIR_ORG_PROJECTS = f"{directory}/org_projects"
+    crud_org.DATA_DIR_ORG_COURSES = f"{directory}/org_courses"
+    crud_org.DATA_DIR_ORG_USER_PROJECTS = f"{directory}/org_user_projects"
+    crud_org.DATA_DIR_ORG_JOURNAL = f"{directory}/org_journal"
+    crud_jobs.DATA_DIR_JOBS = f"{directory}/import_jobs"
+
+    tokens = []
+    for i in range(users):
+        crud_user.create_user(User(name="Bench", surname=str(i), username=f"bench_{i}", hashed_password="x"))
+        tokens.append(sessions.create_session("user", f"bench_{i}"))
+    return tokens
+
+async def _run_load(app, tokens: list[str], requests: int, concurrency: int, write_ratio: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies = {"read": [], "write": [], "static": []}
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            i = queue.get_nowait()
+            token = rng.choice(tokens)
+            draw = rng.random()
+            start = time.perf_counter()
+            if draw < 0.1:
+                # No storage at all: shows how much the other requests wait for the blocked loop
+                kind = "static"
+                await client.get("/")
+            elif draw < 0.1 + write_ratio:
+                kind = "write"
+                await client.post(
+                    "/add_single_skill",
+                    data={"uri": f"http://skill_{i % 50}", "name": "Bench", f"level_http://skill_{i % 50}": str(i % 8 + 1)},
+                    cookies={"session_token": token}
+                )
+            else:
+                kind = "read"
+                await client.get("/user_home", cookies={"session_token": token})
+            latencies[kind].append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = {"throughput": requests / elapsed}
+    for kind, values in latencies.items():
+        if values:
+            ms = np.array(values) * 1000
+            result[kind] = (float(np.percentile(ms, 50)), float(np.percentile(ms, 99)))
+    return result
+
+def run_benchmark(requests: int = 2000, concurrency: int = 50, users: int = 200, write_ratio: float = 0.3, io_delay: float = 0.002, seed: int = 0) -> dict:
+    from app.main import app
+
+    if io_delay > 0:
+        _slow_disk(io_delay)
+
+    results = {}
+    offloaded_run = crud_async.run
+    for mode in ("blocking", "threadpool"):
+        with tempfile.TemporaryDirectory() as directory:
+            tokens = _setup_data(directory, users)
+            crud_async.run = _inline if mode == "blocking" else offloaded_run
+            try:
+                results[mode] = asyncio.run(_run_load(app, tokens, requests, concurrency, write_ratio, seed))
+            finally:
+                crud_async.run = offloaded_run
+                crud_async.close_pool()
+
+    return results
+
+def print_results(results: dict):
+    print(f"{'mode':<12}{'req/s':>9}  {'read p50/p99 ms':>18}  {'write p50/p99 ms':>18}  {'static p50/p99 ms':>18}")
+    for mode, r in results.items():
+        cols = [f"{r[k][0]:7.1f} / {r[k][1]:7.1f}" if k in r else "-" for k in ("read", "write", "static")]
+        print(f"{mode:<12}{r['throughput']:>9.0f}  {cols[0]:>18}  {cols[1]:>18}  {cols[2]:>18}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--io-delay", type=float, default=0.002, help="seconds added to every document read / write")
+    args = parser.parse_args()
+
+    print_results(run_benchmark(args.requests, args.concurrency, args.users, args.write_ratio, args.io_delay))
@@ -0,0 +1,20 @@
+import sys
+from app.crud.cedefop_store import save_snapshot
+from app.main import SNAPSHOT_PATH, cedefop_sources, load_cedefop_json
+
+# Compiles the CEDEFOP JSON files (data/cedefop) into the binary snapshot loaded by the workers at startup.
+# Usage: python -m app.service.build_cedefop_snapshot [output/dir]
+# Run it again after updating the JSON files: a stale snapshot is ignored and the JSON files are parsed instead.
+
+def build_snapshot(directory=SNAPSHOT_PATH) -> dict:
+    store = load_cedefop_json()
+    manifest = save_snapshot(store, directory, cedefop_sources())
+
+    for key in manifest["series"]:
+        print(f"{key}: {store.series[key].values.nbytes} bytes of arrays.")
+    print(f"Snapshot written in {directory}")
+
+    return manifest
+
+if __name__ == "__main__":
+    build_snapshot(sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH)
@@ -1,8 +1,78 @@
+import os
 from fastapi.templating import Jinja2Templates
 from passlib.context import CryptContext
 
 # Setting dir for templates
 templates = Jinja2Templates(directory="app/templates")
 
-# password managing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
\ No newline at end of file
+# password managing: argon2 cost (passlib defaults), hashes made with other parameters are upgraded at the next login
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))          # iterations
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))      # lanes
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM
+)
+
+# Hashing pool (see app/service/passwords.py): threads hashing at the same time (one core left to the event loop)
+# and requests allowed to wait for one, the others are answered 503
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
+# ESCO API client (shared connection pool, see app/esco/escoAPI.py)
+ESCO_TIMEOUT = float(os.getenv("ESCO_TIMEOUT", "10"))                 # seconds per request
+ESCO_CONNECT_TIMEOUT = float(os.getenv("ESCO_CONNECT_TIMEOUT", "5"))  # seconds to open a connection
+ESCO_RETRIES = int(os.getenv("ESCO_RETRIES", "2"))                    # extra attempts on network errors / 5xx
+ESCO_MAX_CONNECTIONS = int(os.getenv("ESCO_MAX_CONNECTIONS", "20"))   # pool size
+ESCO_MAX_CONCURRENCY = int(os.getenv("ESCO_MAX_CONCURRENCY", "10"))   # in-flight requests at the same time
+ESCO_KEEPALIVE_EXPIRY = float(os.getenv("ESCO_KEEPALIVE_EXPIRY", "30"))
+ESCO_RETRY_BACKOFF = float(os.getenv("ESCO_RETRY_BACKOFF", "0.5"))     # seconds, doubled at every retry
+
+# ESCO responses cache (memory LRU + files in data/esco_cache), ESCO data changes only with new releases
+ESCO_CACHE_TTL = float(os.getenv("ESCO_CACHE_TTL", str(30 * 24 * 3600)))         # seconds, 0 = never expires
+ESCO_CACHE_MEMORY_ENTRIES = int(os.getenv("ESCO_CACHE_MEMORY_ENTRIES", "1000"))
+ESCO_CACHE_DISK_ENTRIES = int(os.getenv("ESCO_CACHE_DISK_ENTRIES", "20000"))
+
+# CSV skill uploads: distinct skill names searched on ESCO at the same time
+ESCO_CSV_WORKERS = int(os.getenv("ESCO_CSV_WORKERS", "8"))
+
+# Employee skills CSV imports (background jobs): rows processed and saved together
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "200"))
+
+# Storage backend for users, organizations and invitations (see app/crud/storage.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")  # "json" or "sqlite"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/storage.db")
+
+# Parsed User / Organization models kept in memory (see app/crud/model_cache.py)
+MODEL_CACHE_ENTRIES = int(os.getenv("MODEL_CACHE_ENTRIES", "1024"))
+
+# Batch skill gap (app/crud/crud_skill_models.py): people scored together, bounds the memory of one pass
+SKILL_GAP_CHUNK_SIZE = int(os.getenv("SKILL_GAP_CHUNK_SIZE", "1024"))
+
+# HR global skill gap analysis: most missing skills shown
+GLOBAL_GAP_TOP_K = int(os.getenv("GLOBAL_GAP_TOP_K", "50"))
+
+# Learning plans (app/educational_offerings/courses_recommendation.py): most courses suggested at once
+LEARNING_PLAN_MAX_COURSES = int(os.getenv("LEARNING_PLAN_MAX_COURSES", "10"))
+
+# Team composition optimizer (app/crud/crud_skill_models.py): most member combinations scored by the exact mode
+TEAM_OPTIMIZER_EXACT_LIMIT = int(os.getenv("TEAM_OPTIMIZER_EXACT_LIMIT", "200000"))
+
+# Login sessions (app/service/sessions.py): "memory" for a single worker, "storage" to share them between workers
+# through the storage backend (JSON files or SQLite, see STORAGE_BACKEND)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))                     # seconds (30 minutes)
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "100000"))   # memory backend, least recently used dropped
+
+# Storage I/O from the async routes (app/crud/crud_async.py): threads reading / writing documents at the same time
+STORAGE_IO_WORKERS = int(os.getenv("STORAGE_IO_WORKERS", "16"))
+
+# Optimistic concurrency (app/crud/storage.py): attempts of a conflicting read-modify-write before giving up
+STORAGE_CAS_RETRIES = int(os.getenv("STORAGE_CAS_RETRIES", "8"))
+
+# Organization journal (app/crud/crud_org.py): entries appended before they are folded into a new snapshot
+ORG_JOURNAL_COMPACT_ENTRIES = int(os.getenv("ORG_JOURNAL_COMPACT_ENTRIES", "200"))
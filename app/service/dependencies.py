@@ -1,22 +1,47 @@
 from fastapi import Request
-from app.crud import crud_org, crud_user
+from app.crud import crud_async
+from app.models import Session
+from app.service import sessions
+
+async def _get_session(request: Request) -> Session | None:
+    token = request.cookies.get("session_token")
+    if isinstance(sessions.store, sessions.MemorySessionStore):
+        # Dict lookup, stays on the event loop
+        return sessions.get_session(token)
+    # Storage backend: file / SQLite read in the storage pool
+    return await crud_async.run(sessions.get_session, token)
+
+# get current session (who is logged in, without reading the user / org)
+async def get_current_session(request: Request) -> Session | None:
+    return await _get_session(request)
 
 # get current user
 async def get_current_user(request: Request):
-    token = request.cookies.get("session_token")
+    session = await _get_session(request)
 
-    if not token:
+    if session is None or session.kind != "user":
         return None
     
-    user = crud_user.get_user_by_username(token)
+    user = await crud_async.get_user_by_username(session.name)
     return user
 
 # get current org
 async def get_current_org(request: Request):
-    token = request.cookies.get("session_token")
+    session = await _get_session(request)
 
-    if not token:
+    if session is None or session.kind != "org":
         return None
 
-    org = crud_org.get_org_by_orgname(token)
-    return org
\ No newline at end of file
+    org = await crud_async.get_org_by_orgname(session.name)
+    return org
+
+# get current orgname (handlers working on single records, the organization is not loaded)
+async def get_current_orgname(request: Request) -> str | None:
+    session = await _get_session(request)
+
+    if session is None or session.kind != "org":
+        return None
+
+    if not await crud_async.org_exists(session.name):
+        return None
+    return session.name
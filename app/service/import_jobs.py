@@ -0,0 +1,116 @@
+import csv
+import io
+from datetime import datetime, timezone
+from app.crud import crud_async, model_cache
+from app.esco import escoAPI
+from app.service import config
+
+### --- Stage 1: parse (rows without data or with an invalid level are skipped) --- ###
+def parse_rows(rows: list[dict]) -> list[tuple[str, str, int]]:
+    parsed = []
+    for row in rows:
+        username = row.get("username")
+        skill_name = row.get("skill_name")
+        level_str = row.get("level")
+
+        if not username or not skill_name or not level_str:
+            continue
+
+        try:
+            level = int(level_str)
+            skill_level = max(1, min(9, level))
+        except ValueError:
+            continue
+
+        parsed.append((username, skill_name, skill_level))
+
+    return parsed
+
+def _chunks(reader, size: int):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+### --- Employee skills CSV import, run as a background task --- ###
+async def run_employee_skills_import(job_id: str, content: str, chunk_size: int = config.IMPORT_CHUNK_SIZE):
+    # Runs after the response: no request scope, users and orgs are always re-checked
+    model_cache.leave_request()
+
+    job = await crud_async.get_job_by_id(job_id)
+    if not job:
+        return
+
+    try:
+        org = await crud_async.get_org_by_orgname(job.orgname)
+        if not org:
+            raise ValueError("Organization not found")
+
+        job.status = "running"
+        # Same reader as the processing: header and blank lines are not counted
+        job.total_rows = sum(1 for _ in csv.DictReader(io.StringIO(content)))
+        await crud_async.update_job(job)
+
+        known_users = {}
+        resolved = {} # skill_name -> ESCO options, shared by all chunks
+
+        for chunk in _chunks(csv.DictReader(io.StringIO(content)), chunk_size):
+            job.stage = "parse"
+            rows = parse_rows(chunk)
+
+            # Stage 2: user lookup, once per username
+            job.stage = "users"
+            to_invite = []
+            for username, _, _ in rows:
+                if username not in known_users:
+                    known_users[username] = await crud_async.get_user_by_username(username) is not None
+                    if not known_users[username]:
+                        job.not_found.append(username)
+                    elif username not in org.members:
+                        to_invite.append(username)
+
+            # Stage 3: invitations for users outside the organization
+            job.stage = "invitations"
+            for username in to_invite:
+                await crud_async.create_invitation(org.orgname, username)
+                job.invited.append(username)
+
+            # Stage 4: ESCO resolution of the names not seen in previous chunks
+            job.stage = "esco"
+            rows = [r for r in rows if known_users[r[0]]]
+            new_names = [name for _, name, _ in rows if name not in resolved]
+            resolved.update(await escoAPI.resolve_skills_lists(new_names, language="en", limit=10))
+
+            for username, skill_name, skill_level in rows:
+                search_results = resolved[skill_name]
+
+                if search_results:
+                    job.skills_to_review.append({
+                        "username": username,
+                        "raw_name": skill_name.capitalize(),
+                        "level": skill_level,
+                        "options": [s.model_dump() for s in search_results]
+                    })
+                else:
+                    job.skills_not_found.append({
+                        "username": username,
+                        "skill_name": skill_name
+                    })
+
+            # Partial results are visible to the status endpoint
+            job.processed_rows += len(chunk)
+            await crud_async.update_job(job)
+
+        job.status = "done"
+    except Exception as e:
+        print(f"Error in import job {job.id}: {e}")
+        job.status = "failed"
+        job.error = str(e)
+
+    job.stage = None
+    job.finished_at = datetime.now(timezone.utc)
+    await crud_async.update_job(job)
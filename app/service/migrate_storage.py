@@ -0,0 +1,53 @@
+import json
+import sys
+from app.crud import crud_user, crud_org, crud_jobs
+from app.crud.storage import JsonCollection, JsonJournal, SqliteCollection
+from app.service import config
+
+# Copies the JSON directories (data/users, data/organizations, data/invitations, ...) into the SQLite database.
+# Usage: python -m app.service.migrate_storage [path/to/storage.db]
+# then start the server with STORAGE_BACKEND=sqlite
+# The organization journals are folded into the migrated organizations: the SQLite journal starts empty.
+
+def migrate_json_to_sqlite(db_path: str = config.SQLITE_PATH) -> dict[str, int]:
+    collections = [
+        ("users", crud_user.DATA_DIR_USERS, crud_user.USER_INDEXES),
+        ("organizations", crud_org.DATA_DIR_ORGS, ()),
+        ("org_members", crud_org.DATA_DIR_ORG_MEMBERS, crud_org.MEMBER_INDEXES),
+        ("org_projects", crud_org.DATA_DIR_ORG_PROJECTS, crud_org.RECORD_INDEXES),
+        ("org_courses", crud_org.DATA_DIR_ORG_COURSES, crud_org.RECORD_INDEXES),
+        ("org_user_projects", crud_org.DATA_DIR_ORG_USER_PROJECTS, crud_org.RECORD_INDEXES),
+        ("invitations", crud_org.DATA_INV_DIR, crud_user.INVITATION_INDEXES),
+        ("import_jobs", crud_jobs.DATA_DIR_JOBS, ())
+    ]
+
+    migrated = {}
+    for name, directory, indexes in collections:
+        source = JsonCollection(name, directory, indexes)
+        target = SqliteCollection(name, db_path, indexes)
+
+        # Same keys as the file names (org member keys are not a field of the document)
+        count = 0
+        for key in source.keys():
+            try:
+                data = source.read(key)
+            except json.JSONDecodeError as e:
+                print(f"Error trying to read {source.path(key)}: {e}")
+                continue
+            if data is None:
+                continue
+
+            if name == "organizations":
+                entries = JsonJournal("org_journal", crud_org.DATA_DIR_ORG_JOURNAL).read(key, after=data.get("journal_seq", 0))
+                data = {**crud_org.replay_journal(data, entries), "journal_seq": 0}
+
+            target.write(key, data)
+            count += 1
+
+        migrated[name] = count
+        print(f"{name}: {count} documents migrated.")
+
+    return migrated
+
+if __name__ == "__main__":
+    migrate_json_to_sqlite(sys.argv[1] if len(sys.argv) > 1 else config.SQLITE_PATH)
@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from app.service import config
+from app.service.config import pwd_context
+
+# Argon2 is CPU bound: hashes are computed in a dedicated pool of threads, never on the event loop.
+# argon2-cffi releases the GIL, so HASH_WORKERS logins are hashed in parallel on different cores while the
+# event loop keeps serving the other requests. At most HASH_MAX_PENDING hashes are queued, then 503.
+
+_executor: ThreadPoolExecutor | None = None
+_pending = 0
+
+def init_pool(workers: int = config.HASH_WORKERS) -> ThreadPoolExecutor:
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+    return _executor
+
+def close_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+def get_pool() -> ThreadPoolExecutor:
+    # Fallback for code running outside the app lifespan (scripts, shell)
+    if _executor is None:
+        return init_pool()
+    return _executor
+
+async def _run(func, *args):
+    global _pending
+    if _pending >= config.HASH_MAX_PENDING:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many logins at the same time, please retry.")
+
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_pool(), func, *args)
+    finally:
+        _pending -= 1
+
+### --- Hash / Verify --- ###
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    valid, _ = await verify_and_update(password, hashed_password)
+    return valid
+
+async def verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # New hash when the stored one was made with other argon2 parameters (to be saved by the caller)
+    try:
+        return await _run(pwd_context.verify_and_update, password, hashed_password)
+    except ValueError:
+        # Not a hash of a known scheme
+        return False, None
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from app.models import Session
+from app.crud import storage
+from app.service import config
+
+# Login sessions: the session_token cookie is a random opaque token, mapped to the logged principal (user or org).
+# Tokens are stored hashed: a leaked store (or data/sessions directory) cannot be used to log in.
+# - MemorySessionStore:  dict lookup, TTL + LRU eviction. Only valid for one worker.
+# - StorageSessionStore: one document per session in the storage backend, shared by all workers.
+# A password change ends every session of the account (delete_sessions), also the ones of other devices.
+
+DATA_DIR_SESSIONS = "data/sessions"
+os.makedirs(DATA_DIR_SESSIONS, exist_ok=True)
+
+SESSION_INDEXES = (("kind", "name"),)
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+### --- Memory backend --- ###
+class MemorySessionStore:
+    def __init__(self, max_entries: int = config.SESSION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Session | None:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if session.expires_at <= time.time():
+                del self._sessions[key]
+                return None
+
+            self._sessions.move_to_end(key)
+            return session
+
+    def set(self, key: str, session: Session):
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def delete_principal(self, kind: str, name: str) -> int:
+        with self._lock:
+            keys = [key for key, session in self._sessions.items() if (session.kind, session.name) == (kind, name)]
+            for key in keys:
+                del self._sessions[key]
+        return len(keys)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, session in self._sessions.items() if session.expires_at <= now]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+### --- Storage backend (JSON files / SQLite) --- ###
+class StorageSessionStore:
+    def collection(self):
+        return storage.get_collection("sessions", DATA_DIR_SESSIONS, SESSION_INDEXES)
+
+    def get(self, key: str) -> Session | None:
+        sessions = self.collection()
+        data = sessions.read(key)
+        if data is None:
+            return None
+
+        session = Session(**data)
+        if session.expires_at <= time.time():
+            sessions.delete(key)
+            return None
+        return session
+
+    def set(self, key: str, session: Session):
+        # The key (hash of the token) is kept in the document: sessions of an account are found by kind + name
+        self.collection().write(key, {**session.model_dump(), "key": key})
+
+    def delete(self, key: str):
+        self.collection().delete(key)
+
+    def delete_principal(self, kind: str, name: str) -> int:
+        sessions = self.collection()
+        found = sessions.find(kind=kind, name=name)
+        if any("key" not in data for data in found):
+            # Written before the key was stored: found by scanning
+            keys = [key for key in sessions.keys() if (data := sessions.read(key)) and (data["kind"], data["name"]) == (kind, name)]
+        else:
+            keys = [data["key"] for data in found]
+
+        for key in keys:
+            sessions.delete(key)
+        return len(keys)
+
+    def purge_expired(self) -> int:
+        sessions, now, count = self.collection(), time.time(), 0
+        for key in sessions.keys():
+            data = sessions.read(key)
+            if data is not None and data["expires_at"] <= now:
+                sessions.delete(key)
+                count += 1
+        return count
+
+    def clear(self):
+        sessions = self.collection()
+        for key in sessions.keys():
+            sessions.delete(key)
+
+def make_store(backend: str = config.SESSION_BACKEND) -> MemorySessionStore | StorageSessionStore:
+    if backend == "storage":
+        return StorageSessionStore()
+    return MemorySessionStore()
+
+store = make_store()
+
+### --- Sessions API used by the login / logout routes and the dependencies --- ###
+def create_session(kind: str, name: str, ttl: int = config.SESSION_TTL) -> str:
+    token = secrets.token_urlsafe(32)
+    store.set(token_key(token), Session(kind=kind, name=name, expires_at=time.time() + ttl))
+    return token
+
+def get_session(token: str | None) -> Session | None:
+    if not token:
+        return None
+    return store.get(token_key(token))
+
+def delete_session(token: str | None):
+    if token:
+        store.delete(token_key(token))
+
+def delete_sessions(kind: str, name: str) -> int:
+    # Every session of the account (password changed): old tokens are rejected from now on
+    return store.delete_principal(kind, name)
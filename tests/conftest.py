@@ -1,7 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from app.crud import crud_user, crud_org
+from app.crud import crud_user, crud_org, crud_jobs, crud_course_index
+from app.esco import escoAPI, esco_local
+from app.esco.esco_cache import EscoCache
 
 # With TestClient we are simulating the browser
 @pytest.fixture(scope="module")
@@ -32,10 +34,12 @@ def mock_database(tmp_path, monkeypatch):
     temp_users_dir = tmp_path / "test_users"
     temp_orgs_dir = tmp_path / "test_orgs"
     temp_inv_dir = tmp_path / "test_invitations"
+    temp_jobs_dir = tmp_path / "test_import_jobs"
     
     temp_users_dir.mkdir(exist_ok=True)
     temp_orgs_dir.mkdir(exist_ok=True)
     temp_inv_dir.mkdir(exist_ok=True)
+    temp_jobs_dir.mkdir(exist_ok=True)
 
     # Forcing code to use new tmp dirs
     monkeypatch.setattr(crud_user, "DATA_DIR_USERS", str(temp_users_dir))
@@ -43,8 +47,25 @@ def mock_database(tmp_path, monkeypatch):
 
     monkeypatch.setattr(crud_org, "DATA_DIR_ORGS", str(temp_orgs_dir))
     monkeypatch.setattr(crud_org, "DATA_INV_DIR", str(temp_inv_dir))
+    monkeypatch.setattr(crud_org, "DATA_DIR_ORG_MEMBERS", str(tmp_path / "test_org_members"))
+    monkeypatch.setattr(crud_org, "DATA_DIR_ORG_PROJECTS", str(tmp_path / "test_org_projects"))
+    monkeypatch.setattr(crud_org, "DATA_DIR_ORG_COURSES", str(tmp_path / "test_org_courses"))
+    monkeypatch.setattr(crud_org, "DATA_DIR_ORG_USER_PROJECTS", str(tmp_path / "test_org_user_projects"))
+    monkeypatch.setattr(crud_org, "DATA_DIR_ORG_JOURNAL", str(tmp_path / "test_org_journal"))
+
+    monkeypatch.setattr(crud_jobs, "DATA_DIR_JOBS", str(temp_jobs_dir))
+
+    monkeypatch.setattr(crud_course_index, "DATA_DIR_COURSE_POSTINGS", str(tmp_path / "test_course_postings"))
+    monkeypatch.setattr(crud_course_index, "DATA_DIR_COURSE_CATALOG", str(tmp_path / "test_course_catalog"))
+
+    # Empty ESCO cache for every test
+    monkeypatch.setattr(escoAPI, "cache", EscoCache(directory=str(tmp_path / "test_esco_cache")))
+    monkeypatch.setattr(esco_local, "mirrors", {})
 
     # Starting tests
     yield
 
+    # Compactions scheduled by the test are done before its directories go away
+    crud_org.close_compactor()
+
     # After testing, the entire tmp_path tree is automatically deleted by pytest
\ No newline at end of file
@@ -0,0 +1,89 @@
+import json
+import numpy as np
+from app.crud import cedefop_read
+from app.crud.cedefop_store import CedefopStore, save_snapshot, load_snapshot
+
+# Helper: small datasets with the same layout of data/cedefop
+def history(start: int, values: list[int]) -> list[dict]:
+    return [{"year": str(start + n), "value": v} for n, v in enumerate(values)]
+
+def make_store() -> CedefopStore:
+    store = CedefopStore()
+    store.add("emp_occupation", {
+        "Italy": {
+            "2": {"history": history(2024, [100, 110, 120]), "trend": "Growing", "growth_pct": 20.0},
+            "9": {"history": history(2024, [50, 45, 40]), "trend": "Declining", "growth_pct": -20.0}
+        },
+        "Spain": {
+            "2": {"history": history(2024, [80, 80, 80]), "trend": "Stable", "growth_pct": 0.0}
+        }
+    })
+    store.add("emp_occupation_detail", {
+        "Italy": {"25": {"history": history(2024, [10, 12, 15]), "trend": "Growing", "growth_pct": 50.0}}
+    })
+    store.add("job_openings", {
+        "Italy": {"2": {"history": [{"year": "2024", "expansion": 5, "replacement": 7, "total_openings": 12}]}}
+    })
+    store.add("isco_definitions", {"25": {"title": "ICT professionals", "description": "", "tasks": ""}})
+    return store
+
+def test_store_keeps_json_shapes():
+    store = make_store()
+
+    assert "job_openings" in store and "isco_definitions" in store
+    assert sorted(store.series) == ["emp_occupation", "emp_occupation_detail", "job_openings"]
+
+    assert cedefop_read.read_emp_occupation(store, " italy ", "2") == {
+        "history": history(2024, [100, 110, 120]), "trend": "Growing", "growth_pct": 20.0
+    }
+    assert cedefop_read.read_emp_occupation(store, "Italy", "2511")["growth_pct"] == 50.0
+    assert cedefop_read.read_job_openings(store, "Italy", "25")["history"] == [
+        {"year": "2024", "expansion": 5, "replacement": 7, "total_openings": 12}
+    ]
+
+    # Missing combinations keep the old error messages
+    assert "error" in cedefop_read.read_emp_occupation(store, "Spain", "9")
+    assert "error" in cedefop_read.read_job_openings(store, "France", "2")
+    assert "error" in cedefop_read.read_qualifications(store, "Italy", "25")
+    assert "error" in cedefop_read.read_emp_sector_occupation(store, "Italy", "Energy", "25")
+
+def test_store_vectorized_queries():
+    store = make_store()
+    table = store.series["emp_occupation"]
+
+    # All ISCO groups for Italy, 2025-2026
+    values = table.select(countries=["Italy"], years=range(2025, 2027))
+    assert values.shape == (1, 2, 2)
+    assert values[0].tolist() == [[110, 120], [45, 40]]
+
+    # Spain has no data for ISCO 9
+    assert np.isnan(table.select(countries=["Spain"], iscos=["9"])).all()
+
+    rates = cedefop_read.read_growth_rates(store, ["2", "2511", "7"])
+    assert rates == {"2": {"Italy": 20.0, "Spain": 0.0}, "25": {"Italy": 50.0}}
+
+def test_snapshot_roundtrip_and_staleness(tmp_path):
+    sources = {
+        "emp_occupation": tmp_path / "db_occupation.json",
+        "isco_definitions": tmp_path / "db_isco_definitions.json",
+        "qualifications": tmp_path / "db_qualifications.json" # missing file
+    }
+    occupation = {"Italy": {"2": {"history": history(2024, [100, 110]), "trend": "Growing", "growth_pct": 10.0}}}
+    sources["emp_occupation"].write_text(json.dumps(occupation))
+    sources["isco_definitions"].write_text(json.dumps({"2": {"title": "Professionals"}}))
+
+    store = CedefopStore()
+    store.add("emp_occupation", occupation)
+    save_snapshot(store, tmp_path / "snapshot", sources)
+
+    loaded = load_snapshot(tmp_path / "snapshot", sources)
+    assert isinstance(loaded.series["emp_occupation"].values, np.memmap)
+    assert loaded.entry("emp_occupation", "Italy", "2") == occupation["Italy"]["2"]
+    assert loaded.raw["isco_definitions"] == {"2": {"title": "Professionals"}}
+    assert "qualifications" not in loaded
+
+    # JSON updated after the build -> snapshot ignored
+    occupation["Italy"]["2"]["growth_pct"] = 12.0
+    sources["emp_occupation"].write_text(json.dumps(occupation))
+    assert load_snapshot(tmp_path / "snapshot", sources) is None
+    assert load_snapshot(tmp_path / "missing", sources) is None
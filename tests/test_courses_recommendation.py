@@ -0,0 +1,76 @@
+import random
+from app.educational_offerings import courses_recommendation
+from app.educational_offerings.courses_recommendation import gap_severity, plan_learning_path
+from app.models import Course, Skill
+
+def skill(uri: str, level: int = 3) -> Skill:
+    return Skill(uri=uri, name=uri, level=level)
+
+def course(title: str, uris: list[str], **fields) -> Course:
+    return Course(title=title, description="", skills_covered=[skill(uri) for uri in uris], **fields)
+
+def test_gap_severity_from_partial_levels():
+    gap = [
+        {"missing_skills": [skill("git")], "partially_matching_skills": [{"skill": skill("sql", 4), "user_level": 3}]},
+        {"missing_skills": [], "partially_matching_skills": [
+            {"skill": skill("sql", 6), "team_best_level": 3},
+            {"skill": skill("git", 2), "team_best_level": 1}
+        ]}
+    ]
+
+    # worst role wins: sql 3/6 -> 0.5, git missing somewhere -> 1
+    assert gap_severity(gap) == {"git": 1.0, "sql": 0.5}
+
+def test_plan_prefers_coverage_per_effort_and_skips_redundant_courses():
+    severity = {"a": 1.0, "b": 1.0, "c": 1.0, "d": 0.25}
+    courses = [
+        course("Everything, expensive", ["a", "b", "c", "d"], cost=4000, duration_weeks=40),
+        course("A and B", ["a", "b"], cost=100, duration_weeks=2),
+        course("C", ["c"], cost=100, duration_weeks=2),
+        course("A again", ["a"], cost=50, duration_weeks=1),
+        course("Unrelated", ["z"], cost=0, duration_weeks=1)
+    ]
+
+    plan = plan_learning_path(severity, courses, max_courses=10)
+
+    titles = [step["course"].title for step in plan["steps"]]
+    assert titles[:2] == ["A and B", "C"]
+    assert "A again" not in titles and "Unrelated" not in titles
+    assert set(plan["steps"][0]["covers"]) == {"a", "b"}
+    assert plan["coverage"] == 1.0 and plan["uncovered"] == []
+    # coverage only grows along the plan
+    assert [s["coverage"] for s in plan["steps"]] == sorted(s["coverage"] for s in plan["steps"])
+
+def test_plan_respects_max_courses():
+    severity = {f"s{i}": 1.0 for i in range(5)}
+    courses = [course(f"C{i}", [f"s{i}"]) for i in range(5)]
+
+    plan = plan_learning_path(severity, courses, max_courses=2)
+
+    assert len(plan["steps"]) == 2
+    assert plan["coverage"] == 0.4
+    assert len(plan["uncovered"]) == 3
+
+def test_lazy_plan_matches_plain_greedy():
+    rng = random.Random(7)
+    uris = [f"s{i}" for i in range(300)]
+    severity = {uri: rng.choice([0.25, 0.5, 1.0]) for uri in uris}
+    courses = [
+        course(f"C{i}", rng.sample(uris, rng.randint(1, 12)), cost=rng.randint(0, 500), ects=rng.randint(1, 10))
+        for i in range(2000)
+    ]
+
+    plan = plan_learning_path(severity, courses, max_courses=25)
+
+    # Plain greedy: every course re-scored at every pick
+    efforts = courses_recommendation.course_effort(courses)
+    covered, expected = set(), []
+    for _ in range(25):
+        gains = [sum(severity[s.uri] for s in c.skills_covered if s.uri not in covered) / efforts[i] for i, c in enumerate(courses)]
+        best = max(range(len(courses)), key=lambda i: (gains[i], -i))
+        if gains[best] <= 0:
+            break
+        expected.append(courses[best].title)
+        covered.update(s.uri for s in courses[best].skills_covered)
+
+    assert [step["course"].title for step in plan["steps"]] == expected
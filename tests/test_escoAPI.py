@@ -1,10 +1,14 @@
+import asyncio
+import os
+import threading
 from unittest.mock import patch, MagicMock
 from app.models import Skill
-from app.esco import escoAPI
-import requests
+from app.esco import escoAPI, esco_local
+from app.esco.esco_cache import EscoCache
+import httpx
 
-# Decorator needed for reaching "requests.get" in main code 
-@patch("app.esco.escoAPI.requests.get")
+# Decorator needed for reaching the shared ESCO client in main code
+@patch("app.esco.escoAPI._request")
 def test_get_esco_occupations_list_success(mock_get):
     
     # Fake HTTP response, for testing
@@ -19,34 +23,34 @@ def test_get_esco_occupations_list_success(mock_get):
         }
     }
 
-    # "requests.get" will return our response
+    # "_request" will return our response
     mock_get.return_value = mock_response
 
     # Calling our function
-    result = escoAPI.get_esco_occupations_list("Developer", "en")
+    result = asyncio.run(escoAPI.get_esco_occupations_list("Developer", "en"))
 
     # Checking results
     assert len(result) == 2
     assert result[0]["title"] == "Software Developer"
     assert result[0]["uri"] == "http://esco/1"
     
-    # Checking if requests.get is getting called at least once
+    # Checking if _request is getting called at least once
     mock_get.assert_called_once()
 
 
-@patch("app.esco.escoAPI.requests.get")
+@patch("app.esco.escoAPI._request")
 def test_get_esco_occupations_list_connection_error(mock_get):
     
-    # "requests.get" will launch an exception, fake for testing
+    # "_request" will launch an exception, fake for testing
     mock_get.side_effect = Exception("Not connected to network")
 
-    result = escoAPI.get_esco_occupations_list("Developer", "en")
+    result = asyncio.run(escoAPI.get_esco_occupations_list("Developer", "en"))
 
     # Checking if result is empty
     assert result == []
 
 
-@patch("app.esco.escoAPI.requests.get")
+@patch("app.esco.escoAPI._request")
 def test_get_esco_skills_list(mock_get):
     
     mock_response = MagicMock()
@@ -59,10 +63,10 @@ def test_get_esco_skills_list(mock_get):
         }
     }
 
-    # "requests.get" will return our response
+    # "_request" will return our response
     mock_get.return_value = mock_response
 
-    result = escoAPI.get_esco_skills_list("Python", "en")
+    result = asyncio.run(escoAPI.get_esco_skills_list("Python", "en"))
 
     # Checking results
     assert len(result) == 1
@@ -71,7 +75,7 @@ def test_get_esco_skills_list(mock_get):
     assert result[0].level == 0
 
 
-@patch("app.esco.escoAPI.requests.get")
+@patch("app.esco.escoAPI._request")
 def test_get_esco_skill_uri_by_name_success(mock_get):
 
     mock_response = MagicMock()
@@ -85,16 +89,16 @@ def test_get_esco_skill_uri_by_name_success(mock_get):
     }
     mock_get.return_value = mock_response
 
-    result = escoAPI.get_esco_skill_uri_by_name("Python")
+    result = asyncio.run(escoAPI.get_esco_skill_uri_by_name("Python"))
 
     # Checking results
     assert result == "http://esco/skill/python_123"
     args, kwargs = mock_get.call_args
-    assert kwargs["params"]["text"] == "Python"
-    assert kwargs["params"]["limit"] == 1  
+    assert args[1]["text"] == "Python"
+    assert args[1]["limit"] == 1  
 
 
-@patch("app.esco.escoAPI.requests.get")
+@patch("app.esco.escoAPI._request")
 def test_get_esco_skill_uri_by_name_not_found(mock_get):
 
     mock_response = MagicMock()
@@ -106,17 +110,223 @@ def test_get_esco_skill_uri_by_name_not_found(mock_get):
     }
     mock_get.return_value = mock_response
 
-    result = escoAPI.get_esco_skill_uri_by_name("SkillInventata")
+    result = asyncio.run(escoAPI.get_esco_skill_uri_by_name("SkillInventata"))
 
     # Check
     assert result is None
 
 
-@patch("app.esco.escoAPI.requests.get")
+@patch("app.esco.escoAPI._request")
 def test_get_esco_skill_uri_by_name_error(mock_get):
 
-    mock_get.side_effect = requests.exceptions.HTTPError("500 Server Error")
+    mock_get.side_effect = httpx.ConnectError("Connection refused")
 
-    result = escoAPI.get_esco_skill_uri_by_name("Python")
+    result = asyncio.run(escoAPI.get_esco_skill_uri_by_name("Python"))
 
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+def test_esco_client_retries_server_errors():
+    calls = []
+
+    # Fake ESCO server: first answer is a 503, then it recovers
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"_embedded": {"results": []}})
+
+    async def run():
+        client = escoAPI.EscoClient(retries=2, retry_backoff=0)
+        await client._http.aclose()
+        client._http = httpx.AsyncClient(base_url=escoAPI.BASE_URL, transport=httpx.MockTransport(handler))
+        response = await client.get("/search", {"text": "Python"})
+        await client.aclose()
+        return response
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert calls[0].url.path == "/esco/api/search"
+
+
+@patch("app.esco.escoAPI._request")
+def test_role_details_served_from_cache(mock_get, tmp_path):
+
+    details_response = MagicMock()
+    details_response.json.return_value = {"title": "Software Developer", "code": "2512.4"}
+    related_response = MagicMock()
+    related_response.json.return_value = {
+        "_embedded": {
+            "hasEssentialSkill": [{"uri": "http://skill/1", "title": "Python Programming"}]
+        }
+    }
+    mock_get.side_effect = [details_response, related_response]
+
+    first = asyncio.run(escoAPI.get_single_role_details("http://esco/1", "en"))
+    second = asyncio.run(escoAPI.get_single_role_details("http://esco/1", "en"))
+
+    # Second view never reaches the network
+    assert mock_get.call_count == 2
+    assert first == second
+    assert second.id == "2512"
+    assert second.essential_skills[0].name == "Python Programming"
+    assert escoAPI.cache.stats()["memory_hits"] == 2
+
+    # Persistent tier survives a restart (new cache on the same directory)
+    restarted = EscoCache(directory=escoAPI.cache.directory)
+    key = escoAPI.make_key("/resource/occupation", {"uri": "http://esco/1", "language": "en"})
+    assert restarted.get(key)["title"] == "Software Developer"
+    assert restarted.stats()["disk_hits"] == 1
+
+
+@patch("app.esco.escoAPI._request")
+def test_esco_cache_files_are_read_and_written_off_the_event_loop(mock_get):
+    response = MagicMock()
+    response.json.return_value = {"title": "Software Developer", "code": "2512.4"}
+    mock_get.return_value = response
+
+    threads = []
+    original_get_disk, original_set = EscoCache.get_disk, EscoCache.set
+    def tracking_get_disk(self, key):
+        threads.append(threading.get_ident())
+        return original_get_disk(self, key)
+    def tracking_set(self, key, data):
+        threads.append(threading.get_ident())
+        original_set(self, key, data)
+
+    async def fetch():
+        return threading.get_ident(), await escoAPI._get_json("/resource/occupation", {"uri": "http://esco/2"})
+
+    with patch.object(EscoCache, "get_disk", tracking_get_disk), patch.object(EscoCache, "set", tracking_set):
+        loop_thread, data = asyncio.run(fetch())
+
+    assert data["title"] == "Software Developer"
+    assert len(threads) == 2 and loop_thread not in threads
+
+def test_esco_cache_ttl_and_size_eviction(tmp_path):
+    cache = EscoCache(directory=str(tmp_path), ttl=0, max_memory_entries=2, max_disk_entries=10)
+
+    for i in range(3):
+        cache.set(f"key_{i}", {"i": i})
+
+    # Oldest entry left the memory tier but is still on disk
+    assert "key_0" not in cache._memory
+    assert cache.get("key_0") == {"i": 0}
+    assert cache.stats()["disk_hits"] == 1
+
+    expired = EscoCache(directory=str(tmp_path), ttl=1)
+    with patch("app.esco.esco_cache.time.time", return_value=10**12):
+        assert expired.get("key_1") is None
+    assert expired.stats()["misses"] == 1
+
+
+def test_esco_cache_files_are_replaced_whole(tmp_path):
+    directory = tmp_path / "replaced_cache"
+    cache = EscoCache(directory=str(directory))
+    cache.set("key", {"v": "old"})
+
+    # Crash in the middle of a write: the previous entry is still readable, no temporary file left
+    def cut_dump(obj, f):
+        f.write('{"key": "key", "stored_at"')
+        raise OSError("disk full")
+    with patch("app.esco.esco_cache.json.dump", side_effect=cut_dump):
+        cache.set("key", {"v": "new"})
+    assert EscoCache(directory=str(directory)).get("key") == {"v": "old"}
+    assert [p.name for p in directory.iterdir()] == [os.path.basename(cache._path("key"))]
+
+    # Same key written by many threads: always a whole file
+    threads = [threading.Thread(target=cache.set, args=("key", {"v": "x" * 10000 + str(i)})) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert EscoCache(directory=str(directory)).get_disk("key")["v"].startswith("x")
+
+def test_esco_cache_created_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(escoAPI, "cache", None)
+    monkeypatch.setattr(escoAPI, "EscoCache", lambda: EscoCache(directory=str(tmp_path / "lazy_cache")))
+    assert not (tmp_path / "lazy_cache").exists()
+
+    assert escoAPI.get_cache() is escoAPI.get_cache()
+    assert (tmp_path / "lazy_cache").is_dir()
+
+
+# Helper: tiny ESCO dataset with the same columns of the official CSV dumps
+def write_esco_dataset(directory):
+    (directory / "skills_en.csv").write_text(
+        "conceptType,conceptUri,skillType,preferredLabel,altLabels,hiddenLabels,description\n"
+        'KnowledgeSkillCompetence,http://skill/python,knowledge,Python (computer programming),"python\npython scripting",,Python language\n'
+        "KnowledgeSkillCompetence,http://skill/java,knowledge,Java (computer programming),java,,Java language\n"
+        "KnowledgeSkillCompetence,http://skill/sql,knowledge,SQL,structured query language,,Query language\n",
+        encoding="utf-8"
+    )
+    (directory / "occupations_en.csv").write_text(
+        "conceptType,conceptUri,iscoGroup,preferredLabel,altLabels,hiddenLabels,description,code\n"
+        'Occupation,http://occ/dev,2512,software developer,"programmer\nsoftware engineer",,Develops software,2512.4\n',
+        encoding="utf-8"
+    )
+    (directory / "occupationSkillRelations_en.csv").write_text(
+        "occupationUri,relationType,skillType,skillUri\n"
+        "http://occ/dev,essential,knowledge,http://skill/python\n"
+        "http://occ/dev,optional,knowledge,http://skill/java\n"
+        "http://occ/dev,essential,knowledge,http://skill/sql\n",
+        encoding="utf-8"
+    )
+
+
+@patch("app.esco.escoAPI._request")
+def test_local_mirror_answers_without_network(mock_get, tmp_path):
+    write_esco_dataset(tmp_path)
+    esco_local.load_mirrors(str(tmp_path))
+
+    # Prefix search on alternative labels
+    skills = asyncio.run(escoAPI.get_esco_skills_list("pyth", "en"))
+    assert [s.uri for s in skills] == ["http://skill/python"]
+
+    occupations = asyncio.run(escoAPI.get_esco_occupations_list("Software Engineer", "en"))
+    assert occupations == [{"uri": "http://occ/dev", "title": "software developer"}]
+
+    role = asyncio.run(escoAPI.get_single_role_details("http://occ/dev", "en"))
+    assert role.id == "2512"
+    assert role.description == "Develops software"
+    assert {s.uri for s in role.essential_skills} == {"http://skill/python", "http://skill/sql"}
+
+    # Everything answered by the mirror
+    mock_get.assert_not_called()
+
+
+def test_local_mirror_ranking():
+    index = esco_local.LabelIndex()
+    index.add("http://a", "data analysis", ["analyse data"])
+    index.add("http://b", "big data analysis tools", [])
+    index.add("http://c", "machine learning", ["data learning"])
+    index.freeze()
+
+    # Exact label first, unrelated labels excluded
+    assert index.search("Data Analysis", limit=10) == ["http://a", "http://b"]
+    assert index.search("data", limit=2) == ["http://a", "http://b"]
+    assert index.search("nothing", limit=10) == []
+
+
+def test_resolve_skills_lists_bounded_and_deduplicated():
+    running = 0
+    peak = 0
+    searched = []
+
+    async def fake_search(keyword, language, limit):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        searched.append(keyword)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return [Skill(uri=f"http://skill/{keyword}", name=keyword, level=0)]
+
+    keywords = ["Python", "SQL", "Python", "Java", "Excel", "SQL"]
+    with patch("app.esco.escoAPI.get_esco_skills_list", side_effect=fake_search):
+        resolved = asyncio.run(escoAPI.resolve_skills_lists(keywords, "en", max_workers=2))
+
+    assert sorted(searched) == ["Excel", "Java", "Python", "SQL"]
+    assert peak <= 2
+    assert resolved["SQL"][0].uri == "http://skill/SQL"
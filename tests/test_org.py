@@ -1,5 +1,7 @@
-from app.crud import crud_org
-from app.models import Organization, Course, Skill, Project
+from app.crud import crud_org, crud_user, crud_skill_models, crud_course_index, storage
+from app.educational_offerings.courses_recommendation import recommend_courses_for_skill_gap
+from app.models import Organization, Course, Skill, Project, Role, User
+from app.service import sessions
 from unittest.mock import patch
 from datetime import datetime
 
@@ -58,8 +60,8 @@ def test_login_prg_success(client):
     assert response.status_code == 303
     assert response.headers["location"] == "/org_home"
 
-    assert "session_token" in response.cookies
-    assert response.cookies["session_token"] == "org_test"
+    session = sessions.get_session(response.cookies["session_token"])
+    assert session.kind == "org" and session.name == "org_test"
     
 def test_login_user_error(client):
     form_data = {
@@ -97,7 +99,7 @@ def setup_logged_in_org(client, orgname="techcorp"):
     )
     crud_org.create_organization(org)
     
-    client.cookies.set("session_token", orgname) 
+    client.cookies.set("session_token", sessions.create_session("org", orgname))
     return orgname
 
 def test_org_profile_unauthorized(client):
@@ -130,7 +132,7 @@ def test_org_profile_search_and_edit(mock_esco_api, client):
     assert "Java Programming" in html_text
     assert "Basic JAVA" in html_text
 
-@patch("app.routers.org.recommend_courses_for_skill_gap")
+@patch("app.routers.org.recommend_learning_plan")
 def test_org_profile_analyze_mode(mock_recommend, client):
     orgname = setup_logged_in_org(client)
     
@@ -153,7 +155,14 @@ def test_org_profile_analyze_mode(mock_recommend, client):
     crud_org.update_org(org_in_db)
     
     # Recommendation
-    mock_recommend.return_value = [{"course_name": "Python", "provider": "TechCorp"}]
+    python_course = Course(title="Python", description="TechCorp", category="Seminar")
+    mock_recommend.return_value = {
+        "steps": [{"course": python_course, "covers": ["http://python"], "gain": 1, "effort": 1, "coverage": 0.5}],
+        "courses": [python_course],
+        "coverage": 0.5,
+        "covered": ["http://python"],
+        "uncovered": ["http://sql"]
+    }
     
     # Route
     response = client.get("/org_profile", params={"analyze": True})
@@ -171,6 +180,50 @@ def test_org_profile_analyze_mode(mock_recommend, client):
     
     assert "Python" in response.text
 
+def test_org_match_matrix(client):
+    orgname = setup_logged_in_org(client)
+
+    org_in_db = crud_org.get_org_by_orgname(orgname)
+    org_in_db.members = {
+        "anna": [Skill(uri="http://python", name="Python", level=8), Skill(uri="http://sql", name="SQL", level=2)],
+        "bruno": [Skill(uri="http://sql", name="SQL", level=6)]
+    }
+    developer = Role(id="2512", title="software developer", essential_skills=[Skill(uri="http://python", name="Python", level=6)])
+    analyst = Role(id="2511", title="data analyst", essential_skills=[Skill(uri="http://sql", name="SQL", level=4)])
+    org_in_db.projects.append(Project(name="Portal", description="...", manager="boss", target_roles=[developer, analyst]))
+    org_in_db.projects.append(Project(name="Reports", description="...", manager="boss", target_roles=[analyst]))
+    crud_org.update_org(org_in_db)
+
+    response = client.get("/org/match_matrix")
+    assert response.status_code == 200
+    assert "Portal, Reports" in response.text
+
+    matrix = crud_skill_models.org_match_matrix(org_in_db)
+    assert [r["role_id"] for r in matrix["roles"]] == ["2512", "2511"]
+    assert [(c["username"], c["match_score"]) for c in matrix["roles"][1]["candidates"]] == [("bruno", 100), ("anna", 50)]
+    assert [r["role_id"] for r in matrix["members"][0]["roles"]] == ["2512", "2511"]
+
+def test_org_match_matrix_roles_with_same_code(client):
+    orgname = setup_logged_in_org(client, "matrix_same_code")
+
+    org_in_db = crud_org.get_org_by_orgname(orgname)
+    org_in_db.members = {
+        "anna": [Skill(uri="http://python", name="Python", level=8)],
+        "bruno": [Skill(uri="http://java", name="Java", level=8)]
+    }
+    # Same ISCO code, different ESCO occupations
+    python_dev = Role(id="2512", uri="http://esco/python-developer", title="python developer", essential_skills=[Skill(uri="http://python", name="Python", level=6)])
+    java_dev = Role(id="2512", uri="http://esco/java-developer", title="java developer", essential_skills=[Skill(uri="http://java", name="Java", level=6)])
+    org_in_db.projects.append(Project(name="Portal", description="...", manager="boss", target_roles=[python_dev]))
+    org_in_db.projects.append(Project(name="Backend", description="...", manager="boss", target_roles=[java_dev, python_dev]))
+    crud_org.update_org(org_in_db)
+
+    matrix = crud_skill_models.org_match_matrix(org_in_db)
+    assert [r["role_title"] for r in matrix["roles"]] == ["python developer", "java developer"]
+    assert [r["projects"] for r in matrix["roles"]] == [["Portal", "Backend"], ["Backend"]]
+    assert matrix["roles"][0]["candidates"][0]["username"] == "anna"
+    assert matrix["roles"][1]["candidates"][0]["username"] == "bruno"
+
 def test_add_course(client):
     orgname = setup_logged_in_org(client, "uni_test")
     
@@ -234,6 +287,104 @@ def test_add_skill_course(client):
     assert corso_aggiornato.skills_covered[0].name == "Java Programming"
     assert corso_aggiornato.skills_covered[0].level == 4
 
+def test_course_index_follows_course_changes(client):
+    orgname = setup_logged_in_org(client, "index_org")
+    crud_org.create_organization(Organization(name="Other", orgname="other_org", hashed_password="x"))
+
+    client.post("/add_course", data={"title": "Java Basics", "description": "...", "category": "Online Course", "is_public": "true"})
+    course_id = str(crud_org.get_org_by_orgname(orgname).courses[0].id)
+    client.post("/add_skill_course", data={"course_id": course_id, "uri": "http://esco/java", "name": "Java", "level_http://esco/java": "4"})
+
+    # Built once from the organizations, then answered from the index only
+    crud_course_index.ensure_course_index()
+    with patch("app.crud.crud_org.get_all_orgs", side_effect=AssertionError("orgs loaded")):
+        courses = recommend_courses_for_skill_gap({"http://esco/java": "Java"}, "individual", "other_org")
+        assert [c.title for c in courses] == ["Java Basics"]
+        assert recommend_courses_for_skill_gap({"http://esco/java": "Java"}, "hr", "other_org") == []
+
+        # Private courses only for their own organization
+        client.post(f"/toggle_course_visibility/{course_id}")
+        assert recommend_courses_for_skill_gap({"http://esco/java": "Java"}, "individual", "other_org") == []
+        assert len(recommend_courses_for_skill_gap({"http://esco/java": "Java"}, "individual", orgname)) == 1
+
+        client.post(f"/delete_course/{course_id}")
+        assert recommend_courses_for_skill_gap({"http://esco/java": "Java"}, "individual", orgname) == []
+
+def test_course_postings_shared_by_organizations(monkeypatch):
+    java = [Skill(uri="http://esco/java-shared", name="Java", level=3)]
+    crud_course_index.index_course("org_a", Course(id="shared_a", title="A", description="...", category="IT", skills_covered=java))
+
+    # Another organization indexes a course of the same skill while the posting is being written
+    original_write = storage.JsonCollection.write
+    def other_org_first(self, key, data, expected_version=None):
+        if self.name == "course_postings":
+            monkeypatch.setattr(storage.JsonCollection, "write", original_write)
+            crud_course_index.index_course("org_c", Course(id="shared_c", title="C", description="...", category="IT", skills_covered=java))
+        return original_write(self, key, data, expected_version)
+    monkeypatch.setattr(storage.JsonCollection, "write", other_org_first)
+
+    crud_course_index.index_course("org_b", Course(id="shared_b", title="B", description="...", category="IT", skills_covered=java))
+    assert sorted(crud_course_index.courses_for_skill("http://esco/java-shared")) == ["shared_a", "shared_b", "shared_c"]
+
+    for course_id in ("shared_a", "shared_b", "shared_c"):
+        crud_course_index.remove_course(course_id)
+    assert not crud_course_index.postings_collection().exists(crud_course_index.posting_key("http://esco/java-shared"))
+
+def test_concurrent_course_edits_keep_the_postings(monkeypatch):
+    java = Skill(uri="http://esco/java-edit", name="Java", level=3)
+    sql = Skill(uri="http://esco/sql-edit", name="SQL", level=3)
+    go = Skill(uri="http://esco/go-edit", name="Go", level=3)
+    course = Course(id="edited", title="A", description="...", category="IT", skills_covered=[java])
+    crud_course_index.index_course("org_a", course)
+
+    # Another edit of the same course is indexed while this one writes the catalog
+    original_write = storage.JsonCollection.write
+    def other_edit_first(self, key, data, expected_version=None):
+        if self.name == "course_catalog":
+            monkeypatch.setattr(storage.JsonCollection, "write", original_write)
+            crud_course_index.index_course("org_a", course.model_copy(update={"skills_covered": [sql]}))
+        return original_write(self, key, data, expected_version)
+    monkeypatch.setattr(storage.JsonCollection, "write", other_edit_first)
+
+    crud_course_index.index_course("org_a", course.model_copy(update={"skills_covered": [go]}))
+
+    # Only the skills of the last catalog entry point to the course
+    assert [s.uri for s in crud_course_index.get_course("edited").skills_covered] == ["http://esco/go-edit"]
+    assert list(crud_course_index.courses_for_skill("http://esco/go-edit")) == ["edited"]
+    assert crud_course_index.courses_for_skill("http://esco/sql-edit") == {}
+    assert crud_course_index.courses_for_skill("http://esco/java-edit") == {}
+
+def test_course_handlers_do_not_load_the_organization(client):
+    orgname = setup_logged_in_org(client, "records_org")
+
+    with patch("app.crud.crud_org.get_org_by_orgname", side_effect=AssertionError("organization loaded")):
+        client.post("/add_course", data={"title": "Go", "description": "...", "category": "IT"}, follow_redirects=False)
+        course_id = crud_org.courses_collection().find(orgname=orgname)[0]["course"]["id"]
+        client.post("/add_skill_course", data={"course_id": course_id, "uri": "http://esco/go", "name": "Go", "level_http://esco/go": "3"}, follow_redirects=False)
+        client.post(f"/toggle_course_visibility/{course_id}", follow_redirects=False)
+
+    course = crud_org.get_org_by_orgname(orgname).courses[0]
+    assert course.title == "Go" and course.is_public is True
+    assert [s.uri for s in course.skills_covered] == ["http://esco/go"]
+
+def test_edit_course_by_id(client):
+    orgname = setup_logged_in_org(client, "edit_org")
+
+    org_in_db = crud_org.get_org_by_orgname(orgname)
+    org_in_db.courses = [Course(id=f"course_{i}", title=f"Course {i}", description="...", category="IT") for i in range(3)]
+    crud_org.update_org(org_in_db)
+
+    form_data = {"title": "Renamed", "description": "New", "category": "IT", "cost": "10"}
+    response = client.post("/edit_course/course_1", data=form_data, follow_redirects=False)
+    assert "success=" in response.headers["location"]
+
+    response = client.post("/edit_course/course_9", data=form_data, follow_redirects=False)
+    assert "error=" in response.headers["location"]
+
+    courses = crud_org.get_org_by_orgname(orgname).courses
+    assert [c.title for c in courses] == ["Course 0", "Renamed", "Course 2"]
+    assert courses[1].cost == 10
+
 def test_delete_course_success(client):
     orgname = setup_logged_in_org(client, "del_org")
     
@@ -257,3 +408,62 @@ def test_delete_course_success(client):
     assert len(org_aggiornata.courses) == 1
     assert str(org_aggiornata.courses[0].id) == "course_2"
 
+
+@patch("app.service.import_jobs.escoAPI.get_esco_skills_list")
+def test_upload_employee_skills_csv_job(mock_esco_api, client):
+    orgname = setup_logged_in_org(client, "import_org")
+    
+    # One member and one user outside the organization
+    org_in_db = crud_org.get_org_by_orgname(orgname)
+    org_in_db.members = {"anna": []}
+    crud_org.update_org(org_in_db)
+    crud_user.create_user(User(name="Anna", surname="Verdi", username="anna", hashed_password="x"))
+    crud_user.create_user(User(name="Bruno", surname="Neri", username="bruno", hashed_password="x"))
+
+    mock_esco_api.return_value = [Skill(uri="http://esco/python", name="Python Programming", level=0)]
+
+    # Blank lines are not rows
+    csv_content = b"username,skill_name,level\nanna,Python,4\n\nbruno,Python,12\nghost,Java,3\n\n"
+    fake_file = {"file": ("team.csv", csv_content, "text/csv")}
+
+    response = client.post("/upload_employee_skills_csv", files=fake_file, follow_redirects=False)
+
+    # Redirect to the job page, the job ran as a background task
+    assert response.status_code == 303
+    job_url = response.headers["location"]
+    assert job_url.startswith("/org/import_jobs/")
+
+    job_status = client.get(f"{job_url}/status").json()
+    assert job_status["status"] == "done"
+    assert job_status["total_rows"] == 3
+    assert job_status["processed_rows"] == 3
+    assert job_status["skills_to_review"] == 2
+
+    # "Python" searched once for both rows
+    assert mock_esco_api.call_count == 1
+
+    review = client.get(job_url)
+    assert review.status_code == 200
+    assert "Python Programming" in review.text
+    assert "Invited: bruno" in review.text
+    job_id = job_url.rsplit("/", 1)[1]
+    assert f'name="job_id" value="{job_id}"' in review.text
+
+    # Confirm: rows are read from the job, the form only carries the choices
+    form_data = {
+        "job_id": job_id,
+        "uri_name_1": "http://esco/python|||Python Programming",
+        "uri_name_2": "SKIP"
+    }
+    response = client.post("/org/confirm_employee_skills", data=form_data, follow_redirects=False)
+    assert response.status_code == 303
+    assert "success=" in response.headers["location"]
+
+    org_in_db = crud_org.get_org_by_orgname(orgname)
+    assert org_in_db.members["anna"][0].uri == "http://esco/python"
+    assert org_in_db.members["anna"][0].level == 4
+    assert "bruno" not in org_in_db.pending_members
+
+    # Confirmed jobs can't be applied twice
+    response = client.get(job_url, follow_redirects=False)
+    assert "error=" in response.headers["location"]
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.service import config, passwords
+
+def test_hashing_runs_in_the_pool():
+    threads = []
+
+    def fake_hash(password):
+        threads.append(threading.current_thread().name)
+        return config.pwd_context.hash(password)
+
+    async def run():
+        hashed = await passwords._run(fake_hash, "Password123!")
+        return await passwords.verify_password("Password123!", hashed), await passwords.verify_password("wrong", hashed)
+
+    assert asyncio.run(run()) == (True, False)
+    assert threads[0].startswith("argon2")
+    assert threads[0] != threading.current_thread().name
+
+def test_unknown_hash_is_not_valid():
+    assert asyncio.run(passwords.verify_and_update("x", "fake_password")) == (False, None)
+
+def test_pool_is_bounded(monkeypatch):
+    monkeypatch.setattr(config, "HASH_MAX_PENDING", 0)
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(passwords.hash_password("x"))
+    assert e.value.status_code == 503
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from starlette.requests import Request
+from app.crud import storage
+from app.models import Session
+from app.service import dependencies, sessions
+
+def test_memory_store_ttl_and_eviction():
+    store = sessions.MemorySessionStore(max_entries=2)
+
+    store.set("a", Session(kind="user", name="anna", expires_at=time.time() + 60))
+    store.set("b", Session(kind="user", name="bruno", expires_at=time.time() - 1))
+    assert store.get("a").name == "anna"
+    assert store.get("b") is None           # expired
+
+    store.set("b", Session(kind="org", name="acme", expires_at=time.time() + 60))
+    store.get("a")                          # a used more recently than b
+    store.set("c", Session(kind="user", name="carla", expires_at=time.time() + 60))
+    assert store.get("b") is None and store.get("a") is not None
+    assert len(store) == 2
+
+def test_storage_store_keeps_hashed_tokens(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "DATA_DIR_SESSIONS", str(tmp_path / "sessions"))
+    monkeypatch.setattr(sessions, "store", sessions.StorageSessionStore())
+
+    token = sessions.create_session("org", "acme")
+    collection = storage.get_collection("sessions", str(tmp_path / "sessions"))
+    assert collection.keys() == [sessions.token_key(token)]
+    assert token not in (tmp_path / "sessions" / f"{sessions.token_key(token)}.json").read_text()
+
+    # Another worker, same directory
+    assert sessions.StorageSessionStore().get(sessions.token_key(token)).name == "acme"
+
+    sessions.store.set("old", Session(kind="user", name="x", expires_at=time.time() - 1))
+    assert sessions.store.purge_expired() == 1
+
+    sessions.delete_session(token)
+    assert sessions.get_session(token) is None
+
+def test_delete_sessions_of_an_account(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "DATA_DIR_SESSIONS", str(tmp_path / "sessions"))
+
+    for store in (sessions.MemorySessionStore(), sessions.StorageSessionStore()):
+        monkeypatch.setattr(sessions, "store", store)
+        tokens = [sessions.create_session("user", "anna") for _ in range(2)]
+        other = sessions.create_session("org", "anna")
+
+        assert sessions.delete_sessions("user", "anna") == 2
+        assert all(sessions.get_session(token) is None for token in tokens)
+        assert sessions.get_session(other).kind == "org"
+
+def test_storage_sessions_are_read_in_the_storage_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "DATA_DIR_SESSIONS", str(tmp_path / "sessions"))
+    monkeypatch.setattr(sessions, "store", sessions.StorageSessionStore())
+    token = sessions.create_session("user", "anna")
+
+    threads = []
+    original_get = sessions.StorageSessionStore.get
+    def tracking_get(self, key):
+        threads.append(threading.current_thread().name)
+        return original_get(self, key)
+    monkeypatch.setattr(sessions.StorageSessionStore, "get", tracking_get)
+
+    request = Request({"type": "http", "headers": [(b"cookie", f"session_token={token}".encode())]})
+    session = asyncio.run(dependencies.get_current_session(request))
+
+    assert session.name == "anna"
+    assert len(threads) == 1 and threads[0].startswith("storage")
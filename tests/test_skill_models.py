@@ -0,0 +1,143 @@
+from app.crud import crud_skill_models
+from app.models import Skill, Role, User, Project, Organization
+
+def skill(uri: str, level: int) -> Skill:
+    return Skill(uri=uri, name=uri, level=level)
+
+ROLES = [
+    Role(id="25", title="Developer", uri="http://role_25", essential_skills=[skill("python", 6), skill("sql", 4), skill("git", 3)]),
+    Role(id="24", title="Analyst", uri="http://role_24", essential_skills=[skill("sql", 6), skill("excel", 3)]),
+    Role(id="00", title="Empty role", uri="http://role_00", essential_skills=[])
+]
+
+def test_skill_gap_user_scores():
+    user = User(name="Mario", surname="Rossi", username="mario", hashed_password="x",
+                individual_skills=[skill("python", 7), skill("sql", 3), skill("excel", 1)])
+
+    gap = crud_skill_models.skill_gap_user(user, ROLES).skill_gap
+
+    # python matched, sql 3/4, git missing -> (1 + 0.75) / 3
+    assert gap[0]["match_score"] == 58
+    assert [s.uri for s in gap[0]["matching_skills"]] == ["python"]
+    assert gap[0]["partially_matching_skills"][0]["user_level"] == 3
+    assert [s.uri for s in gap[0]["missing_skills"]] == ["git"]
+
+    # sql 3/6, excel 1/3 -> (0.5 + 0.333) / 2
+    assert gap[1]["match_score"] == 41
+    assert gap[2]["match_score"] == 0 and gap[2]["total_required"] == 0
+
+def test_batch_matches_single_user_results():
+    people = {
+        "anna": [skill("python", 9), skill("sql", 6), skill("git", 3), skill("excel", 5)],
+        "bruno": [skill("excel", 2)],
+        "carla": []
+    }
+    batch = crud_skill_models.batch_skill_gap(people, ROLES, chunk_size=2)
+
+    assert batch.scores.tolist() == [[100, 100, 0], [0, 33, 0], [0, 0, 0]]
+    assert batch.missing_counts[1].tolist() == [3, 1, 0]
+
+    for n, name in enumerate(people):
+        user = User(name=name, surname="x", username=name, hashed_password="x", individual_skills=people[name])
+        expected = crud_skill_models.skill_gap_user(user, ROLES).skill_gap
+        assert [batch.role_gap(n, m) for m in range(len(ROLES))] == expected
+
+def test_skill_gap_project_uses_best_team_level():
+    members = {"anna": [skill("python", 4), skill("sql", 6)], "bruno": [skill("python", 6)]}
+    project = Project(name="P", description="d", manager="m", assigned_members=["anna", "bruno"], target_roles=ROLES[:1])
+
+    gap = crud_skill_models.skill_gap_project(project, members).skill_gap[0]
+
+    # python 6 (bruno), sql 6 (anna), git missing
+    assert gap["match_score"] == 66
+    assert gap["missing_skills"][0].uri == "git"
+
+def test_refresh_skill_gap_user_recomputes_affected_rows(monkeypatch):
+    user = User(name="Mario", surname="Rossi", username="mario", hashed_password="x",
+                individual_skills=[skill("python", 7), skill("sql", 3)], target_roles=ROLES[:2])
+    assert crud_skill_models.refresh_skill_gap_user(user)
+
+    # Rows saved and read back as JSON
+    user = User.model_validate_json(user.model_dump_json())
+
+    computed_roles = []
+    original = crud_skill_models.BatchSkillGap
+    def spy(names, levels, roles, *args):
+        computed_roles.extend(role.id for role in roles)
+        return original(names, levels, roles, *args)
+    monkeypatch.setattr(crud_skill_models, "BatchSkillGap", spy)
+
+    # Nothing changed: nothing computed, nothing to save
+    assert not crud_skill_models.refresh_skill_gap_user(user)
+    assert computed_roles == []
+
+    # excel is required only by the analyst role
+    user.individual_skills.append(skill("excel", 3))
+    assert crud_skill_models.refresh_skill_gap_user(user, {"excel"})
+    assert computed_roles == ["24"]
+
+    # New role: only its row; removed role: row dropped
+    user.target_roles.append(ROLES[2])
+    crud_skill_models.refresh_skill_gap_user(user)
+    user.target_roles.pop(0)
+    crud_skill_models.refresh_skill_gap_user(user)
+    assert computed_roles == ["24", "00"]
+
+    expected = crud_skill_models.skill_gap_user(user.model_copy(deep=True), user.target_roles).skill_gap
+    assert user.skill_gap == expected
+
+def test_org_global_gap_updated_per_project():
+    org = Organization(name="Acme", orgname="acme", hashed_password="x",
+                       members={"anna": [skill("python", 9)], "bruno": [skill("sql", 6), skill("excel", 3)]})
+    portal = Project(name="Portal", description="d", manager="m", assigned_members=["anna"], target_roles=ROLES[:2])
+    reports = Project(name="Reports", description="d", manager="m", assigned_members=[], target_roles=ROLES[1:2])
+    org.projects = [portal, reports]
+
+    # First update builds the whole aggregate
+    assert crud_skill_models.refresh_org_project_gap(org, portal)
+    crud_skill_models.refresh_org_project_gap(org, reports)
+    assert org.global_gap["sql"]["count"] == 2 and org.global_gap["sql"]["projects"] == ["Portal", "Reports"]
+    assert list(org.global_gap)[:2] == ["sql", "excel"] # Most missing first
+
+    # bruno covers sql and excel for the Portal only
+    portal.assigned_members.append("bruno")
+    crud_skill_models.refresh_org_project_gap(org, portal, {"sql", "excel"})
+    assert org.global_gap["sql"]["projects"] == ["Reports"]
+    assert org.global_gap == crud_skill_models.rebuild_global_gap(org.model_copy(deep=True))
+
+def test_optimize_team_smallest_team_agrees_with_project_gap():
+    members = {
+        "anna": [skill("python", 6)],
+        "bruno": [skill("sql", 6), skill("excel", 1)],
+        "carla": [skill("sql", 4), skill("git", 3), skill("excel", 3)],
+        "dario": [skill("git", 3)],                       # covered by carla: never needed
+        "elsa": [skill("python", 6), skill("git", 3)]
+    }
+    project = Project(name="P", description="", manager="boss", target_roles=ROLES[:2])
+
+    for mode in ("greedy", "exact"):
+        result = crud_skill_models.optimize_team(project, members, mode=mode)
+
+        assert result["mode"] == mode
+        assert result["match_score"] == result["best_match_score"] == 100
+        assert "dario" not in result["members"]
+
+        # Same scores of the project gap page for the suggested team
+        project.assigned_members = result["members"]
+        gap = crud_skill_models.skill_gap_project(project, members).skill_gap
+        assert [r["match_score"] for r in result["roles"]] == [row["match_score"] for row in gap]
+
+    # elsa + bruno + carla reach 100 with excel 3 -> three members, and no pair does
+    assert len(result["members"]) == 3
+
+def test_optimize_team_best_k_and_exact_fallback():
+    members = {f"m{i}": [skill("python", i % 7), skill("sql", (i * 3) % 7), skill("git", i % 4)] for i in range(12)}
+    project = Project(name="P", description="", manager="boss", target_roles=ROLES[:2])
+
+    greedy = crud_skill_models.optimize_team(project, members, k=1)
+    exact = crud_skill_models.optimize_team(project, members, mode="exact", k=2)
+    assert len(greedy["members"]) == 1 and len(exact["members"]) <= 2
+    assert exact["match_score"] >= greedy["match_score"]
+
+    fallback = crud_skill_models.optimize_team(project, members, mode="exact", exact_limit=1)
+    assert fallback["mode"] == "greedy" and fallback["exact_fallback"]
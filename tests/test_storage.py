@@ -0,0 +1,667 @@
+import asyncio
+import json
+import threading
+import time
+from app.crud import crud_async, crud_user, crud_org, storage, model_cache
+from app.models import User, Organization, Project, Course, Role, Skill
+from app.service import config
+from app.service.migrate_storage import migrate_json_to_sqlite
+
+# Helper: switching the crud layer to the SQLite backend
+def use_sqlite(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "test_storage.db")
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(config, "SQLITE_PATH", db_path)
+    return db_path
+
+def test_sqlite_backend_crud(monkeypatch, tmp_path):
+    use_sqlite(monkeypatch, tmp_path)
+
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x", organization="acme"))
+    crud_user.create_user(User(name="Luigi", surname="Verdi", username="luigi", hashed_password="x"))
+    crud_org.create_organization(Organization(name="Acme", orgname="acme", hashed_password="x"))
+
+    # Nothing written in the JSON directories
+    assert sorted(crud_user.users_collection().keys()) == ["luigi", "mario"]
+    assert storage.JsonCollection("users", crud_user.DATA_DIR_USERS).keys() == []
+
+    user = crud_user.get_user_by_username("mario")
+    user.surname = "Bianchi"
+    crud_user.update_user(user)
+    assert crud_user.get_user_by_username("mario").surname == "Bianchi"
+    assert crud_user.change_password_user(user, "new_hash")
+    assert crud_user.get_user_by_username("mario").hashed_password == "new_hash"
+
+    assert sorted(u.username for u in crud_user.get_all_users()) == ["luigi", "mario"]
+    assert [o.orgname for o in crud_org.get_all_orgs()] == ["acme"]
+
+    # Indexed lookups: organization membership and pending invitations
+    members = crud_user.users_collection().find(organization="acme")
+    assert [m["username"] for m in members] == ["mario"]
+
+    crud_org.create_invitation("acme", "luigi")
+    pending = crud_user.get_pending_invitations_for_user("luigi")
+    assert len(pending) == 1
+
+    pending[0].status = "accepted"
+    crud_org.update_invitation(pending[0])
+    assert crud_user.get_pending_invitations_for_user("luigi") == []
+
+def test_migrate_json_to_sqlite(monkeypatch, tmp_path):
+    # Data written with the default JSON backend
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x"))
+    crud_org.create_organization(Organization(name="Acme", orgname="acme", hashed_password="x", members={"mario": []}))
+    crud_org.create_invitation("acme", "mario")
+    # Still in the journal only
+    crud_org.change_password_org(crud_org.get_org_by_orgname("acme"), "new_hash")
+
+    db_path = str(tmp_path / "migrated.db")
+    migrated = migrate_json_to_sqlite(db_path)
+
+    assert migrated["users"] == 1
+    assert migrated["organizations"] == 1
+    assert migrated["org_members"] == 1
+    assert migrated["invitations"] == 1
+
+    # Same crud API on top of the migrated database
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(config, "SQLITE_PATH", db_path)
+
+    assert crud_user.get_user_by_username("mario").name == "Mario"
+    assert crud_org.get_org_by_orgname("acme").name == "Acme"
+    assert crud_org.get_org_by_orgname("acme").hashed_password == "new_hash"
+    assert list(crud_org.get_org_by_orgname("acme").members) == ["mario"]
+    assert crud_user.get_pending_invitations_for_user("mario")[0].orgname == "acme"
+
+def test_json_invitation_index(monkeypatch):
+    crud_org.create_invitation("acme", "anna")
+    crud_org.create_invitation("globex", "anna")
+    crud_org.create_invitation("acme", "bruno")
+
+    # Only the pending invitations of the user are read from disk
+    reads = []
+    original_read = storage.JsonCollection.read
+    def counting_read(self, key):
+        reads.append(key)
+        return original_read(self, key)
+    monkeypatch.setattr(storage.JsonCollection, "read", counting_read)
+
+    pending = crud_user.get_pending_invitations_for_user("anna")
+    assert sorted(inv.orgname for inv in pending) == ["acme", "globex"]
+    assert sorted(reads) == sorted(inv.id for inv in pending)
+
+    # Status change moves the invitation out of the pending entry
+    pending[0].status = "accepted"
+    crud_org.update_invitation(pending[0])
+    assert [inv.orgname for inv in crud_user.get_pending_invitations_for_user("anna")] == [pending[1].orgname]
+
+def test_json_invitation_index_rebuilt_from_disk():
+    invitations = crud_org.invitations_collection()
+
+    # File added without going through the crud layer: the index notices the directory changed
+    invitations.write("manual_inv", {"id": "manual_inv", "orgname": "acme", "username": "carla", "status": "pending"})
+    with open(invitations.path("other_inv"), "w", encoding="utf-8") as f:
+        f.write('{"id": "other_inv", "orgname": "globex", "username": "carla", "status": "pending"}')
+
+    assert sorted(inv.id for inv in crud_user.get_pending_invitations_for_user("carla")) == ["manual_inv", "other_inv"]
+
+    # Index wiped: explicit rebuild gives the same answer
+    import shutil
+    shutil.rmtree(invitations.index_dir)
+    crud_user.rebuild_invitation_index()
+    assert sorted(inv.id for inv in crud_user.get_pending_invitations_for_user("carla")) == ["manual_inv", "other_inv"]
+
+# Helper: counting the documents read from disk
+def count_reads(monkeypatch):
+    reads = []
+    original_read = storage.JsonCollection.read
+    def counting_read(self, key):
+        reads.append(key)
+        return original_read(self, key)
+    monkeypatch.setattr(storage.JsonCollection, "read", counting_read)
+    return reads
+
+def test_model_cache_hits_and_write_through(monkeypatch):
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x"))
+    reads = count_reads(monkeypatch)
+
+    first = crud_user.get_user_by_username("mario")
+    second = crud_user.get_user_by_username("mario")
+    assert reads == []
+    # Every caller gets its own copy
+    assert first == second and first is not second
+    first.surname = "Changed"
+    assert crud_user.get_user_by_username("mario").surname == "Rossi"
+
+    # update_user refreshes the cached entry
+    first.surname = "Bianchi"
+    crud_user.update_user(first)
+    reads.clear()
+    assert crud_user.get_user_by_username("mario").surname == "Bianchi"
+    assert reads == []
+
+def test_model_cache_store_uses_the_stamp_of_its_own_write(monkeypatch):
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x"))
+    user = crud_user.get_user_by_username("mario")
+
+    # Another request writes between our write and the write-through of the cache
+    original_write = storage.JsonCollection.write
+    def write_then_other(self, key, data, expected_version=None):
+        version = original_write(self, key, data, expected_version)
+        monkeypatch.setattr(storage.JsonCollection, "write", original_write)
+        time.sleep(0.01)
+        storage.update(crud_user.users_collection(), key, lambda d: {**d, "name": "Other"})
+        return version
+    monkeypatch.setattr(storage.JsonCollection, "write", write_then_other)
+
+    user.surname = "Bianchi"
+    crud_user.update_user(user)
+
+    stored = crud_user.get_user_by_username("mario")
+    assert (stored.name, stored.surname) == ("Other", "Bianchi")
+
+def test_model_cache_sees_external_edits(monkeypatch):
+    crud_org.create_organization(Organization(name="Acme", orgname="acme", hashed_password="x"))
+    assert crud_org.get_org_by_orgname("acme").name == "Acme"
+
+    path = crud_org.orgs_collection().path("acme")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["name"] = "Acme Corporation"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+    assert crud_org.get_org_by_orgname("acme").name == "Acme Corporation"
+
+def test_model_cache_request_scope(monkeypatch):
+    crud_org.create_organization(Organization(name="Acme", orgname="acme", hashed_password="x"))
+    model_cache.models.clear()
+    crud_org.views.clear()
+    reads = count_reads(monkeypatch)
+
+    token = model_cache.begin_request()
+    try:
+        org = crud_org.get_org_by_orgname("acme")
+        assert crud_org.get_org_by_orgname("acme") is org
+        assert crud_org.get_org_by_orgname("acme") is org
+    finally:
+        model_cache.end_request(token)
+
+    # Parsed once for the whole request
+    assert reads == ["acme"]
+    assert crud_org.get_org_by_orgname("acme") is not org
+
+def test_async_crud_runs_in_pool_with_request_scope(monkeypatch):
+    crud_org.create_organization(Organization(name="Acme", orgname="acme", hashed_password="x"))
+    model_cache.models.clear()
+    crud_org.views.clear()
+    reads = count_reads(monkeypatch)
+
+    threads = []
+    original_get = crud_org.get_org_by_orgname
+    def tracking_get(orgname):
+        threads.append(threading.current_thread().name)
+        return original_get(orgname)
+    monkeypatch.setattr(crud_org, "get_org_by_orgname", tracking_get)
+
+    async def request():
+        token = model_cache.begin_request()
+        try:
+            first = await crud_async.get_org_by_orgname("acme")
+            second, third = await asyncio.gather(crud_async.get_org_by_orgname("acme"), crud_async.get_org_by_orgname("acme"))
+            return first is second is third
+        finally:
+            model_cache.end_request(token)
+
+    # Same request -> same object, even from different pool threads
+    assert asyncio.run(request())
+    assert reads == ["acme"]
+    assert all(name.startswith("storage") for name in threads)
+
+def test_json_writes_are_atomic():
+    users = crud_user.users_collection()
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x"))
+
+    errors = []
+    def reader():
+        for _ in range(200):
+            try:
+                users.read("mario")
+            except json.JSONDecodeError as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(200):
+        users.write("mario", {"username": "mario", "surname": "x" * (i % 50)})
+    thread.join()
+
+    assert errors == []
+    assert [key for key in users.keys()] == ["mario"]
+
+
+### --- Organizations stored as separate records --- ###
+def count_writes(monkeypatch):
+    writes = []
+    original_write = storage.JsonCollection.write
+    def counting_write(self, key, data, expected_version=None):
+        writes.append(self.name)
+        return original_write(self, key, data, expected_version)
+    monkeypatch.setattr(storage.JsonCollection, "write", counting_write)
+    return writes
+
+def big_org() -> Organization:
+    return Organization(
+        name="Acme", orgname="acme", hashed_password="x",
+        members={f"user_{i}": [Skill(uri=f"http://skill_{i}", name="S", level=3)] for i in range(50)},
+        projects=[Project(id=f"p{i}", name=f"P{i}", description="", manager="user_0") for i in range(5)],
+        courses=[Course(id=f"c{i}", title=f"C{i}", description="", category="IT") for i in range(5)]
+    )
+
+def test_org_update_writes_only_changed_records(monkeypatch):
+    crud_org.create_organization(big_org())
+    writes = count_writes(monkeypatch)
+
+    org = crud_org.get_org_by_orgname("acme")
+    org.courses[3].is_public = True
+    org.members["user_7"].append(Skill(uri="http://new", name="New", level=2))
+    del org.projects[1]
+    crud_org.update_org(org)
+
+    # One course, one member, the deleted project is removed (and from the projects of its manager).
+    # The organization document is not rewritten: one journal entry naming the records
+    assert sorted(writes) == ["org_courses", "org_members", "org_user_projects"]
+    entries = crud_org.journal_collection().read("acme")
+    assert [entry for _, entry in entries] == [{"op": "update", "parts": ["member:user_7", "course:c3", "project:p1"]}]
+    assert crud_org.get_project("acme", "p1") is None
+
+    # Same order as before, changes visible also without the cache
+    crud_org.views.clear()
+    org = crud_org.get_org_by_orgname("acme")
+    assert list(org.members) == [f"user_{i}" for i in range(50)]
+    assert [p.id for p in org.projects] == ["p0", "p2", "p3", "p4"]
+    assert org.courses[3].is_public and len(org.members["user_7"]) == 2
+
+    # Nothing changed: nothing written
+    writes.clear()
+    crud_org.update_org(org)
+    assert writes == [] and len(crud_org.journal_collection().read("acme")) == 1
+
+def test_org_single_records_invalidate_the_view():
+    crud_org.create_organization(big_org())
+    crud_org.get_org_by_orgname("acme")
+
+    course = crud_org.get_course("acme", "c2")
+    course.title = "Renamed"
+    crud_org.save_course("acme", course)
+    crud_org.save_course("acme", Course(id="c9", title="Added", description="", category="IT"))
+
+    org = crud_org.get_org_by_orgname("acme")
+    assert [c.title for c in org.courses] == ["C0", "C1", "Renamed", "C3", "C4", "Added"]
+    # Records of other organizations are not visible, ids are never used as paths
+    assert crud_org.get_course("other", "c2") is None
+    assert crud_org.get_course("acme", "../organizations/acme") is None
+
+    info = crud_org.get_org_info("acme", ["user_1", "missing"])
+    assert list(info.members) == ["user_1"] and info.projects == [] and info.global_gap == {}
+
+def test_org_old_single_document_is_split_on_read():
+    # Organizations saved before the split: everything in data/organizations/<orgname>.json
+    legacy = big_org().model_dump(mode="json")
+    crud_org.orgs_collection().write("acme", legacy)
+
+    # Single records are found also before the first full load
+    assert crud_org.get_project("acme", "p3").name == "P3"
+
+    core = crud_org.orgs_collection().read("acme")
+    assert "members" not in core and "projects" not in core and "courses" not in core
+
+    # Global gap computed when split (no project with a gap here)
+    org = crud_org.get_org_by_orgname("acme")
+    assert org.model_dump(mode="json") == {**legacy, "global_gap": {}}
+
+def test_org_record_saved_before_the_split_keeps_the_old_data():
+    crud_org.orgs_collection().write("acme", big_org().model_dump(mode="json"))
+
+    crud_org.save_course("acme", Course(id="c9", title="Added", description="", category="IT"))
+
+    org = crud_org.get_org_by_orgname("acme")
+    assert len(org.members) == 50 and len(org.projects) == 5
+    assert [c.id for c in org.courses] == ["c0", "c1", "c2", "c3", "c4", "c9"]
+
+def test_org_member_projects_reverse_index():
+    org = big_org()
+    org.projects[1].assigned_members = ["user_1", "user_2"]
+    org.projects[3].assigned_members = ["user_1"]
+    org.projects[3].manager = "user_9"
+    crud_org.create_organization(org)
+
+    assert [p.id for p in crud_org.get_assigned_projects("acme", "user_1")] == ["p1", "p3"]
+    assert [p.id for p in crud_org.get_managed_projects("acme", "user_0")] == ["p0", "p1", "p2", "p4"]
+
+    # Kept in sync by every project write
+    project = crud_org.get_project("acme", "p1")
+    project.assigned_members = ["user_2", "user_5"]
+    crud_org.save_project("acme", project)
+
+    org = crud_org.get_org_by_orgname("acme")
+    org.projects = [p for p in org.projects if p.id != "p3"]
+    crud_org.update_org(org)
+
+    assert crud_org.get_assigned_projects("acme", "user_1") == []
+    assert [p.id for p in crud_org.get_assigned_projects("acme", "user_5")] == ["p1"]
+    assert crud_org.get_managed_projects("acme", "user_9") == []
+
+def test_org_member_projects_index_built_from_records():
+    # Organization saved before the index existed
+    crud_org.orgs_collection().write("acme", big_org().model_dump(mode="json"))
+
+    assert len(crud_org.get_managed_projects("acme", "user_0")) == 5
+    assert crud_org.get_managed_projects("acme", "user_1") == []
+
+### --- Versions: compare-and-swap writes --- ###
+def test_versioned_writes(monkeypatch, tmp_path):
+    for collection in (storage.JsonCollection("docs", str(tmp_path / "docs")), None):
+        if collection is None:
+            use_sqlite(monkeypatch, tmp_path)
+            collection = storage.get_collection("docs", str(tmp_path / "docs"))
+
+        assert collection.write("a", {"n": 1}, expected_version=0) == 1
+        assert collection.write("a", {"n": 2}, expected_version=1) == 2
+        assert collection.read("a") == {"n": 2, "_version": 2}
+
+        # Written by someone else after version 1 was read
+        try:
+            collection.write("a", {"n": 3}, expected_version=1)
+            assert False, "stale write accepted"
+        except storage.VersionConflict:
+            pass
+        assert collection.read("a")["n"] == 2
+
+        try:
+            collection.delete("a", expected_version=1)
+            assert False, "stale delete accepted"
+        except storage.VersionConflict:
+            pass
+        collection.delete("a", expected_version=2)
+        assert collection.read("a") is None
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    collection = storage.JsonCollection("counters", str(tmp_path / "counters"))
+    collection.write("c", {"n": 0})
+
+    def increment():
+        for _ in range(25):
+            storage.update(collection, "c", lambda data: {"n": data["n"] + 1}, retries=1000)
+
+    threads = [threading.Thread(target=increment) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert collection.read("c") == {"n": 200, "_version": 201}
+
+def test_update_user_merges_concurrent_changes():
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x"))
+    model_cache.models.clear()
+
+    # Two requests load the user, each changes one field
+    first = crud_user.get_user_by_username("mario")
+    second, third = User.model_validate(first.model_dump()), User.model_validate(first.model_dump())
+    second._stored = third._stored = first._stored
+
+    first.surname = "Bianchi"
+    crud_user.update_user(first)
+    assert crud_user.change_password_user(first, "new_hash")
+    second.name = "Luigi"
+    crud_user.update_user(second)
+
+    user = crud_user.get_user_by_username("mario")
+    assert (user.name, user.surname, user.hashed_password) == ("Luigi", "Bianchi", "new_hash")
+    # The merged object is up to date
+    assert (second.surname, second.hashed_password) == ("Bianchi", "new_hash")
+
+    # The same field changed in two different ways
+    third.surname = "Verdi"
+    try:
+        crud_user.update_user(third)
+        assert False, "conflicting update accepted"
+    except storage.VersionConflict:
+        pass
+    assert crud_user.get_user_by_username("mario").surname == "Bianchi"
+
+def test_create_user_twice_fails():
+    crud_user.create_user(User(name="Mario", surname="Rossi", username="mario", hashed_password="x"))
+    try:
+        crud_user.create_user(User(name="Other", surname="Rossi", username="mario", hashed_password="y"))
+        assert False, "username registered twice"
+    except ValueError:
+        pass
+    assert crud_user.get_user_by_username("mario").name == "Mario"
+
+def test_concurrent_project_updates_are_all_kept():
+    crud_org.create_organization(big_org())
+    crud_org.get_org_info("acme")
+
+    def add_members(first: int):
+        for i in range(first, first + 10):
+            crud_org.update_project("acme", "p0", lambda project: project.assigned_members.append(f"user_{i}"))
+
+    threads = [threading.Thread(target=add_members, args=(first,)) for first in (0, 10, 20, 30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(crud_org.get_project("acme", "p0").assigned_members) == sorted(f"user_{i}" for i in range(40))
+    assert len(crud_org.get_assigned_projects("acme", "user_25")) == 1
+
+def test_concurrent_project_assignments_keep_the_reverse_index():
+    crud_org.create_organization(big_org())
+    crud_org.get_assigned_projects("acme", "user_1")
+
+    # Same member added to every project at the same time: one index entry, updated by every thread
+    def assign(project_id: str):
+        crud_org.update_project("acme", project_id, lambda project: project.assigned_members.append("user_1"))
+
+    threads = [threading.Thread(target=assign, args=(f"p{i}",)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(p.id for p in crud_org.get_assigned_projects("acme", "user_1")) == [f"p{i}" for i in range(5)]
+
+    def unassign(project_id: str):
+        crud_org.update_project("acme", project_id, lambda project: project.assigned_members.remove("user_1"))
+
+    threads = [threading.Thread(target=unassign, args=(f"p{i}",)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert crud_org.get_assigned_projects("acme", "user_1") == []
+    # Empty entries are removed
+    assert not crud_org.user_projects_collection().exists(crud_org.member_key("acme", "user_1"))
+
+def test_concurrent_project_saves_keep_the_reverse_index(monkeypatch):
+    crud_org.create_organization(big_org())
+    crud_org.get_assigned_projects("acme", "user_1")
+
+    def save(username: str):
+        project = crud_org.get_project("acme", "p0")
+        project.assigned_members = [username]
+        crud_org.save_project("acme", project)
+
+    # Another request saves the project with its own team just before our write
+    original_write = storage.JsonCollection.write
+    def other_save_first(self, key, data, expected_version=None):
+        if self.name == "org_projects":
+            monkeypatch.setattr(storage.JsonCollection, "write", original_write)
+            save("user_2")
+        return original_write(self, key, data, expected_version)
+    monkeypatch.setattr(storage.JsonCollection, "write", other_save_first)
+
+    save("user_1")
+
+    assert crud_org.get_project("acme", "p0").assigned_members == ["user_1"]
+    assert [p.id for p in crud_org.get_assigned_projects("acme", "user_1")] == ["p0"]
+    assert crud_org.get_assigned_projects("acme", "user_2") == []
+
+def test_set_member_skills_does_not_add_back_removed_members():
+    crud_org.create_organization(big_org())
+    crud_org.remove_member("acme", "user_3")
+
+    crud_org.set_member_skills("acme", {"user_3": [], "user_4": []})
+
+    members = crud_org.get_org_by_orgname("acme").members
+    assert "user_3" not in members and members["user_4"] == []
+
+def test_org_loaded_twice_merges_record_changes():
+    crud_org.create_organization(big_org())
+
+    first = crud_org.get_org_by_orgname("acme")
+    second = Organization.model_validate(first.model_dump())
+    second._stored = dict(first._stored)
+
+    first.projects[0].name = "Renamed"
+    first.pending_members = {"new": []}
+    crud_org.update_org(first)
+    second.projects[0].description = "Described"
+    second.courses[1].is_public = True
+    crud_org.update_org(second)
+
+    for org in (crud_org.get_org_by_orgname("acme"), second):
+        assert (org.projects[0].name, org.projects[0].description) == ("Renamed", "Described")
+        assert org.courses[1].is_public and org.pending_members == {"new": []}
+
+### --- Organization journal --- ###
+def gap_project(project_id: str, skill_uri: str) -> Project:
+    role = Role(id="1", title="Dev", uri=f"http://role_{project_id}", essential_skills=[Skill(uri=skill_uri, name=skill_uri, level=3)])
+    return Project(id=project_id, name=project_id.upper(), description="", manager="user_0", target_roles=[role])
+
+def test_org_changes_are_journaled_and_compacted():
+    org = big_org()
+    org.projects = [gap_project("p0", "http://git"), gap_project("p1", "http://sql")]
+    crud_org.create_organization(org)
+    info = crud_org.get_org_info("acme")
+    # Global gap computed when the organization was created (no gap rows yet), the read wrote nothing
+    assert info.global_gap == {}
+    assert crud_org.journal_collection().read("acme") == []
+    snapshot = crud_org.orgs_collection().read("acme")
+
+    info.pending_members = {"new": [Skill(uri="http://git", name="Git", level=1)]}
+    crud_org.update_org_info(info)
+    crud_org.change_password_org(info, "new_hash")
+    # p0: first gap rows (git missing) -> moved in the global gap, p1: no gap change -> only named
+    crud_org.update_project("acme", "p0", lambda project: project.assigned_members.append("user_2"))
+    crud_org.update_project("acme", "p1", lambda project: project.target_roles.clear())
+    crud_org.set_member_skills("acme", {"user_3": []})
+
+    # Small entries appended, the snapshot is not rewritten
+    assert crud_org.orgs_collection().read("acme") == snapshot
+    entries = [entry for _, entry in crud_org.journal_collection().read("acme")]
+    assert [entry["op"] for entry in entries] == ["update", "update", "gap", "update", "update"]
+    assert entries[0]["set"] == [[["pending_members", "new"], [{"uri": "http://git", "name": "Git", "level": 1}]]]
+    assert entries[1] == {"op": "update", "set": [[["hashed_password"], "new_hash"]]}
+
+    expected = crud_org.get_org_by_orgname("acme").model_dump(mode="json")
+    assert expected["hashed_password"] == "new_hash" and list(expected["global_gap"]) == ["http://git"]
+
+    # Folded into a new snapshot: same organization, empty journal
+    assert crud_org.compact_org("acme")
+    assert crud_org.journal_collection().read("acme") == []
+    assert crud_org.orgs_collection().read("acme")["global_gap"]["http://git"]["project_ids"] == ["p0"]
+    crud_org.views.clear()
+    assert crud_org.get_org_by_orgname("acme").model_dump(mode="json") == expected
+    assert not crud_org.compact_org("acme")
+
+    # Numbering goes on after the compaction, also in a new process
+    storage._journal_state.clear()
+    crud_org.set_member_skills("acme", {"user_4": []})
+    assert crud_org.journal_collection().read("acme")[0][0] == 6
+
+def test_org_global_gap_filled_at_startup_not_on_reads():
+    org = big_org()
+    org.projects = [gap_project("p0", "http://git")]
+    crud_org.create_organization(org)
+    crud_org.update_project("acme", "p0", lambda project: project.assigned_members.append("user_2"))
+    # Saved before the global gap existed
+    crud_org.compact_org("acme")
+    snapshot = crud_org.orgs_collection().read("acme")
+    del snapshot["global_gap"]
+    crud_org.orgs_collection().write("acme", snapshot)
+
+    # Computed for the page, nothing written
+    assert list(crud_org.get_org_info("acme").global_gap) == ["http://git"]
+    assert crud_org.journal_collection().read("acme") == []
+
+    # Old single documents are left to their split
+    crud_org.orgs_collection().write("legacy", {**big_org().model_dump(mode="json"), "orgname": "legacy"})
+
+    assert crud_org.fill_global_gaps() == 1
+    assert crud_org.fill_global_gaps() == 0
+    assert "projects" in crud_org.orgs_collection().read("legacy")
+    assert crud_org.get_org_by_orgname("acme").global_gap["http://git"]["project_ids"] == ["p0"]
+
+def test_org_read_during_compaction(monkeypatch):
+    crud_org.create_organization(big_org())
+    crud_org.get_org_info("acme")
+    crud_org.compact_org("acme")
+    crud_org.change_password_org(crud_org.get_org_info("acme"), "new_hash")
+    crud_org.views.clear()
+    model_cache.models.clear()
+
+    # The snapshot is read before the compaction, the journal after it
+    original_read = storage.JsonJournal.read
+    def compact_first(self, key, after=0):
+        monkeypatch.setattr(storage.JsonJournal, "read", original_read)
+        assert crud_org.compact_org("acme")
+        return original_read(self, key, after)
+    monkeypatch.setattr(storage.JsonJournal, "read", compact_first)
+
+    assert crud_org.get_org_by_orgname("acme").hashed_password == "new_hash"
+
+def test_org_journal_compacted_in_background(monkeypatch):
+    monkeypatch.setattr(config, "ORG_JOURNAL_COMPACT_ENTRIES", 5)
+    crud_org.create_organization(big_org())
+
+    for i in range(12):
+        crud_org.set_member_skills("acme", {f"user_{i}": [Skill(uri="http://bg", name="Bg", level=i % 8 + 1)]})
+    crud_org.close_compactor()
+
+    assert len(crud_org.journal_collection().read("acme")) <= 5
+    org = crud_org.get_org_by_orgname("acme")
+    assert [org.members[f"user_{i}"][0].level for i in range(12)] == [i % 8 + 1 for i in range(12)]
+
+def test_org_journal_sqlite(monkeypatch, tmp_path):
+    use_sqlite(monkeypatch, tmp_path)
+    crud_org.create_organization(big_org())
+
+    info = crud_org.get_org_info("acme")
+    info.pending_members = {"new": []}
+    crud_org.update_org_info(info)
+    # Pending members only: the global gap was computed when the organization was created, reads never write
+    assert len(crud_org.journal_collection().read("acme")) == 1
+
+    assert crud_org.compact_org("acme")
+    assert crud_org.journal_collection().read("acme") == []
+    crud_org.change_password_org(info, "new_hash")
+
+    org = crud_org.get_org_by_orgname("acme")
+    assert org.pending_members == {"new": []} and org.hashed_password == "new_hash"
+
+def test_json_journal_ignores_a_cut_last_line(tmp_path):
+    journal = storage.JsonJournal("j", str(tmp_path / "journal"))
+    journal.append("k", {"n": 1})
+    with open(journal.path("k"), "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "entry": {"n"')
+
+    assert journal.read("k") == [(1, {"n": 1})]
+
+    # Next process: the cut line does not break the following entries
+    storage._journal_state.clear()
+    journal.append("k", {"n": 2})
+    assert journal.read("k") == [(1, {"n": 1}), (2, {"n": 2})]
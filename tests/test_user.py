@@ -1,6 +1,8 @@
 from app.crud import crud_user, crud_org
-from app.models import Skill, Role, Organization
+from app.models import Skill, Role, Organization, Project, UserLevel
 from unittest.mock import patch
+from passlib.context import CryptContext
+from app.service import config, sessions
 import os
 import json
 
@@ -13,7 +15,7 @@ def setup_logged_in_user(client, username="mario_test"):
         "password": "Password123!"
     }
     client.post("/user_register", data=form_data, follow_redirects=False)
-    client.cookies.set("session_token", username)
+    client.cookies.set("session_token", sessions.create_session("user", username))
     return username, form_data
 
 def test_register_user_success(client):
@@ -74,8 +76,11 @@ def test_login_user_success(client):
     assert response.status_code == 303
     assert response.headers["location"] == "/user_home"
 
-    assert "session_token" in response.cookies
-    assert response.cookies["session_token"] == "mario_test"
+    # Opaque token, not the username
+    token = response.cookies["session_token"]
+    assert token != "mario_test"
+    session = sessions.get_session(token)
+    assert session.kind == "user" and session.name == "mario_test"
     
 def test_login_user_error(client):
     form_data = {
@@ -104,9 +109,11 @@ def test_login_user_error(client):
 
 def test_logout(client):
     # Already logged in user
-    client.cookies.set("session_token", "mario_test_loggato")
+    token = sessions.create_session("user", "mario_test_loggato")
+    client.cookies.set("session_token", token)
     
     response = client.get("/user_logout", follow_redirects=False)
+    assert sessions.get_session(token) is None
     
     assert response.status_code == 303
     assert response.headers["location"] == "/"
@@ -114,6 +121,39 @@ def test_logout(client):
     cookie_value = response.cookies.get("session_token", "").strip('"')
     assert cookie_value == ""
 
+def test_username_cookie_is_not_a_session(client):
+    setup_logged_in_user(client, "cookie_test")
+
+    # Old style cookie: the username itself
+    client.cookies.set("session_token", "cookie_test")
+    response = client.get("/user_home", follow_redirects=False)
+    assert response.headers["location"] == "/"
+
+    # A user session does not open the org pages, even of an org with the same name
+    crud_org.create_organization(Organization(name="Cookie", orgname="cookie_test", hashed_password="x"))
+    client.cookies.set("session_token", sessions.create_session("user", "cookie_test"))
+    response = client.get("/org_home", follow_redirects=False)
+    assert response.status_code == 303
+
+def test_change_password_ends_the_other_sessions(client):
+    username, form_data = setup_logged_in_user(client, "revoke_test")
+
+    # Logged in from two devices
+    login = {"username": username, "password": form_data["password"]}
+    first = client.post("/user_login", data=login, follow_redirects=False).cookies["session_token"]
+    second = client.post("/user_login", data=login, follow_redirects=False).cookies["session_token"]
+
+    client.cookies.set("session_token", second)
+    response = client.post("/change_password_user", data={"old_pw": form_data["password"], "new_pw": "NewPassword1!"}, follow_redirects=False)
+    assert "success=" in response.headers["location"]
+
+    # Old tokens rejected, this browser keeps working with its new session
+    assert sessions.get_session(first) is None and sessions.get_session(second) is None
+    client.cookies.set("session_token", first)
+    assert client.get("/user_home", follow_redirects=False).headers["location"] == "/"
+    client.cookies.set("session_token", response.cookies["session_token"])
+    assert client.get("/user_home", follow_redirects=False).status_code == 200
+
 def test_user_home_unauthorized(client):
     # without login
     response = client.get("/user_home", follow_redirects=False)
@@ -241,6 +281,25 @@ def test_add_single_skill(client):
     assert user_in_db.individual_skills[0].name == "Project Management"
     assert user_in_db.individual_skills[0].level == 4
 
+def test_skill_gap_kept_up_to_date(client):
+    username, _ = setup_logged_in_user(client, "gap_test")
+
+    user_in_db = crud_user.get_user_by_username(username)
+    user_in_db.target_roles.append(Role(id="2512", title="Developer", uri="http://role_dev",
+                                        essential_skills=[Skill(uri="http://python", name="Python", level=6)]))
+    crud_user.update_user(user_in_db)
+
+    # Adding a skill updates the stored gap row of the role requiring it
+    client.post("/add_single_skill", data={"uri": "http://python", "name": "Python", "level_http://python": "3"}, follow_redirects=False)
+    gap = crud_user.get_user_by_username(username).skill_gap
+    assert [(row["role_uri"], row["match_score"]) for row in gap] == [("http://role_dev", 50)]
+
+    client.post("/delete_user_skill", data={"skill_uri": "http://python"}, follow_redirects=False)
+    assert crud_user.get_user_by_username(username).skill_gap[0]["match_score"] == 0
+
+    client.post("/delete_target_role", data={"role_uri": "http://role_dev"}, follow_redirects=False)
+    assert crud_user.get_user_by_username(username).skill_gap == []
+
 def test_upload_skills_csv_invalid_file(client):
     _, _ = setup_logged_in_user(client)
     
@@ -314,6 +373,30 @@ def test_forecast_gap_courses_too_many_roles(client):
     assert "error=" in response.headers["location"]
     assert "up to 5" in response.headers["location"].replace("%20", " ")
 
+def test_project_forecast_with_team_gap(client):
+    username, _ = setup_logged_in_user(client, "forecast_manager")
+
+    user = crud_user.get_user_by_username(username)
+    user.organization = "forecast_org"
+    user.level = UserLevel.MANAGER
+    crud_user.update_user(user)
+
+    # Team with a partial (python 2/5) and a missing (sql) skill, rows not computed yet
+    role = Role(id="2512", title="Developer", uri="http://role_dev", essential_skills=[
+        Skill(uri="http://python", name="Python", level=5), Skill(uri="http://sql", name="SQL", level=3)
+    ])
+    project = Project(name="Gap", description="...", manager=username, target_roles=[role], assigned_members=[username])
+    members = {username: [Skill(uri="http://python", name="Python", level=2)]}
+    crud_org.create_organization(Organization(name="ForecastCorp", orgname="forecast_org", hashed_password="x", projects=[project], members=members))
+
+    response = client.post("/manager/project/forecast_gap_courses", data={"project_id": str(project.id), "country": "Italy"})
+
+    assert response.status_code == 200
+    # Rows computed and saved by the forecast
+    gap = crud_org.get_project("forecast_org", str(project.id)).skill_gap[0]
+    assert [s["uri"] for s in gap["missing_skills"]] == ["http://sql"]
+    assert [p["skill"]["uri"] for p in gap["partially_matching_skills"]] == ["http://python"]
+
 def test_create_project_post(client):
     username, _ = setup_logged_in_user(client, "manager_test")
     
@@ -347,4 +430,169 @@ def test_create_project_post(client):
     assert project.manager == username
     assert "dev_luigi" in project.assigned_members
     assert len(project.assigned_members) == 2
-    
\ No newline at end of file
+    
+@patch("app.routers.user.escoAPI.get_esco_skills_list")
+def test_upload_skills_csv_deduplicates_searches(mock_esco_api, client):
+    _, _ = setup_logged_in_user(client)
+    
+    csv_content = b"skill_name,level\nSQL,2\nPython,5\nSQL,7\n"
+    fake_file = {"file": ("skills.csv", csv_content, "text/csv")}
+    
+    def mock_api_behavior(skill_name, **kwargs):
+        return [Skill(uri=f"http://esco/{skill_name}", name=f"{skill_name} Official", level=0)]
+        
+    mock_esco_api.side_effect = mock_api_behavior
+    
+    response = client.post("/upload_skills_csv", files=fake_file)
+    
+    assert response.status_code == 200 
+    # "SQL" searched once
+    assert mock_esco_api.call_count == 2
+    
+    # Rows keep the CSV order
+    html_text = response.text
+    assert html_text.index("SQL Official") < html_text.index("Python Official")
+    assert 'name="total_rows" value="3"' in html_text
+
+def test_team_optimizer_suggests_members(client):
+    username, _ = setup_logged_in_user(client, "optimizer_test")
+
+    user = crud_user.get_user_by_username(username)
+    user.organization = "opt_org"
+    crud_user.update_user(user)
+
+    role = Role(id="2512", title="Developer", uri="http://role_dev",
+                essential_skills=[Skill(uri="http://python", name="Python", level=5)])
+    project = Project(name="Optimized", description="...", manager=username, target_roles=[role])
+    org = Organization(name="OptCorp", orgname="opt_org", hashed_password="fake_password", projects=[project], members={
+        username: [],
+        "dev_weak": [Skill(uri="http://python", name="Python", level=2)],
+        "dev_strong": [Skill(uri="http://python", name="Python", level=5)]
+    })
+    crud_org.create_organization(org)
+
+    with patch("app.crud.crud_org.get_org_by_orgname", side_effect=AssertionError("organization loaded")):
+        response = client.get(f"/manager/project/{project.id}/team_optimizer", params={"mode": "exact"})
+
+    assert response.status_code == 200
+    assert "dev_strong" in response.text
+    assert "dev_weak" not in response.text
+    assert "100%" in response.text
+
+def test_add_member_to_project_reads_only_the_team(client):
+    username, _ = setup_logged_in_user(client, "team_manager")
+
+    user = crud_user.get_user_by_username(username)
+    user.organization = "team_org"
+    crud_user.update_user(user)
+
+    role = Role(id="2512", title="Developer", uri="http://role_dev",
+                essential_skills=[Skill(uri="http://python", name="Python", level=5)])
+    project = Project(name="Team", description="...", manager=username, target_roles=[role], assigned_members=[username])
+    members = {f"other_{i}": [] for i in range(20)}
+    members.update({username: [], "dev": [Skill(uri="http://python", name="Python", level=5)]})
+    crud_org.create_organization(Organization(name="TeamCorp", orgname="team_org", hashed_password="x", projects=[project], members=members))
+
+    read_members = []
+    original_get_member_skills = crud_org.get_member_skills
+    def tracking_get_member_skills(orgname, usernames):
+        read_members.extend(usernames)
+        return original_get_member_skills(orgname, usernames)
+
+    with patch("app.crud.crud_org.get_member_skills", side_effect=tracking_get_member_skills), \
+         patch("app.crud.crud_org.get_org_by_orgname", side_effect=AssertionError("organization loaded")):
+        response = client.post(f"/manager/project/{project.id}/add_member", data={"username_to_add": "dev"}, follow_redirects=False)
+
+    assert "success=" in response.headers["location"]
+    # Team of the project (again on the current record, inside update_project) and the new member only
+    assert set(read_members) == {"dev", username}
+
+    # Team gap and organization gap follow the new member
+    org = crud_org.get_org_by_orgname("team_org")
+    assert org.projects[0].assigned_members == [username, "dev"]
+    assert org.projects[0].skill_gap[0]["match_score"] == 100
+    assert org.global_gap == {}
+
+def test_view_project_reads_one_project(client):
+    username, _ = setup_logged_in_user(client, "viewer_manager")
+
+    user = crud_user.get_user_by_username(username)
+    user.organization = "view_org"
+    crud_user.update_user(user)
+
+    projects = [Project(name=f"Project {i}", description="...", manager=username, assigned_members=[username]) for i in range(30)]
+    crud_org.create_organization(Organization(name="ViewCorp", orgname="view_org", hashed_password="x", projects=projects, members={
+        username: [Skill(uri="http://sql", name="SQL", level=4)]
+    }))
+
+    with patch("app.crud.crud_org.get_org_by_orgname", side_effect=AssertionError("organization loaded")):
+        response = client.get(f"/manager/project/{projects[17].id}")
+        assert response.status_code == 200
+        assert "Project 17" in response.text and "Project 3" not in response.text
+
+        # Unknown ids, also of other organizations
+        crud_org.create_organization(Organization(name="Other", orgname="other_view_org", hashed_password="x", projects=[
+            Project(id="foreign", name="Foreign", description="...", manager="someone")
+        ]))
+        for project_id in ["missing", "foreign"]:
+            response = client.get(f"/manager/project/{project_id}", follow_redirects=False)
+            assert response.headers["location"] == "/user_home"
+
+def test_leave_org_touches_only_own_projects(client):
+    username, _ = setup_logged_in_user(client, "leaving_user")
+
+    user = crud_user.get_user_by_username(username)
+    user.organization = "leave_org"
+    user.level = UserLevel.MANAGER
+    crud_user.update_user(user)
+
+    role = Role(id="2512", title="Developer", uri="http://role_dev",
+                essential_skills=[Skill(uri="http://python", name="Python", level=5)])
+    mine = Project(name="Mine", description="...", manager="boss", target_roles=[role], assigned_members=[username, "dev"])
+    managed = Project(name="Managed", description="...", manager=username)
+    others = [Project(name=f"Other {i}", description="...", manager="boss", assigned_members=["dev"]) for i in range(20)]
+    crud_org.create_organization(Organization(name="LeaveCorp", orgname="leave_org", hashed_password="x", projects=[mine, managed] + others, members={
+        username: [Skill(uri="http://python", name="Python", level=5)],
+        "dev": [Skill(uri="http://python", name="Python", level=2)]
+    }))
+
+    # Home of a manager: own projects only
+    with patch("app.crud.crud_org.get_org_by_orgname", side_effect=AssertionError("organization loaded")):
+        response = client.get("/user_home")
+        assert "Managed" in response.text and "Other 3" not in response.text
+
+    read_projects = []
+    original_get_project = crud_org.get_project
+    def tracking_get_project(orgname, project_id):
+        read_projects.append(project_id)
+        return original_get_project(orgname, project_id)
+
+    with patch("app.crud.crud_org.get_project", side_effect=tracking_get_project), \
+         patch("app.crud.crud_org.get_org_by_orgname", side_effect=AssertionError("organization loaded")):
+        response = client.post("/leave_org", data={"orgname": "leave_org"}, follow_redirects=False)
+
+    assert "success=" in response.headers["location"]
+    assert sorted(read_projects) == sorted([str(mine.id), str(managed.id)])
+
+    org = crud_org.get_org_by_orgname("leave_org")
+    assert username not in org.members
+    assert org.projects[0].assigned_members == ["dev"]
+    assert org.projects[0].skill_gap[0]["match_score"] < 100
+    assert org.projects[1].manager == "Unassigned"
+    assert crud_org.get_assigned_projects("leave_org", username) == []
+
+def test_login_upgrades_old_hash(client):
+    username, form_data = setup_logged_in_user(client, "rehash_test")
+
+    # Hash made with cheaper argon2 parameters than the current ones
+    old_context = CryptContext(schemes=["argon2"], argon2__rounds=1, argon2__memory_cost=1024, argon2__parallelism=1)
+    assert crud_user.change_password_user(crud_user.get_user_by_username(username), old_context.hash(form_data["password"]))
+    assert config.pwd_context.needs_update(crud_user.get_user_by_username(username).hashed_password)
+
+    response = client.post("/user_login", data={"username": username, "password": form_data["password"]}, follow_redirects=False)
+    assert response.headers["location"] == "/user_home"
+
+    new_hash = crud_user.get_user_by_username(username).hashed_password
+    assert not config.pwd_context.needs_update(new_hash)
+    assert config.pwd_context.verify(form_data["password"], new_hash)
+